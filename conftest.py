@@ -1,6 +1,19 @@
 import logging
 import sys
+from typing import Any
+
+import pytest
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
 logger = logging.getLogger(__name__)
+
+
+@pytest.fixture(autouse=True)
+def no_cache_tiers(settings: Any) -> None:
+    """
+    Every test reads and writes the database cache directly, tests of the tiers in front of it turn them back on
+    """
+    settings.GITGRADE_MEMORY_CACHE_ENTRIES = 0
+    settings.GITGRADE_SHARED_CACHE_ALIAS = ""
+    settings.GITGRADE_NEGATIVE_CACHE_ENTRIES = 0
@@ -185,3 +185,135 @@ GITGRADE_BASE_URL = os.environ.get("GITGRADE_BASE_URL", "https://gitigrade.net")
 GITHUB_SSO_CLIENT_ID = os.environ.get("GITHUB_SSO_CLIENT_ID", "invalid_default")
 GITHUB_SSO_CLIENT_SECRET = os.environ.get("GITHUB_SSO_CLIENT_SECRET", "invalid_default")
 GITHUB_TOKEN_KEY = "github_token"
+
+# Grades shared between nodes, in front of the database and behind each worker's memory.
+# Point the "grades" cache at Redis or memcached in production, for example
+# django.core.cache.backends.redis.RedisCache with redis://host:6379 (the backend's
+# client library must be installed). An empty GITGRADE_SHARED_CACHE_ALIAS turns the
+# tier off.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "grades": {
+        "BACKEND": os.environ.get("GITGRADE_SHARED_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("GITGRADE_SHARED_CACHE_LOCATION", "gitgrade-grades"),
+        "KEY_PREFIX": "gitgrade",
+    },
+}
+GITGRADE_SHARED_CACHE_ALIAS = os.environ.get("GITGRADE_SHARED_CACHE_ALIAS", "grades")
+
+# Grades held in each worker's memory in front of the database cache, 0 turns the tier
+# off. Entries expire with the database row they came from, or after
+# GITGRADE_MEMORY_CACHE_MAX_AGE seconds so refreshes by other workers are picked up.
+GITGRADE_MEMORY_CACHE_ENTRIES = int(os.environ.get("GITGRADE_MEMORY_CACHE_ENTRIES", "1024"))
+GITGRADE_MEMORY_CACHE_MAX_AGE = int(os.environ.get("GITGRADE_MEMORY_CACHE_MAX_AGE", "3600"))
+
+# Requests that failed in ways that won't change soon are answered from each worker's
+# memory for a while, up to GITGRADE_NEGATIVE_CACHE_ENTRIES of them (0 turns this off).
+# Unparseable or unsupported URLs are held for GITGRADE_NEGATIVE_URL_SECONDS, repos
+# Github says don't exist for GITGRADE_NEGATIVE_NOT_FOUND_SECONDS, and repos Github
+# fails for GITGRADE_NEGATIVE_ERROR_THRESHOLD times in a row with a 5xx for
+# GITGRADE_NEGATIVE_ERROR_SECONDS.
+GITGRADE_NEGATIVE_CACHE_ENTRIES = int(os.environ.get("GITGRADE_NEGATIVE_CACHE_ENTRIES", "10000"))
+GITGRADE_NEGATIVE_URL_SECONDS = int(os.environ.get("GITGRADE_NEGATIVE_URL_SECONDS", "3600"))
+GITGRADE_NEGATIVE_NOT_FOUND_SECONDS = int(os.environ.get("GITGRADE_NEGATIVE_NOT_FOUND_SECONDS", "600"))
+GITGRADE_NEGATIVE_ERROR_SECONDS = int(os.environ.get("GITGRADE_NEGATIVE_ERROR_SECONDS", "60"))
+GITGRADE_NEGATIVE_ERROR_THRESHOLD = 3
+
+# Grades past their freshness are shown while a background thread refreshes them as
+# long as the row is within GITGRADE_STALE_MAX_DAYS days old. Older rows, or either
+# setting at 0, make the request wait for Github.
+GITGRADE_STALE_MAX_DAYS = int(os.environ.get("GITGRADE_STALE_MAX_DAYS", "90"))
+GITGRADE_REFRESH_WORKERS = int(os.environ.get("GITGRADE_REFRESH_WORKERS", "2"))
+
+# Concurrent misses for the same repo share one fetch from Github. Within a worker later
+# requests wait on the first, across workers and nodes a FetchLease row lets one fetch
+# while the rest poll the cache for its result. Waiters give up with an error after
+# GITGRADE_FETCH_WAIT_SECONDS, a GITGRADE_FETCH_LEASE_SECONDS of 0 turns the lease off.
+GITGRADE_FETCH_WAIT_SECONDS = float(os.environ.get("GITGRADE_FETCH_WAIT_SECONDS", "30"))
+GITGRADE_FETCH_LEASE_SECONDS = int(os.environ.get("GITGRADE_FETCH_LEASE_SECONDS", "120"))
+GITGRADE_FETCH_POLL_SECONDS = 0.5
+
+# Hits on each repo are counted in memory and saved every GITGRADE_ACCESS_FLUSH_SECONDS.
+# `manage.py warm_cache` refreshes repos with at least GITGRADE_WARM_MIN_HITS_PER_DAY
+# whose rows expire within GITGRADE_WARM_LOOKAHEAD_HOURS, up to GITGRADE_WARM_BATCH_SIZE
+# a round, and stops once the service tokens have used GITGRADE_WARM_BUDGET_SHARE of
+# their rate limit. With --loop it runs a round every GITGRADE_WARM_INTERVAL_SECONDS.
+GITGRADE_ACCESS_FLUSH_SECONDS = int(os.environ.get("GITGRADE_ACCESS_FLUSH_SECONDS", "60"))
+GITGRADE_WARM_LOOKAHEAD_HOURS = float(os.environ.get("GITGRADE_WARM_LOOKAHEAD_HOURS", "24"))
+GITGRADE_WARM_MIN_HITS_PER_DAY = float(os.environ.get("GITGRADE_WARM_MIN_HITS_PER_DAY", "1"))
+GITGRADE_WARM_BUDGET_SHARE = float(os.environ.get("GITGRADE_WARM_BUDGET_SHARE", "0.25"))
+GITGRADE_WARM_BATCH_SIZE = 50
+GITGRADE_WARM_INTERVAL_SECONDS = 900
+
+# Github Fetch Settings
+
+# Which API collects the data for a grade, either "rest" or "graphql". GraphQL requires
+# a token, so requests without one use the REST API unless service tokens or a Github
+# App are configured.
+GITHUB_FETCH_ENGINE = os.environ.get("GITHUB_FETCH_ENGINE", "rest")
+
+# How the REST engine counts recent commits, "pages" lists every commit in the window,
+# "stats" reads Github's precomputed statistics at a fixed cost and pages through
+# commits only when they aren't ready. Github answers 202 while it computes them, each
+# endpoint is polled GITHUB_STATS_POLL_ATTEMPTS times with the delay doubling from
+# GITHUB_STATS_POLL_DELAY seconds.
+GITHUB_COMMIT_SOURCE = os.environ.get("GITHUB_COMMIT_SOURCE", "pages")
+GITHUB_STATS_POLL_ATTEMPTS = 5
+GITHUB_STATS_POLL_DELAY = 1.0
+
+# Keeps one event loop and HTTP connection pool per worker for calls to Github, when
+# disabled each fetch opens its own connections.
+GITHUB_IO_RUNTIME = os.environ.get("GITHUB_IO_RUNTIME", "True").lower() == "true"
+
+# Serves grades from an async view that awaits Github on the server's event loop, so a
+# process keeps many slow fetches in flight instead of one per thread. gitgrade/asgi.py
+# turns this on, it only pays off under an ASGI server.
+GITGRADE_ASYNC_VIEWS = os.environ.get("GITGRADE_ASYNC_VIEWS", "False").lower() == "true"
+GITHUB_CONNECTION_LIMIT = int(os.environ.get("GITHUB_CONNECTION_LIMIT", "50"))
+GITHUB_DNS_CACHE_SECONDS = 300
+GITHUB_KEEPALIVE_SECONDS = 60
+
+# Grades repos that miss the cache on grade workers (`manage.py grade_worker`) instead of
+# in the request, visitors wait on a page showing the job's progress. Workers look for
+# jobs every GITGRADE_JOB_POLL_SECONDS when idle and beat every
+# GITGRADE_JOB_HEARTBEAT_SECONDS while grading, jobs whose worker hasn't reported for
+# GITGRADE_JOB_TIMEOUT_SECONDS are requeued up to GITGRADE_JOB_MAX_ATTEMPTS tries, and
+# finished jobs are kept for GITGRADE_JOB_KEEP_SECONDS.
+GITGRADE_GRADE_JOBS = os.environ.get("GITGRADE_GRADE_JOBS", "False").lower() == "true"
+GITGRADE_JOB_POLL_SECONDS = float(os.environ.get("GITGRADE_JOB_POLL_SECONDS", "1"))
+GITGRADE_JOB_HEARTBEAT_SECONDS = float(os.environ.get("GITGRADE_JOB_HEARTBEAT_SECONDS", "30"))
+GITGRADE_JOB_TIMEOUT_SECONDS = int(os.environ.get("GITGRADE_JOB_TIMEOUT_SECONDS", "300"))
+GITGRADE_JOB_MAX_ATTEMPTS = int(os.environ.get("GITGRADE_JOB_MAX_ATTEMPTS", "3"))
+GITGRADE_JOB_KEEP_SECONDS = int(os.environ.get("GITGRADE_JOB_KEEP_SECONDS", "86400"))
+GITGRADE_JOB_PAGE_REFRESH_SECONDS = 2
+
+# The bulk API (/api/grades) grades at most GITGRADE_BULK_MAX_REPOS repos a call and
+# fetches at most GITGRADE_BULK_CONCURRENCY of those missing from the cache at a time.
+GITGRADE_BULK_MAX_REPOS = int(os.environ.get("GITGRADE_BULK_MAX_REPOS", "500"))
+GITGRADE_BULK_CONCURRENCY = int(os.environ.get("GITGRADE_BULK_CONCURRENCY", "10"))
+
+# Concurrent requests to Github per worker, adjusted between these bounds as Github
+# signals secondary rate limits. Waits for a rate limit reset longer than
+# GITHUB_RATE_LIMIT_MAX_WAIT seconds fail the request instead.
+GITHUB_CONCURRENCY_INITIAL = 10
+GITHUB_CONCURRENCY_MAX = 30
+GITHUB_RATE_LIMIT_MAX_WAIT = 30
+
+# Caps requests in flight to Github from this worker, or across all workers sharing the
+# database when GITHUB_GOVERNOR_DATABASE is enabled.
+GITHUB_MAX_IN_FLIGHT = int(os.environ.get("GITHUB_MAX_IN_FLIGHT", "40"))
+GITHUB_GOVERNOR_DATABASE = os.environ.get("GITHUB_GOVERNOR_DATABASE", "False").lower() == "true"
+GITHUB_GOVERNOR_HEARTBEAT = 15
+
+# Comma separated tokens shared by every fetch, used when a visitor hasn't signed in
+# or their own token has run out. Each token gets its own rate limit, so grading
+# throughput grows with the number provisioned.
+GITHUB_SERVICE_TOKENS = [token.strip() for token in os.environ.get("GITHUB_SERVICE_TOKENS", "").split(",") if token.strip()]
+
+# Github App credentials, the app's installation token joins the pool above. The private
+# key is the PEM file's contents, newlines may be escaped as \\n. Installation tokens
+# are replaced this many seconds before they expire.
+GITHUB_APP_ID = os.environ.get("GITHUB_APP_ID", "")
+GITHUB_APP_PRIVATE_KEY = os.environ.get("GITHUB_APP_PRIVATE_KEY", "").replace("\\n", "\n")
+GITHUB_APP_INSTALLATION_ID = os.environ.get("GITHUB_APP_INSTALLATION_ID", "")
+GITHUB_APP_TOKEN_REFRESH_MARGIN = 300
@@ -3,6 +3,13 @@
 # Register your models here.
 from django.contrib import admin
 
-from repo.models import CacheData
+from repo.models import CacheData, CommitActivity, CommitWatermark, FetchLease, GradeJob, OutboundWorker, RepoAccess, TagObject
 
 admin.site.register(CacheData)
+admin.site.register(OutboundWorker)
+admin.site.register(TagObject)
+admin.site.register(CommitWatermark)
+admin.site.register(FetchLease)
+admin.site.register(CommitActivity)
+admin.site.register(RepoAccess)
+admin.site.register(GradeJob)
@@ -19,6 +19,17 @@ class TimeData:
     author_count: int
 
 
+@dataclass
+class TotalsData:
+    """
+    All-time counts, without the commit interval which needs every commit's date
+    """
+
+    commit_count: int
+    commit_count_primary_author: int
+    author_count: int
+
+
 @dataclass
 class DataFromClone:
     days_since_commit: int
@@ -39,6 +50,7 @@ class DataFromAPI:
     open_issue_count: int
 
     days_since_commit: int
+    time_all: TotalsData
     time_recent: TimeData
 
     latest_release: str
@@ -32,3 +32,4 @@ class RepoRequest:
 class ViewOnly:
     # commit_interval_days_all: str
     commit_interval_days_recent: str
+    refreshing_from: Optional[str] = None  # When the stale grades shown while refreshing were collected
@@ -1,7 +1,13 @@
 from dataclasses import dataclass
+from typing import Final
 
 from repo.data.general import Statistics
 
+# The layout of the data collected for a repo. Cached data outlives releases of the app,
+# since grades are recalculated when it's read, bump this when the fields of GitData or
+# the way they're collected change so cached data is refetched.
+SCHEMA_VERSION: Final = 1
+
 
 @dataclass
 class CodeData:
@@ -22,11 +28,17 @@ class CommitData:
     interval: Statistics
 
 
+@dataclass
+class CommitTotalData:
+    count: int
+    count_primary_author: int
+
+
 @dataclass
 class ContributorData:
     days_since_create: int
     days_since_commit: int
-    # author_count_all: int
+    author_count_all: int
     author_count_recent: int
 
 
@@ -45,7 +57,7 @@ class GitData:
 
     # code: CodeData
     pull_request: PullRequestData
-    # commit_all: CommitData
+    commit_all: CommitTotalData
     commit_recent: CommitData
     contributor: ContributorData
     popularity: PopularityData
@@ -29,9 +29,9 @@ class Author:
 
 @dataclass
 class Commit:
+    sha: str
     author: Author
-    message: str
-    comment_count: int
+    committed_at: str
 
 
 @dataclass
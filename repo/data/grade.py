@@ -2,6 +2,8 @@ from dataclasses import dataclass
 from enum import Enum
 from typing import Optional, Union
 
+from repo.data.git_data import GitData
+
 
 class Grade(Enum):
     A = "A"
@@ -26,10 +28,20 @@ class TestGrade:
 class TestGrades:
     days_since_commit: TestGrade
     days_since_create: TestGrade
-    # author_count_all: TestGrade
+    author_count_all: TestGrade
     author_count_recent: TestGrade
-    # commit_count_primary_author_all: TestGrade
+    commit_count_primary_author_all: TestGrade
     commit_count_primary_author_recent: TestGrade
     # commit_interval_all: TestGrade
     commit_interval_recent: TestGrade
     final_grade: TestGrade
+
+
+@dataclass
+class GradedRepo:
+    """
+    A repo's data and the grades calculated from it, as the cache tiers hold them
+    """
+
+    data: GitData
+    grades: TestGrades
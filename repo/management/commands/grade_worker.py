@@ -0,0 +1,36 @@
+"""
+Runs grade jobs queued by visitors' requests, see job_queue_service and grade_worker_service.
+
+    python manage.py grade_worker --workers 4
+    python manage.py grade_worker --once
+"""
+import multiprocessing
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connections
+
+from repo.services.grade_worker_service import work
+from repo.services.job_queue_service import worker_name
+
+
+def _work(stop_when_idle: bool) -> int:
+    return work(worker_name(), stop_when_idle=stop_when_idle)
+
+
+class Command(BaseCommand):
+    help = "Grades repos queued as grade jobs"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--workers", type=int, default=1, help="Worker processes, each runs one job at a time")
+        parser.add_argument("--once", action="store_true", help="Stop once the queue is empty")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["workers"] <= 1:
+            jobs_run = _work(options["once"])
+        else:
+            # Forked workers mustn't share the parent's database connections
+            connections.close_all()
+            with multiprocessing.Pool(options["workers"]) as pool:
+                jobs_run = sum(pool.map(_work, [options["once"]] * options["workers"]))
+        self.stdout.write(f"Ran {jobs_run} grade jobs")
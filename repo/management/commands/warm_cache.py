@@ -0,0 +1,57 @@
+"""
+Refreshes popular repos before their cached grades expire, see warming_service.
+
+    python manage.py warm_cache --dry-run
+    python manage.py warm_cache --loop
+"""
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+
+from repo.data.general import SECONDS_IN_HOUR
+from repo.services.warming_service import WarmCandidate, plan_warming, warm
+
+
+def _describe(candidate: WarmCandidate) -> str:
+    url_metadata = candidate.url_metadata
+    expiry = f"expires in {candidate.expires_in / SECONDS_IN_HOUR:.1f}h" if candidate.expires_in > 0 else f"expired {-candidate.expires_in / SECONDS_IN_HOUR:.1f}h ago"
+    return f"{url_metadata.owner}/{url_metadata.repo}: {candidate.hit_rate:.2f} hits a day, {expiry}, priority {candidate.priority:.2f}"
+
+
+class Command(BaseCommand):
+    help = "Refreshes the most visited repos shortly before their cached grades expire"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be refreshed without fetching anything")
+        parser.add_argument("--limit", type=int, default=settings.GITGRADE_WARM_BATCH_SIZE, help="Most repos refreshed per round")
+        parser.add_argument("--lookahead-hours", type=float, default=settings.GITGRADE_WARM_LOOKAHEAD_HOURS, help="Refresh rows expiring within this many hours")
+        parser.add_argument("--min-hits", type=float, default=settings.GITGRADE_WARM_MIN_HITS_PER_DAY, help="Skip repos with fewer hits a day")
+        parser.add_argument("--budget-share", type=float, default=settings.GITGRADE_WARM_BUDGET_SHARE, help="Share of the rate limit warming may use")
+        parser.add_argument("--loop", action="store_true", help="Keep warming every --interval seconds")
+        parser.add_argument("--interval", type=float, default=settings.GITGRADE_WARM_INTERVAL_SECONDS, help="Seconds between rounds with --loop")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        while True:
+            self._round(options)
+            if not options["loop"]:
+                return
+            close_old_connections()
+            time.sleep(options["interval"])
+
+    def _round(self, options: Any) -> None:
+        candidates = plan_warming(options["lookahead_hours"], options["min_hits"], limit=options["limit"])
+        report = warm(candidates, options["budget_share"], dry_run=options["dry_run"])
+
+        verb = "Would refresh" if options["dry_run"] else "Refreshed"
+        for candidate in report.refreshed:
+            self.stdout.write(f"{verb} {_describe(candidate)}")
+        for candidate in report.failed:
+            self.stderr.write(f"Failed to refresh {_describe(candidate)}")
+        for candidate in report.busy:
+            self.stdout.write(f"Already being fetched {_describe(candidate)}")
+        for candidate in report.deferred:
+            self.stdout.write(f"Deferred for budget {_describe(candidate)}")
+        self.stdout.write(f"{verb} {len(report.refreshed)} repos, {len(report.failed)} failed, {len(report.busy)} busy, {len(report.deferred)} deferred")
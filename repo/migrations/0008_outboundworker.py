@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0007_remove_cachedata_contributor_branch_count_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OutboundWorker",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("heartbeat", models.DateTimeField()),
+                ("max_in_flight", models.IntegerField()),
+                ("in_flight", models.IntegerField()),
+                ("queue_depth", models.IntegerField()),
+                ("mean_wait_ms", models.FloatField()),
+                ("max_wait_ms", models.FloatField()),
+            ],
+        ),
+    ]
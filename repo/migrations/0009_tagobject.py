@@ -0,0 +1,21 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0008_outboundworker"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TagObject",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("sha", models.CharField(max_length=40, unique=True)),
+                ("dated_at", models.CharField(max_length=32)),
+            ],
+        ),
+    ]
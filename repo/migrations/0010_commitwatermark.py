@@ -0,0 +1,30 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0009_tagobject"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommitWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("owner", models.CharField(max_length=255)),
+                ("repo", models.CharField(max_length=255)),
+                ("sha", models.CharField(max_length=40)),
+                ("committed_at", models.BigIntegerField()),
+                ("days", models.TextField()),
+                ("row_updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="commitwatermark",
+            constraint=models.UniqueConstraint(fields=("source", "owner", "repo"), name="unique_watermark"),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0010_commitwatermark"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cachedata",
+            name="commit_all_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cachedata",
+            name="commit_all_count_primary_author",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="cachedata",
+            name="contributor_author_count_all",
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0011_cachedata_all_time_totals"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FetchLease",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("owner", models.CharField(max_length=255)),
+                ("repo", models.CharField(max_length=255)),
+                ("holder", models.CharField(max_length=255)),
+                ("expires_at", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="fetchlease",
+            constraint=models.UniqueConstraint(fields=("source", "owner", "repo"), name="unique_lease"),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:57
+
+from django.db import migrations, models
+from packaging.version import parse as parse_version
+
+
+def mark_current_rows(apps, schema_editor):
+    """
+    Rows written since 0.7.0 already hold every field of the first schema, older rows
+    are missing the all-time totals and stay at 0 to be refetched
+    """
+    CacheData = apps.get_model("repo", "CacheData")
+    current = [row.pk for row in CacheData.objects.only("pk", "version").iterator() if parse_version(row.version) >= parse_version("0.7.0")]
+    for start in range(0, len(current), 500):
+        CacheData.objects.filter(pk__in=current[start : start + 500]).update(schema_version=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0012_fetchlease"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cachedata",
+            name="schema_version",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(mark_current_rows, migrations.RunPython.noop),
+    ]
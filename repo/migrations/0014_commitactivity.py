@@ -0,0 +1,32 @@
+# Generated by Django 4.1.13 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0013_cachedata_schema_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CommitActivity",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("owner", models.CharField(max_length=255)),
+                ("repo", models.CharField(max_length=255)),
+                ("first_day", models.IntegerField()),
+                ("commits", models.BinaryField()),
+                ("authors", models.BinaryField()),
+                ("top_authors", models.TextField()),
+                ("sketched_through", models.IntegerField()),
+                ("row_updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="commitactivity",
+            constraint=models.UniqueConstraint(fields=("source", "owner", "repo"), name="unique_activity"),
+        ),
+    ]
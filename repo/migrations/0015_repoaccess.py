@@ -0,0 +1,28 @@
+# Generated by Django 4.1.13 on 2026-10-18 19:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0014_commitactivity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RepoAccess",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("owner", models.CharField(max_length=255)),
+                ("repo", models.CharField(max_length=255)),
+                ("hit_rate", models.FloatField()),
+                ("rate_updated", models.DateTimeField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="repoaccess",
+            constraint=models.UniqueConstraint(fields=("source", "owner", "repo"), name="unique_access"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.13 on 2026-10-18 19:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("repo", "0015_repoaccess"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GradeJob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("source", models.CharField(max_length=255)),
+                ("owner", models.CharField(max_length=255)),
+                ("repo", models.CharField(max_length=255)),
+                ("status", models.CharField(default="queued", max_length=16)),
+                ("stage", models.CharField(default="", max_length=255)),
+                ("error_message", models.TextField(default="")),
+                ("worker", models.CharField(default="", max_length=255)),
+                ("attempts", models.IntegerField(default=0)),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("heartbeat", models.DateTimeField(null=True)),
+                ("finished", models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="gradejob",
+            index=models.Index(fields=["status", "created"], name="job_status_created"),
+        ),
+        migrations.AddConstraint(
+            model_name="gradejob",
+            constraint=models.UniqueConstraint(condition=models.Q(("status__in", ["queued", "running"])), fields=("source", "owner", "repo"), name="unique_active_job"),
+        ),
+    ]
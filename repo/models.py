@@ -1,51 +1,90 @@
 # mypy: ignore-errors
-from typing import Any, Tuple
+from typing import Any, Dict, Iterable, List, Tuple
 
 from django.db.models import (
     Model,
+    BinaryField,
     CharField,
     IntegerField,
+    BigIntegerField,
+    TextField,
     DateField,
+    DateTimeField,
     Manager,
     UniqueConstraint,
     FloatField,
+    Index,
+    Q,
 )
 
 from repo.data.general import RepoRequest
-from repo.data.git_data import GitData
+from repo.data.git_data import SCHEMA_VERSION, GitData
+
+
+def _cache_fields(version: str, url_metadata: RepoRequest, data: GitData) -> Dict[str, Any]:
+    return {
+        "version": version,
+        "schema_version": SCHEMA_VERSION,
+        "source": url_metadata.source,
+        "owner": url_metadata.owner,
+        "repo": url_metadata.repo,
+        # "code_lines_of_code": data.code.lines_of_code,
+        # "code_file_count": data.code.file_count,
+        "pull_request_count": data.pull_request.count,
+        "pull_request_count_open": data.pull_request.count_open,
+        "commit_all_count": data.commit_all.count,
+        "commit_all_count_primary_author": data.commit_all.count_primary_author,
+        # "commit_all_interval_mean": data.commit_all.interval.mean,
+        # "commit_all_interval_standard_deviation": data.commit_all.interval.standard_deviation,
+        "commit_recent_count": data.commit_recent.count,
+        "commit_recent_count_primary_author": data.commit_recent.count_primary_author,
+        "commit_recent_interval_mean": data.commit_recent.interval.mean,
+        "commit_recent_interval_standard_deviation": data.commit_recent.interval.standard_deviation,
+        "contributor_days_since_create": data.contributor.days_since_create,
+        "contributor_days_since_commit": data.contributor.days_since_commit,
+        "contributor_author_count_all": data.contributor.author_count_all,
+        "contributor_author_count_recent": data.contributor.author_count_recent,
+        "popularity_watcher_count": data.popularity.watcher_count,
+        "popularity_open_issue_count": data.popularity.open_issue_count,
+    }
+
+
+NATURAL_KEY_FIELDS = ["source", "owner", "repo"]
 
 
 class CacheDataManager(Manager):
     def get_by_natural_key(self, source: str, owner: str, repo: str) -> Any:
         return self.get(source=source, owner=owner, repo=repo)
 
-    def create_git_repo_data(self, version: str, url_metadata: RepoRequest, data: GitData):
-        git_repo_data = self.create(
-            version=version,
-            source=url_metadata.source,
-            owner=url_metadata.owner,
-            repo=url_metadata.repo,
-            # code_lines_of_code=data.code.lines_of_code,
-            # code_file_count=data.code.file_count,
-            pull_request_count=data.pull_request.count,
-            pull_request_count_open=data.pull_request.count_open,
-            # commit_all_count=data.commit_all.count,
-            # commit_all_count_primary_author=data.commit_all.count_primary_author,
-            # commit_all_interval_mean=data.commit_all.interval.mean,
-            # commit_all_interval_standard_deviation=data.commit_all.interval.standard_deviation,
-            commit_recent_count=data.commit_recent.count,
-            commit_recent_count_primary_author=data.commit_recent.count_primary_author,
-            commit_recent_interval_mean=data.commit_recent.interval.mean,
-            commit_recent_interval_standard_deviation=data.commit_recent.interval.standard_deviation,
-            contributor_days_since_create=data.contributor.days_since_create,
-            contributor_days_since_commit=data.contributor.days_since_commit,
-            # contributor_author_count_all=data.contributor.author_count_all,
-            contributor_author_count_recent=data.contributor.author_count_recent,
-            popularity_watcher_count=data.popularity.watcher_count,
-            popularity_open_issue_count=data.popularity.open_issue_count,
-        )
-
-        return git_repo_data
+    def upsert_git_repo_data(self, rows: Iterable[Tuple[str, RepoRequest, GitData]]) -> int:
+        """
+        Inserts or replaces the data for each (version, url_metadata, data) row with
+        INSERT ... ON CONFLICT (source, owner, repo) DO UPDATE. Postgres writes every row
+        in one statement, SQLite in batches that fit its limit on query parameters.
+        Returns the number of rows written
+        """
+        objects, update_fields = self._upsert_objects(rows)
+        if objects:
+            self.bulk_create(objects, update_conflicts=True, unique_fields=NATURAL_KEY_FIELDS, update_fields=update_fields)
+        return len(objects)
+
+    async def aupsert_git_repo_data(self, rows: Iterable[Tuple[str, RepoRequest, GitData]]) -> int:
+        objects, update_fields = self._upsert_objects(rows)
+        if objects:
+            await self.abulk_create(objects, update_conflicts=True, unique_fields=NATURAL_KEY_FIELDS, update_fields=update_fields)
+        return len(objects)
+
+    def _upsert_objects(self, rows: Iterable[Tuple[str, RepoRequest, GitData]]) -> Tuple[List[Any], List[str]]:
+        # A statement can't update the same row twice, the last data for a repo wins
+        latest = {}
+        for version, url_metadata, data in rows:
+            fields = _cache_fields(version, url_metadata, data)
+            latest[tuple(fields[key] for key in NATURAL_KEY_FIELDS)] = fields
+        if not latest:
+            return [], []
+
+        update_fields = [key for key in next(iter(latest.values())) if key not in NATURAL_KEY_FIELDS] + ["row_updated_date"]
+        return [self.model(**fields) for fields in latest.values()], update_fields
 
 
 class CacheData(Model):
@@ -63,7 +102,8 @@ class CacheData(Model):
     row_created_date = DateField(auto_now_add=True)
     row_updated_date = DateField(auto_now=True)
 
-    version = CharField(max_length=32)
+    version = CharField(max_length=32)  # Of the app that wrote the row
+    schema_version = IntegerField(default=0)  # Of the data, see git_data.SCHEMA_VERSION
 
     # UrlMetadata + Primary Key
     source = CharField(max_length=255)
@@ -77,8 +117,8 @@ class CacheData(Model):
     pull_request_count = IntegerField()
     pull_request_count_open = IntegerField()
 
-    # commit_all_count = IntegerField()
-    # commit_all_count_primary_author = IntegerField()
+    commit_all_count = IntegerField(default=0)
+    commit_all_count_primary_author = IntegerField(default=0)
     # commit_all_interval_mean = FloatField()
     # commit_all_interval_standard_deviation = FloatField()
 
@@ -89,7 +129,7 @@ class CacheData(Model):
 
     contributor_days_since_create = IntegerField()
     contributor_days_since_commit = IntegerField()
-    # contributor_author_count_all = IntegerField()
+    contributor_author_count_all = IntegerField(default=0)
     contributor_author_count_recent = IntegerField()
 
     popularity_watcher_count = IntegerField()
@@ -99,7 +139,167 @@ class CacheData(Model):
 
     class Meta:
         #  pylint: disable=too-few-public-methods
-        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], name="unique_repo")]
+        constraints = [UniqueConstraint(fields=NATURAL_KEY_FIELDS, name="unique_repo")]
 
     def natural_key(self) -> Tuple[str, str, str]:
         return self.source, self.owner, self.repo
+
+
+class OutboundWorker(Model):
+    """
+    A worker sharing the cap on requests in flight to Github, see governor_service.
+    """
+
+    name = CharField(max_length=255, unique=True)
+    heartbeat = DateTimeField()
+
+    max_in_flight = IntegerField()
+    in_flight = IntegerField()
+    queue_depth = IntegerField()
+    mean_wait_ms = FloatField()
+    max_wait_ms = FloatField()
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.in_flight}/{self.max_in_flight} in flight, {self.queue_depth} queued)"
+
+
+class TagObject(Model):
+    """
+    The date of a tag object, or of the commit a lightweight tag points at. Git objects
+    never change so these are never invalidated, see release_service.
+    """
+
+    sha = CharField(max_length=40, unique=True)
+    dated_at = CharField(max_length=32)  # Github's UTC format, 2022-01-20T00:00:00Z
+
+    def __str__(self) -> str:
+        return f"{self.sha} ({self.dated_at})"
+
+
+class CommitWatermark(Model):
+    """
+    The newest commit seen on a repo and per day totals of the commits in the recent
+    window up to it, so a refresh only fetches what's newer, see commit_window_service.
+    """
+
+    source = CharField(max_length=255)
+    owner = CharField(max_length=255)
+    repo = CharField(max_length=255)
+
+    sha = CharField(max_length=40)
+    committed_at = BigIntegerField()  # Epoch seconds
+    days = TextField()  # JSON, see commit_window_service
+
+    row_updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        #  pylint: disable=too-few-public-methods
+        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], name="unique_watermark")]
+
+    def __str__(self) -> str:
+        return f"{self.source}/{self.owner}/{self.repo} @ {self.sha}"
+
+
+class FetchLease(Model):
+    """
+    Held by the worker fetching a repo from Github, so other workers and nodes wait for
+    its result instead of fetching the repo too, see single_flight_service. Leases
+    expire so a worker that dies mid fetch doesn't hold up the repo for long.
+    """
+
+    source = CharField(max_length=255)
+    owner = CharField(max_length=255)
+    repo = CharField(max_length=255)
+
+    holder = CharField(max_length=255)  # host:pid:random, unique to each acquisition
+    expires_at = DateTimeField()
+
+    class Meta:
+        #  pylint: disable=too-few-public-methods
+        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], name="unique_lease")]
+
+    def __str__(self) -> str:
+        return f"{self.source}/{self.owner}/{self.repo} held by {self.holder} until {self.expires_at}"
+
+
+class CommitActivity(Model):
+    """
+    The commits and distinct authors of each UTC day a repo has been watched for, and
+    its authors with the most commits, see activity_service.
+    """
+
+    source = CharField(max_length=255)
+    owner = CharField(max_length=255)
+    repo = CharField(max_length=255)
+
+    first_day = IntegerField()  # Days since the epoch
+    commits = BinaryField()  # Packed uint32 per day from first_day on, little endian
+    authors = BinaryField()  # Packed uint16 per day
+    top_authors = TextField()  # JSON, see activity_service
+    sketched_through = IntegerField()  # The last day counted in top_authors
+
+    row_updated = DateTimeField(auto_now=True)
+
+    class Meta:
+        #  pylint: disable=too-few-public-methods
+        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], name="unique_activity")]
+
+    def __str__(self) -> str:
+        return f"{self.source}/{self.owner}/{self.repo} from day {self.first_day}"
+
+
+class RepoAccess(Model):
+    """
+    How often a repo's grades are looked at, as hits a day decayed exponentially so
+    recent visits count the most, see access_service. The cache warmer refreshes the
+    hottest repos before their CacheData rows expire.
+    """
+
+    source = CharField(max_length=255)
+    owner = CharField(max_length=255)
+    repo = CharField(max_length=255)
+
+    hit_rate = FloatField()  # Hits a day as of rate_updated
+    rate_updated = DateTimeField()
+
+    class Meta:
+        #  pylint: disable=too-few-public-methods
+        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], name="unique_access")]
+
+    def __str__(self) -> str:
+        return f"{self.source}/{self.owner}/{self.repo} at {self.hit_rate:.2f} hits a day"
+
+
+class GradeJob(Model):
+    """
+    A repo waiting to be graded, or being graded, by a grade worker instead of the
+    request that asked for it, see job_queue_service. A repo has at most one job
+    queued or running at a time.
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    source = CharField(max_length=255)
+    owner = CharField(max_length=255)
+    repo = CharField(max_length=255)
+
+    status = CharField(max_length=16, default=QUEUED)
+    stage = CharField(max_length=255, default="")  # Progress shown while the job runs
+    error_message = TextField(default="")
+    worker = CharField(max_length=255, default="")  # host:pid of the worker running the job
+    attempts = IntegerField(default=0)
+
+    created = DateTimeField(auto_now_add=True)
+    heartbeat = DateTimeField(null=True)  # Last progress from the worker, jobs gone quiet are requeued
+    finished = DateTimeField(null=True)
+
+    class Meta:
+        #  pylint: disable=too-few-public-methods
+        constraints = [UniqueConstraint(fields=["source", "owner", "repo"], condition=Q(status__in=["queued", "running"]), name="unique_active_job")]
+        indexes = [Index(fields=["status", "created"], name="job_status_created")]
+
+    def __str__(self) -> str:
+        return f"{self.source}/{self.owner}/{self.repo} {self.status}"
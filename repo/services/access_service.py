@@ -0,0 +1,100 @@
+"""
+Counts how often each repo's grades are looked at, so the cache warmer knows which
+repos are worth refreshing before their rows expire.
+
+Each RepoAccess row holds a repo's hit rate in hits a day, an exponentially weighted
+average with a time constant of DECAY_DAYS: every hit adds 1 / DECAY_DAYS and the rate
+decays by e^(-days / DECAY_DAYS) in between, so a repo looked at n times a day settles
+at a rate of n. Workers count hits in memory and write them out at most once every
+settings.GITGRADE_ACCESS_FLUSH_SECONDS, hits counted since the last flush are lost if
+the worker exits.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Final, Optional, Tuple
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from repo.data.general import SECONDS_IN_DAY, RepoRequest
+from repo.models import RepoAccess
+
+logger = logging.getLogger(__name__)
+
+DECAY_DAYS: Final = 7.0
+
+_RepoKey = Tuple[str, str, str]
+
+
+def decayed_rate(hit_rate: float, rate_updated: datetime, now: datetime) -> float:
+    """
+    A hit rate recorded at rate_updated as it stands now, with no hits since
+    """
+    days = max((now - rate_updated).total_seconds(), 0) / SECONDS_IN_DAY
+    return hit_rate * math.exp(-days / DECAY_DAYS)
+
+
+def save_hits(hits: Dict[_RepoKey, int], now: Optional[datetime] = None) -> None:
+    now = now or timezone.now()
+    for (source, owner, repo), count in hits.items():
+        with transaction.atomic():
+            access, created = RepoAccess.objects.select_for_update().get_or_create(
+                source=source, owner=owner, repo=repo, defaults={"hit_rate": count / DECAY_DAYS, "rate_updated": now}
+            )
+            if not created:
+                access.hit_rate = decayed_rate(access.hit_rate, access.rate_updated, now) + count / DECAY_DAYS
+                access.rate_updated = now
+                access.save(update_fields=["hit_rate", "rate_updated"])
+
+
+class AccessCounter:
+    def __init__(self) -> None:
+        self._hits: Counter[_RepoKey] = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, url_metadata: RepoRequest) -> None:
+        """
+        Counts a hit on the repo, writing the counts out if they haven't been for a while
+        """
+        with self._lock:
+            self._hits[(url_metadata.source, url_metadata.owner, url_metadata.repo)] += 1
+            due = time.monotonic() - self._flushed_at >= settings.GITGRADE_ACCESS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            hits, self._hits = self._hits, Counter()
+            self._flushed_at = time.monotonic()
+        if not hits:
+            return
+        logger.debug("  saving hits for %s repos", len(hits))
+        try:
+            save_hits(hits)
+        except Exception:  # pylint: disable=broad-except  # counting hits must never fail the request
+            logger.exception("Unable to save hits for %s repos", len(hits))
+
+
+_ACCESS_COUNTER: Optional[AccessCounter] = None
+_ACCESS_COUNTER_PID: Optional[int] = None
+_access_counter_lock = threading.Lock()
+
+
+def get_access_counter() -> AccessCounter:
+    global _ACCESS_COUNTER, _ACCESS_COUNTER_PID  # pylint: disable=global-statement
+    with _access_counter_lock:
+        if _ACCESS_COUNTER is None or _ACCESS_COUNTER_PID != os.getpid():
+            _ACCESS_COUNTER = AccessCounter()
+            _ACCESS_COUNTER_PID = os.getpid()
+        return _ACCESS_COUNTER
+
+
+def record_access(url_metadata: RepoRequest) -> None:
+    get_access_counter().record(url_metadata)
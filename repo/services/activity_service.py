@@ -0,0 +1,216 @@
+"""
+Keeps a compact record of each repo's daily commit activity, so other windows (30, 90
+or 365 days), trend charts and longer running metrics can be worked out from the
+database instead of paging through the repo's commits again.
+
+A repo's CommitActivity row holds two packed arrays with an entry for each UTC day from
+first_day on, the number of commits made that day and the number of distinct authors
+who made them, along with a space-saving sketch of the authors with the most commits.
+Each fetch that pages through commits rewrites the days of its window and keeps the
+days before it, so the record grows past the recent window the longer a repo is
+graded, up to MAX_DAYS. Days are added to the sketch once they're over, each only once.
+
+Windows are summarized in memory. Commit counts are exact and the intervals between
+commits are approximated by spreading each day's commits evenly across it, as with
+Github's statistics. The distinct authors of a window can only be bounded, by its
+busiest day below and the sum of its days above.
+"""
+import json
+import logging
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Final, List, Optional, Tuple
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from repo.data.general import SECONDS_IN_DAY, RepoRequest, Statistics
+from repo.models import CommitActivity
+from repo.services.commit_accumulator import CommitSegment, DaySummary, even_day_segment, merge
+from repo.services.commit_window_service import Watermark
+from repo.services.db_access import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+MAX_DAYS: Final = 5 * 366
+TOP_AUTHORS: Final = 32
+
+_MAX_AUTHORS_IN_A_DAY: Final = 2**16 - 1
+
+
+def _pack(values: "array[int]") -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(typecode: str, raw: bytes) -> "array[int]":
+    values = array(typecode)
+    values.frombytes(bytes(raw))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class AuthorSketch:
+    """
+    Metwally et al's space-saving sketch, the counts of the authors it holds are at most
+    their error over the real count, and any author with more commits than the smallest
+    count held is in it
+    """
+
+    def __init__(self, capacity: int = TOP_AUTHORS, counts: Optional[Dict[str, Tuple[int, int]]] = None) -> None:
+        self.capacity = capacity
+        self.counts: Dict[str, Tuple[int, int]] = dict(counts or {})  # name: (count, error)
+
+    def add(self, author: str, count: int) -> None:
+        if author in self.counts:
+            held, error = self.counts[author]
+            self.counts[author] = (held + count, error)
+        elif len(self.counts) < self.capacity:
+            self.counts[author] = (count, 0)
+        else:
+            smallest = min(self.counts, key=lambda name: self.counts[name][0])
+            floor, _ = self.counts.pop(smallest)
+            self.counts[author] = (floor + count, floor)
+
+    def top(self, count: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        The authors with the most commits and their (over) estimated commit counts
+        """
+        ranked = sorted(((author, held) for author, (held, _) in self.counts.items()), key=lambda author_count: (-author_count[1], author_count[0]))
+        return ranked[:count] if count is not None else ranked
+
+    def dump(self) -> str:
+        return json.dumps([[author, held, error] for author, (held, error) in self.counts.items()], separators=(",", ":"))
+
+    @classmethod
+    def load(cls, raw: str, capacity: int = TOP_AUTHORS) -> "AuthorSketch":
+        return cls(capacity, {author: (held, error) for author, held, error in json.loads(raw)})
+
+
+@dataclass
+class WindowActivity:
+    commit_count: int
+    active_days: int
+    author_count_low: int  # The most distinct authors on any one day
+    author_count_high: int  # The distinct authors of each day added up
+    commit_interval: Statistics  # Approximate, see the module docstring
+
+
+@dataclass
+class DailyActivity:
+    first_day: int  # Days since the epoch
+    commits: "array[int]"
+    authors: "array[int]"
+    sketch: AuthorSketch
+    sketched_through: int  # The last day added to the sketch
+
+    @property
+    def last_day(self) -> int:
+        return self.first_day + len(self.commits) - 1
+
+    @classmethod
+    def empty(cls, first_day: int) -> "DailyActivity":
+        return cls(first_day=first_day, commits=array("I"), authors=array("H"), sketch=AuthorSketch(), sketched_through=first_day - 1)
+
+    def record(self, days: Dict[int, DaySummary], first_day: int, last_day: int) -> None:
+        """
+        Replaces the days from first_day to last_day (inclusive) with those of a fetch,
+        days that had no commits are missing from `days`
+        """
+        if not self.commits:
+            self.first_day, self.sketched_through = first_day, first_day - 1
+        new_first_day = max(min(self.first_day, first_day), last_day - MAX_DAYS + 1)
+        commits = array("I", [0]) * (last_day - new_first_day + 1)
+        authors = array("H", [0]) * (last_day - new_first_day + 1)
+
+        for day in range(max(new_first_day, self.first_day), min(first_day, self.last_day + 1)):
+            commits[day - new_first_day] = self.commits[day - self.first_day]
+            authors[day - new_first_day] = self.authors[day - self.first_day]
+
+        for day, summary in days.items():
+            if max(first_day, new_first_day) <= day <= last_day:
+                commits[day - new_first_day] = summary.segment.count
+                authors[day - new_first_day] = min(len(summary.authors), _MAX_AUTHORS_IN_A_DAY)
+
+        # The last day may still be going, it's sketched by a later fetch
+        for day, summary in sorted(days.items()):
+            if self.sketched_through < day < last_day:
+                for author, count in summary.authors.items():
+                    self.sketch.add(author, count)
+        self.sketched_through = max(self.sketched_through, last_day - 1)
+
+        self.first_day, self.commits, self.authors = new_first_day, commits, authors
+
+    def commits_by_day(self, first_day: int, last_day: int) -> List[int]:
+        """
+        Commits on each day from first_day to last_day (inclusive), 0 for days before the record starts
+        """
+        return [self.commits[day - self.first_day] if self.first_day <= day <= self.last_day else 0 for day in range(first_day, last_day + 1)]
+
+    def window(self, first_day: int, last_day: int) -> WindowActivity:
+        start, end = max(first_day, self.first_day) - self.first_day, min(last_day, self.last_day) - self.first_day + 1
+        commits, authors = self.commits[start:end] if start < end else array("I"), self.authors[start:end] if start < end else array("H")
+
+        segment: Optional[CommitSegment] = None
+        for offset in reversed(range(len(commits))):
+            if commits[offset]:
+                segment = merge(segment, even_day_segment((self.first_day + start + offset) * SECONDS_IN_DAY, commits[offset]))
+        return WindowActivity(
+            commit_count=sum(commits),
+            active_days=sum(1 for count in commits if count),
+            author_count_low=max(authors, default=0),
+            author_count_high=sum(authors),
+            commit_interval=segment.statistics() if segment else Statistics(mean=0, standard_deviation=0),
+        )
+
+
+def load_activity(url_metadata: RepoRequest) -> Optional[DailyActivity]:
+    try:
+        found: CommitActivity = CommitActivity.objects.get(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo)
+    except ObjectDoesNotExist:
+        return None
+
+    try:
+        sketch = AuthorSketch.load(found.top_authors)
+    except (ValueError, TypeError):
+        logger.warning("  ignoring unreadable commit activity for: %s/%s", url_metadata.owner, url_metadata.repo)
+        return None
+    return DailyActivity(
+        first_day=found.first_day,
+        commits=_unpack("I", found.commits),
+        authors=_unpack("H", found.authors),
+        sketch=sketch,
+        sketched_through=found.sketched_through,
+    )
+
+
+def save_activity(url_metadata: RepoRequest, activity: DailyActivity) -> None:
+    CommitActivity.objects.update_or_create(
+        source=url_metadata.source,
+        owner=url_metadata.owner,
+        repo=url_metadata.repo,
+        defaults={
+            "first_day": activity.first_day,
+            "commits": _pack(activity.commits),
+            "authors": _pack(activity.authors),
+            "top_authors": activity.sketch.dump(),
+            "sketched_through": activity.sketched_through,
+        },
+    )
+
+
+@database_sync_to_async
+def record_activity(repo_request: RepoRequest, watermark: Optional[Watermark], since: int, until: int) -> None:
+    """
+    Records the days of a fetch that paged through commits from `since` to `until`
+    (epoch seconds), fetches that didn't page through commits have no watermark
+    """
+    if watermark is None:
+        return
+    activity = load_activity(repo_request) or DailyActivity.empty(since // SECONDS_IN_DAY)
+    activity.record(watermark.days, since // SECONDS_IN_DAY, until // SECONDS_IN_DAY)
+    logger.debug("  saving %s days of commit activity for: %s/%s", len(activity.commits), repo_request.owner, repo_request.repo)
+    save_activity(repo_request, activity)
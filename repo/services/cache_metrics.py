@@ -0,0 +1,56 @@
+"""
+Times each tier a grade lookup passes through (memory, shared cache, database, Github)
+so the benefit of each tier can be read off a running worker instead of guessed at.
+"""
+import logging
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Final
+
+logger = logging.getLogger(__name__)
+
+TIERS: Final = ("memory", "shared", "database", "github")
+
+
+@dataclass
+class TierMetrics:
+    lookups: int = 0
+    hits: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def mean_ms(self) -> float:
+        return 1000 * self.total_seconds / self.lookups if self.lookups else 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+_metrics: Dict[str, TierMetrics] = {tier: TierMetrics() for tier in TIERS}
+_metrics_lock = threading.Lock()
+
+
+def record_lookup(tier: str, seconds: float, hit: bool) -> None:
+    with _metrics_lock:
+        metrics = _metrics[tier]
+        metrics.lookups += 1
+        metrics.hits += int(hit)
+        metrics.total_seconds += seconds
+        metrics.max_seconds = max(metrics.max_seconds, seconds)
+    logger.debug("  %s tier %s in %.2fms", tier, "hit" if hit else "missed", 1000 * seconds)
+
+
+def tier_metrics() -> Dict[str, TierMetrics]:
+    """
+    A snapshot of the metrics for each tier since the worker started (or the last reset)
+    """
+    with _metrics_lock:
+        return {tier: replace(metrics) for tier, metrics in _metrics.items()}
+
+
+def reset_metrics() -> None:
+    with _metrics_lock:
+        for tier in TIERS:
+            _metrics[tier] = TierMetrics()
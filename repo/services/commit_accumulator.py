@@ -0,0 +1,253 @@
+"""
+Folds pages of commits into running totals as they arrive, instead of holding every
+commit until the last page lands.
+
+Each page is reduced to a CommitSegment per day, the count, date range and interval
+statistics of that day's commits. Days of neighbouring pages merge as soon as both
+pages have arrived, and whatever is left once every page is in merges in date order,
+so memory depends on how many days the window has rather than how many commits.
+
+Commits are placed by their committer date. Github lists history newest commit first by
+that date, so every page is wholly older than the one before it, while author dates of
+rebased or cherry-picked commits can reach back past the next page.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from repo.data.from_source import TimeData
+from repo.data.general import SECONDS_IN_DAY, Statistics
+from repo.data.github import Commit
+from repo.services.commit_timeline import CommitTimeline, github_date_to_epoch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CommitSegment:
+    """
+    A run of consecutive commits, the intervals between them are summarized with
+    Welford's running mean and sum of squared differences
+    """
+
+    newest: int  # Epoch seconds
+    oldest: int
+    count: int
+    interval_count: int = 0
+    interval_mean: float = 0.0
+    interval_sum_squares: float = 0.0
+
+    def statistics(self) -> Statistics:
+        if self.interval_count == 0:
+            return Statistics(mean=0, standard_deviation=0)
+        if self.interval_count == 1:
+            return Statistics(mean=self.interval_mean, standard_deviation=0.0)
+        return Statistics(mean=self.interval_mean, standard_deviation=(self.interval_sum_squares / (self.interval_count - 1)) ** 0.5)
+
+
+_Moments = Tuple[int, float, float]  # count, mean, sum of squared differences
+
+
+def _combine(moments_a: _Moments, moments_b: _Moments) -> _Moments:
+    """
+    Chan et al's parallel variance merge
+    """
+    count_a, mean_a, sum_squares_a = moments_a
+    count_b, mean_b, sum_squares_b = moments_b
+    count = count_a + count_b
+    if count == 0:
+        return 0, 0.0, 0.0
+    difference = mean_b - mean_a
+    mean = mean_a + difference * count_b / count
+    sum_squares = sum_squares_a + sum_squares_b + difference * difference * count_a * count_b / count
+    return count, mean, sum_squares
+
+
+def summarize(timeline: CommitTimeline) -> Optional[CommitSegment]:
+    """
+    Summarizes the commits of a single page
+    """
+    if not timeline:
+        return None
+
+    interval_count, interval_mean, interval_sum_squares = timeline.interval_moments()
+    return CommitSegment(
+        newest=max(timeline.epochs),
+        oldest=min(timeline.epochs),
+        count=len(timeline),
+        interval_count=interval_count,
+        interval_mean=interval_mean,
+        interval_sum_squares=interval_sum_squares,
+    )
+
+
+def merge(newer: Optional[CommitSegment], older: Optional[CommitSegment]) -> Optional[CommitSegment]:
+    """
+    Joins two segments, adding the interval between the oldest commit of the newer
+    segment and the newest commit of the older one
+    """
+    if newer is None or older is None:
+        return newer or older
+
+    # Committer dates only run backwards across pages on a skewed clock, never count a negative interval
+    boundary = max(newer.oldest - older.newest, 0)
+    moments = _combine((newer.interval_count, newer.interval_mean, newer.interval_sum_squares), (1, boundary, 0.0))
+    count, mean, sum_squares = _combine(moments, (older.interval_count, older.interval_mean, older.interval_sum_squares))
+
+    return CommitSegment(
+        newest=max(newer.newest, older.newest),
+        oldest=min(newer.oldest, older.oldest),
+        count=newer.count + older.count,
+        interval_count=count,
+        interval_mean=mean,
+        interval_sum_squares=sum_squares,
+    )
+
+
+def even_day_segment(day_start: int, count: int) -> CommitSegment:
+    """
+    The commits of a day known only by their number, taken to be spread evenly across it
+    """
+    spacing = SECONDS_IN_DAY / count
+    return CommitSegment(
+        newest=day_start + int(spacing * (count - 1)),
+        oldest=day_start,
+        count=count,
+        interval_count=count - 1,
+        interval_mean=spacing if count > 1 else 0.0,
+    )
+
+
+@dataclass
+class RecentActivity:
+    """
+    What grading needs from the recent window, however the commits were counted
+    """
+
+    newest_commit: Optional[int]  # Epoch seconds
+    time_recent: TimeData
+
+
+@dataclass
+class DaySummary:
+    """
+    The commits made on one UTC day
+    """
+
+    segment: CommitSegment
+    authors: Dict[str, int]
+
+
+def merge_days(newer: DaySummary, older: DaySummary) -> DaySummary:
+    authors = dict(newer.authors)
+    for author, count in older.authors.items():
+        authors[author] = authors.get(author, 0) + count
+    segment = merge(newer.segment, older.segment)
+    assert segment  # Neither side is empty
+    return DaySummary(segment=segment, authors=authors)
+
+
+def _merge_runs(newer: Dict[int, DaySummary], older: Dict[int, DaySummary]) -> Dict[int, DaySummary]:
+    days = dict(older)
+    for day, summary in newer.items():
+        days[day] = merge_days(summary, days[day]) if day in days else summary
+    return days
+
+
+@dataclass
+class _Run:
+    first_page: int
+    last_page: int
+    days: Dict[int, DaySummary]
+
+
+class CommitAccumulator:
+    """
+    Pages are numbered the way Github numbers them, page 1 holds the newest commits.
+
+    Totals are kept per UTC day (days since the epoch) so that a later refresh can
+    drop the days that have left the window and fold new commits onto the rest, see
+    commit_window_service.
+    """
+
+    def __init__(self) -> None:
+        self._runs_by_first: Dict[int, _Run] = {}
+        self._runs_by_last: Dict[int, _Run] = {}
+        self._seeded: Dict[int, DaySummary] = {}
+
+    def seed(self, days: Dict[int, DaySummary]) -> None:
+        """
+        Starts from previously accumulated days, every page added afterwards must hold newer commits
+        """
+        self._seeded = dict(days)
+
+    def add_page(self, page: int, commits: Iterable[Tuple[str, int]]) -> None:
+        """
+        Folds in a page of (author name, commit date in epoch seconds) pairs
+        """
+        days: Dict[int, DaySummary] = {}
+        for day, timeline in CommitTimeline(commits).by_day().items():
+            segment = summarize(timeline)
+            assert segment  # by_day never returns an empty day
+            days[day] = DaySummary(segment=segment, authors=timeline.commits_by_author())
+        run = _Run(first_page=page, last_page=page, days=days)
+
+        newer = self._runs_by_last.pop(page - 1, None)
+        if newer:
+            del self._runs_by_first[newer.first_page]
+            run = _Run(first_page=newer.first_page, last_page=run.last_page, days=_merge_runs(newer.days, run.days))
+
+        older = self._runs_by_first.pop(page + 1, None)
+        if older:
+            del self._runs_by_last[older.last_page]
+            run = _Run(first_page=run.first_page, last_page=older.last_page, days=_merge_runs(run.days, older.days))
+
+        self._runs_by_first[run.first_page] = run
+        self._runs_by_last[run.last_page] = run
+        logger.debug("  folded in commit page %s, %s runs pending", page, len(self._runs_by_first))
+
+    def add_commits(self, page: int, commits: Iterable[Commit]) -> None:
+        """
+        Folds in a page of commits from Github, by author name and committer date
+        """
+        self.add_page(page, ((commit.author.name, github_date_to_epoch(commit.committed_at)) for commit in commits))
+
+    def days(self) -> Dict[int, DaySummary]:
+        """
+        Merges whatever runs are left, newest day first
+        """
+        summaries = [summary for run in self._runs_by_first.values() for summary in run.days.items()]
+        summaries.extend(self._seeded.items())
+        summaries.sort(key=lambda day_summary: day_summary[1].segment.newest, reverse=True)
+
+        days: Dict[int, DaySummary] = {}
+        for day, summary in summaries:
+            days[day] = merge_days(days[day], summary) if day in days else summary
+        return dict(sorted(days.items(), reverse=True))
+
+    def segment(self) -> Optional[CommitSegment]:
+        merged: Optional[CommitSegment] = None
+        for summary in self.days().values():
+            merged = merge(merged, summary.segment)
+        return merged
+
+    def commits_by_author(self) -> Dict[str, int]:
+        commits_by_author: Dict[str, int] = {}
+        for summary in self.days().values():
+            for author, count in summary.authors.items():
+                commits_by_author[author] = commits_by_author.get(author, 0) + count
+        return commits_by_author
+
+    def time_data(self) -> TimeData:
+        segment = self.segment()
+        commits_by_author = self.commits_by_author()
+        return TimeData(
+            commit_count=segment.count if segment else 0,
+            commit_count_primary_author=max(commits_by_author.values(), default=0),
+            commit_interval=segment.statistics() if segment else Statistics(mean=0, standard_deviation=0),
+            author_count=len(commits_by_author),
+        )
+
+    def activity(self) -> RecentActivity:
+        segment = self.segment()
+        return RecentActivity(newest_commit=segment.newest if segment else None, time_recent=self.time_data())
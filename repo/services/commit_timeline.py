@@ -0,0 +1,142 @@
+"""
+A compact, columnar list of commits shared by every source of commit data.
+
+Commit dates are kept as int64 epoch seconds in an array and authors as interned ids
+in a parallel array, so a large history costs 16 bytes a commit rather than a Python
+object each. The statistics run over whole columns with C level builtins (sorted, map,
+sum, Counter) and integer arithmetic, which keeps them exact and avoids a Python level
+loop per commit. Numpy would do the same but isn't worth a dependency for this.
+"""
+import logging
+import math
+import operator
+from array import array
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from repo.data.from_source import TimeData
+from repo.data.general import SECONDS_IN_DAY, Statistics
+
+logger = logging.getLogger(__name__)
+
+
+def github_date_to_epoch(date_str: str) -> int:
+    """
+    Github dates are ISO 8601, fromisoformat parses them far faster than strptime
+    """
+    if date_str.endswith("Z"):
+        date_str = date_str[:-1] + "+00:00"
+    return int(datetime.fromisoformat(date_str).timestamp())
+
+
+class CommitTimeline:
+    """
+    Commits in whatever order they were added, (author, epoch seconds)
+    """
+
+    def __init__(self, commits: Iterable[Tuple[str, int]] = ()) -> None:
+        self.epochs = array("q")
+        self.author_ids = array("l")
+        self.author_names: List[str] = []
+        self._ids_by_name: Dict[str, int] = {}
+        self.extend(commits)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def _author_id(self, name: str) -> int:
+        author_id = self._ids_by_name.get(name)
+        if author_id is None:
+            author_id = len(self.author_names)
+            self._ids_by_name[name] = author_id
+            self.author_names.append(name)
+        return author_id
+
+    def append(self, author: str, epoch: int) -> None:
+        self.epochs.append(epoch)
+        self.author_ids.append(self._author_id(author))
+
+    def extend(self, commits: Iterable[Tuple[str, int]]) -> None:
+        for author, epoch in commits:
+            self.append(author, epoch)
+
+    def since(self, epoch: int) -> "CommitTimeline":
+        """
+        The commits made at or after the given time
+        """
+        recent = CommitTimeline()
+        recent.extend((self.author_names[author_id], date) for author_id, date in zip(self.author_ids, self.epochs) if date >= epoch)
+        return recent
+
+    def by_day(self) -> Dict[int, "CommitTimeline"]:
+        """
+        Splits the commits up by the UTC day they were made on, counted in days since the epoch
+        """
+        days: Dict[int, CommitTimeline] = {}
+        for author_id, epoch in zip(self.author_ids, self.epochs):
+            day = epoch // SECONDS_IN_DAY
+            if day not in days:
+                days[day] = CommitTimeline()
+            days[day].append(self.author_names[author_id], epoch)
+        return days
+
+    def newest(self) -> int:
+        return max(self.epochs)
+
+    def intervals(self) -> array:  # type: ignore[type-arg]
+        """
+        Seconds between each commit and the one before it, newest first
+        """
+        ordered = array("q", sorted(self.epochs, reverse=True))
+        return array("q", map(operator.sub, ordered, islice(ordered, 1, None)))
+
+    def interval_moments(self) -> Tuple[int, float, float]:
+        """
+        The count, mean and sum of squared differences from the mean of the intervals
+        """
+        intervals = self.intervals()
+        count = len(intervals)
+        if count == 0:
+            return 0, 0.0, 0.0
+        total = sum(intervals)
+        squares = sum(map(operator.mul, intervals, intervals))
+        # Python ints don't overflow so this is exact up to the final division
+        return count, total / count, (count * squares - total * total) / count
+
+    def interval_statistics(self) -> Statistics:
+        count, mean, sum_squares = self.interval_moments()
+        if count == 0:
+            return Statistics(mean=0, standard_deviation=0)
+        if count == 1:
+            return Statistics(mean=mean, standard_deviation=0.0)
+        return Statistics(mean=mean, standard_deviation=math.sqrt(sum_squares / (count - 1)))
+
+    def interval_percentiles(self, percents: Sequence[float]) -> List[float]:
+        """
+        Linearly interpolated percentiles of the intervals, the same as numpy's default
+        """
+        ordered = sorted(self.intervals())
+        if not ordered:
+            return [0.0 for _ in percents]
+
+        results = []
+        for percent in percents:
+            position = (len(ordered) - 1) * percent / 100
+            lower = math.floor(position)
+            upper = min(lower + 1, len(ordered) - 1)
+            results.append(ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower))
+        return results
+
+    def commits_by_author(self) -> Dict[str, int]:
+        return {self.author_names[author_id]: count for author_id, count in Counter(self.author_ids).items()}
+
+    def time_data(self) -> TimeData:
+        commits_by_author = self.commits_by_author()
+        return TimeData(
+            commit_count=len(self),
+            commit_count_primary_author=max(commits_by_author.values(), default=0),
+            commit_interval=self.interval_statistics(),
+            author_count=len(commits_by_author),
+        )
@@ -0,0 +1,123 @@
+"""
+Keeps the recent commit window of each repo between fetches so a refresh only has
+to fetch the commits made since the last one.
+
+A watermark is the newest commit we've seen on the default branch, its committer
+date (which Github's `since` filters on) and the per day totals of every commit in
+the window up to it. A refresh asks Github for commits since that date, keeps those
+listed before the watermark commit, drops the days that have left the window and
+folds the new commits onto what's left. If the watermark commit isn't returned the
+branch was rewritten, so the whole window is fetched again instead.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+from django.core.exceptions import ObjectDoesNotExist
+
+from repo.data.general import RepoRequest, SECONDS_IN_DAY
+from repo.data.github import Commit
+from repo.models import CommitWatermark
+from repo.services.commit_accumulator import CommitSegment, DaySummary
+from repo.services.commit_timeline import github_date_to_epoch
+from repo.services.db_access import database_sync_to_async
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Watermark:
+    sha: str
+    committed_at: int  # Epoch seconds
+    days: Dict[int, DaySummary]
+
+
+def dump_days(days: Dict[int, DaySummary]) -> str:
+    return json.dumps(
+        {
+            str(day): [
+                summary.segment.newest,
+                summary.segment.oldest,
+                summary.segment.count,
+                summary.segment.interval_count,
+                summary.segment.interval_mean,
+                summary.segment.interval_sum_squares,
+                summary.authors,
+            ]
+            for day, summary in days.items()
+        },
+        separators=(",", ":"),
+    )
+
+
+def load_days(raw: str) -> Dict[int, DaySummary]:
+    days: Dict[int, DaySummary] = {}
+    for day, (newest, oldest, count, interval_count, interval_mean, interval_sum_squares, authors) in json.loads(raw).items():
+        segment = CommitSegment(
+            newest=newest,
+            oldest=oldest,
+            count=count,
+            interval_count=interval_count,
+            interval_mean=interval_mean,
+            interval_sum_squares=interval_sum_squares,
+        )
+        days[int(day)] = DaySummary(segment=segment, authors=authors)
+    return days
+
+
+def trim_days(days: Dict[int, DaySummary], since: int) -> Dict[int, DaySummary]:
+    """
+    Drops the days before the one `since` (epoch seconds) falls on
+    """
+    first_day = since // SECONDS_IN_DAY
+    return {day: summary for day, summary in days.items() if day >= first_day}
+
+
+def commits_after_watermark(commits: Sequence[Commit], sha: str) -> Optional[List[Commit]]:
+    """
+    Returns the commits listed before the watermark commit, or None if it isn't in the list
+    """
+    for index, commit in enumerate(commits):
+        if commit.sha == sha:
+            return list(commits[:index])
+    return None
+
+
+def advance(previous: Optional[Watermark], newest: Optional[Commit], days: Dict[int, DaySummary]) -> Optional[Watermark]:
+    """
+    The watermark after a fetch, newest is the first commit that fetch listed, if any
+    """
+    if newest:
+        return Watermark(sha=newest.sha, committed_at=github_date_to_epoch(newest.committed_at), days=days)
+    if previous:
+        return Watermark(sha=previous.sha, committed_at=previous.committed_at, days=days)
+    return None
+
+
+@database_sync_to_async
+def load_watermark(repo_request: RepoRequest) -> Optional[Watermark]:
+    try:
+        found: CommitWatermark = CommitWatermark.objects.get(source=repo_request.source, owner=repo_request.owner, repo=repo_request.repo)
+    except ObjectDoesNotExist:
+        return None
+
+    try:
+        days = load_days(found.days)
+    except (ValueError, TypeError):
+        logger.warning("  ignoring unreadable commit watermark for: %s/%s", repo_request.owner, repo_request.repo)
+        return None
+    return Watermark(sha=found.sha, committed_at=found.committed_at, days=days)
+
+
+@database_sync_to_async
+def save_watermark(repo_request: RepoRequest, watermark: Optional[Watermark]) -> None:
+    if watermark is None:
+        return
+    logger.debug("  saving commit watermark %s for: %s/%s", watermark.sha, repo_request.owner, repo_request.repo)
+    CommitWatermark.objects.update_or_create(
+        source=repo_request.source,
+        owner=repo_request.owner,
+        repo=repo_request.repo,
+        defaults={"sha": watermark.sha, "committed_at": watermark.committed_at, "days": dump_days(watermark.days)},
+    )
@@ -0,0 +1,34 @@
+"""
+Database access from fetches running outside a request, such as those on the Github I/O
+runtime's loop or in grade workers.
+
+Django closes connections that have gone bad or outlived CONN_MAX_AGE when a request
+starts and finishes. sync_to_async runs code that isn't part of a request on asgiref's
+shared thread, whose connection those signals never reach, so once the database drops
+it (an idle timeout, a restart or a failover) every later query on that thread fails.
+database_sync_to_async does the same check around each call instead.
+"""
+import functools
+from typing import Any, Callable, Coroutine, ParamSpec, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+def database_sync_to_async(function: Callable[P, T]) -> Callable[P, Coroutine[Any, Any, T]]:
+    """
+    sync_to_async for functions that use the ORM, replacing the thread's connection if it's unusable or too old
+    """
+
+    @functools.wraps(function)
+    def with_usable_connection(*args: P.args, **kwargs: P.kwargs) -> T:
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(with_usable_connection)
@@ -1,46 +1,191 @@
 import logging
-from datetime import datetime, timedelta
+import time
+from datetime import date, datetime, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, List, Optional, Sequence, Tuple, Union, cast
 
-from packaging.version import parse as parse_version
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q
 
 from repo.data.general import Statistics, RepoRequest
 from repo.data.git_data import (
+    SCHEMA_VERSION,
     GitData,
     CommitData,
+    CommitTotalData,
     PullRequestData,
     ContributorData,
     PopularityData,
 )
+from repo.data.grade import GradedRepo, TestGrades
 from repo.models import CacheData
-from repo.services.errors import CacheMiss
+from repo.services.cache_metrics import record_lookup
+from repo.services.errors import CacheMiss, StaleCache
+from repo.services.grade_calculator_service import calculate_grade
+from repo.services.memory_cache_service import get_memory_cache
+from repo.services.shared_cache_service import get_shared_cache
 
 logger = logging.getLogger(__name__)
 
 RECENT_DAYS = 30
 
+_QUERY_CHUNK = 100
 
-def check_cache(current_version: str, url_metadata: RepoRequest) -> GitData:
+
+def row_expiry(row_updated_date: date) -> float:
+    """
+    The moment a row stops passing the freshness check in check_cache
+    """
+    return datetime.combine(row_updated_date + timedelta(days=RECENT_DAYS + 1), datetime.min.time()).timestamp()
+
+
+def _check_front_tiers(current_version: str, url_metadata: RepoRequest) -> Optional[GradedRepo]:
+    memory_cache = get_memory_cache()
+    shared_cache = get_shared_cache()
+
+    if memory_cache is not None:
+        start = time.perf_counter()
+        graded = memory_cache.get(current_version, url_metadata)
+        record_lookup("memory", time.perf_counter() - start, hit=graded is not None)
+        if graded:
+            logger.info("Found data in memory for: %s", url_metadata)
+            return graded
+
+    if shared_cache is not None:
+        start = time.perf_counter()
+        shared = shared_cache.get(current_version, url_metadata)
+        record_lookup("shared", time.perf_counter() - start, hit=shared is not None)
+        if shared:
+            logger.info("Found data in the shared cache for: %s", url_metadata)
+            graded, fresh_until = shared
+            if memory_cache is not None:
+                memory_cache.put(current_version, url_metadata, graded, fresh_until=fresh_until)
+            return graded
+    return None
+
+
+def _graded_from_row(current_version: str, url_metadata: RepoRequest, found: Optional[CacheData], start: float) -> GradedRepo:
+    try:
+        git_data, row_updated_date, fresh = _check_database(url_metadata, found)
+    except CacheMiss:
+        record_lookup("database", time.perf_counter() - start, hit=False)
+        raise
+    record_lookup("database", time.perf_counter() - start, hit=fresh)
+
+    graded = GradedRepo(data=git_data, grades=calculate_grade(git_data))
+    if not fresh:
+        logger.info("Found stale data from %s for: %s", row_updated_date, url_metadata)
+        raise StaleCache(graded, row_updated_date)
+    _remember(current_version, url_metadata, graded, row_expiry(row_updated_date))
+    return graded
+
+
+def check_graded_cache(current_version: str, url_metadata: RepoRequest) -> GradedRepo:
+    """
+    Looks for the repo in each tier in turn, memory then the shared cache then the
+    database, and copies what's found into the tiers in front of it
+    """
     logger.debug("Checking cache for existing data: %s", url_metadata)
+    graded = _check_front_tiers(current_version, url_metadata)
+    if graded:
+        return graded
 
+    start = time.perf_counter()
     try:
-        found: CacheData = CacheData.objects.get_by_natural_key(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo)
-    except ObjectDoesNotExist as object_does_not_exist:
-        raise CacheMiss() from object_does_not_exist
+        found: Optional[CacheData] = CacheData.objects.get_by_natural_key(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo)
+    except ObjectDoesNotExist:
+        found = None
+    return _graded_from_row(current_version, url_metadata, found, start)
+
+
+async def acheck_graded_cache(current_version: str, url_metadata: RepoRequest) -> GradedRepo:
+    """
+    check_graded_cache for async views. The database is read with the async ORM, and
+    the shared cache, whose backends block, from a thread when it's configured
+    """
+    logger.debug("Checking cache for existing data: %s", url_metadata)
+    blocking = get_shared_cache() is not None
+    graded: Optional[GradedRepo] = await sync_to_async(_check_front_tiers)(current_version, url_metadata) if blocking else _check_front_tiers(current_version, url_metadata)
+    if graded:
+        return graded
+
+    start = time.perf_counter()
+    try:
+        found: Optional[CacheData] = await CacheData.objects.aget(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo)
+    except ObjectDoesNotExist:
+        found = None
+    if blocking:
+        return cast(GradedRepo, await sync_to_async(_graded_from_row)(current_version, url_metadata, found, start))
+    return _graded_from_row(current_version, url_metadata, found, start)
+
+
+def check_graded_cache_many(current_version: str, url_metadatas: Sequence[RepoRequest]) -> List[Union[GradedRepo, CacheMiss]]:
+    """
+    check_graded_cache for many repos at once, those missing from the tiers in front are
+    read from the database together. Each repo gets its grades, or the CacheMiss (or
+    StaleCache) check_graded_cache would have raised for it
+    """
+    front = [_check_front_tiers(current_version, url_metadata) for url_metadata in url_metadatas]
+    missing = [url_metadata for url_metadata, graded in zip(url_metadatas, front) if graded is None]
+
+    start = time.perf_counter()
+    rows: Dict[Tuple[str, str, str], CacheData] = {}
+    for chunk_start in range(0, len(missing), _QUERY_CHUNK):
+        matching = reduce(
+            or_, (Q(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo) for url_metadata in missing[chunk_start : chunk_start + _QUERY_CHUNK])
+        )
+        for row in CacheData.objects.filter(matching):
+            rows[(row.source, row.owner, row.repo)] = row
+
+    results: List[Union[GradedRepo, CacheMiss]] = []
+    for url_metadata, graded in zip(url_metadatas, front):
+        if graded is None:
+            try:
+                graded = _graded_from_row(current_version, url_metadata, rows.get((url_metadata.source, url_metadata.owner, url_metadata.repo)), start)
+            except CacheMiss as miss:
+                results.append(miss)
+                continue
+        results.append(graded)
+    return results
+
+
+def check_cache(current_version: str, url_metadata: RepoRequest) -> GitData:
+    return check_graded_cache(current_version, url_metadata).data
+
+
+def _servable_while_stale(row_updated_date: date) -> bool:
+    max_days = settings.GITGRADE_STALE_MAX_DAYS
+    return max_days > 0 and row_updated_date >= date.today() - timedelta(days=max_days)
+
+
+def _check_database(url_metadata: RepoRequest, found: Optional[CacheData]) -> Tuple[GitData, date, bool]:
+    """
+    The cached data in the repo's row, when it was updated and whether it's still fresh. Stale rows
+    are only returned while they're within settings.GITGRADE_STALE_MAX_DAYS.
+
+    Rows outlive the version of the app that wrote them, the grades are calculated
+    from the data on every read, unless the data was collected under an older
+    SCHEMA_VERSION.
+    """
+    if found is None:
+        raise CacheMiss()
     logger.info("Found cached data for: %s", url_metadata)
 
     recent = datetime.today() - timedelta(days=RECENT_DAYS)
     logger.debug("type for found.row_updated_date: %s", type(found.row_updated_date))
     logger.debug("type for recent: %s", type(recent))
-    if found.row_updated_date < recent.date():
+    if found.schema_version < SCHEMA_VERSION:
+        logger.info("Cached data for %s is from schema %s, now %s", url_metadata, found.schema_version, SCHEMA_VERSION)
         raise CacheMiss()
 
-    current_version_parsed = parse_version(current_version)
-    found_version_parsed = parse_version(found.version)
-    if current_version_parsed > found_version_parsed:
+    fresh = found.row_updated_date >= recent.date()
+    if not fresh and not _servable_while_stale(found.row_updated_date):
         raise CacheMiss()
 
-    return GitData(
+    git_data = GitData(
         # code=CodeData(
         #     lines_of_code=found.code_lines_of_code,
         #     file_count=found.code_file_count,
@@ -57,6 +202,10 @@ def check_cache(current_version: str, url_metadata: RepoRequest) -> GitData:
         #         standard_deviation=found.commit_all_interval_standard_deviation,
         #     ),
         # ),
+        commit_all=CommitTotalData(
+            count=found.commit_all_count,
+            count_primary_author=found.commit_all_count_primary_author,
+        ),
         commit_recent=CommitData(
             count=found.commit_recent_count,
             count_primary_author=found.commit_recent_count_primary_author,
@@ -68,7 +217,7 @@ def check_cache(current_version: str, url_metadata: RepoRequest) -> GitData:
         contributor=ContributorData(
             days_since_create=found.contributor_days_since_create,
             days_since_commit=found.contributor_days_since_commit,
-            # author_count_all=found.contributor_author_count_all,
+            author_count_all=found.contributor_author_count_all,
             author_count_recent=found.contributor_author_count_recent,
         ),
         popularity=PopularityData(
@@ -76,53 +225,65 @@ def check_cache(current_version: str, url_metadata: RepoRequest) -> GitData:
             open_issue_count=found.popularity_open_issue_count,
         ),
     )
+    return git_data, found.row_updated_date, fresh
+
+
+def _remember(version: str, url_metadata: RepoRequest, graded: GradedRepo, fresh_until: float) -> None:
+    memory_cache = get_memory_cache()
+    if memory_cache is not None:
+        memory_cache.invalidate(url_metadata)
+        memory_cache.put(version, url_metadata, graded, fresh_until=fresh_until)
+
+    shared_cache = get_shared_cache()
+    if shared_cache is not None:
+        shared_cache.put(version, url_metadata, graded, fresh_until=fresh_until)
 
 
 def patch_cache(
     version: str,
     url_metadata: RepoRequest,
     data: GitData,
+    grades: Optional[TestGrades] = None,
 ) -> None:
+    """
+    Writes the data through every tier, grades are calculated if they aren't passed in
+    """
     logger.debug("Updating cached data for: %s", url_metadata)
     logger.debug("  data: %s", data)
 
-    try:
-        found: CacheData = CacheData.objects.get_by_natural_key(source=url_metadata.source, owner=url_metadata.owner, repo=url_metadata.repo)
-        found.version = version
-
-        # UrlMetadata + Primary Key
-        found.source = url_metadata.source
-        found.owner = url_metadata.owner
-        found.repo = url_metadata.repo
-
-        # Data
-        # found.code_lines_of_code = data.code.lines_of_code
-        # found.code_file_count = data.code.file_count
-
-        found.pull_request_count_open = data.pull_request.count_open
-        found.pull_request_count = data.pull_request.count
-
-        # found.commit_all_count = data.commit_all.count
-        # found.commit_all_count_primary_author = data.commit_all.count_primary_author
-        # found.commit_all_interval_mean = data.commit_all.interval.mean
-        # found.commit_all_interval_standard_deviation = (
-        #     data.commit_all.interval.standard_deviation
-        # )
-
-        found.commit_recent_count = data.commit_recent.count
-        found.commit_recent_count_primary_author = data.commit_recent.count_primary_author
-        found.commit_recent_interval_mean = data.commit_recent.interval.mean
-        found.commit_recent_interval_standard_deviation = data.commit_recent.interval.standard_deviation
-
-        found.contributor_days_since_create = data.contributor.days_since_create
-        found.contributor_days_since_commit = data.contributor.days_since_commit
-        # found.contributor_author_count_all = data.contributor.author_count_all
-        found.contributor_author_count_recent = data.contributor.author_count_recent
-
-        found.popularity_watcher_count = data.popularity.watcher_count
-        found.popularity_open_issue_count = data.popularity.open_issue_count
-
-        found.save()
-    except ObjectDoesNotExist:
-        git_repo_data = CacheData.objects.create_git_repo_data(version=version, url_metadata=url_metadata, data=data)
-        git_repo_data.save()
+    CacheData.objects.upsert_git_repo_data([(version, url_metadata, data)])
+
+    graded = GradedRepo(data=data, grades=grades or calculate_grade(data))
+    _remember(version, url_metadata, graded, row_expiry(date.today()))
+
+
+async def apatch_cache(
+    version: str,
+    url_metadata: RepoRequest,
+    data: GitData,
+    grades: Optional[TestGrades] = None,
+) -> None:
+    """
+    patch_cache for async views
+    """
+    logger.debug("Updating cached data for: %s", url_metadata)
+    await CacheData.objects.aupsert_git_repo_data([(version, url_metadata, data)])
+
+    graded = GradedRepo(data=data, grades=grades or calculate_grade(data))
+    if get_shared_cache() is not None:
+        await sync_to_async(_remember)(version, url_metadata, graded, row_expiry(date.today()))
+    else:
+        _remember(version, url_metadata, graded, row_expiry(date.today()))
+
+
+def patch_cache_many(rows: Sequence[Tuple[str, RepoRequest, GitData]]) -> None:
+    """
+    Writes (version, url_metadata, data) rows through every tier, upserting them into
+    the database together, for jobs refreshing many repos at once
+    """
+    logger.debug("Updating cached data for %s repos", len(rows))
+    CacheData.objects.upsert_git_repo_data(rows)
+
+    fresh_until = row_expiry(date.today())
+    for version, url_metadata, data in rows:
+        _remember(version, url_metadata, GradedRepo(data=data, grades=calculate_grade(data)), fresh_until)
@@ -1,3 +1,8 @@
+from datetime import date
+
+from repo.data.grade import GradedRepo
+
+
 class UnsupportedURL(Exception):
     """
     A URL was provided for a git repo that's not supported
@@ -20,3 +25,26 @@ class InvalidRequest(Exception):
     """
     Something about the request was invalid but there's something the user can do to fix it
     """
+
+
+class RateLimitExhausted(Exception):
+    """
+    Github's rate limit for this token is used up and won't reset soon enough to wait for it
+    """
+
+
+class StaleCache(CacheMiss):
+    """
+    The cached data is out of date but recent enough to show while it's refreshed
+    """
+
+    def __init__(self, graded: GradedRepo, row_updated_date: date) -> None:
+        super().__init__()
+        self.graded = graded
+        self.row_updated_date = row_updated_date
+
+
+class FetchTimedOut(Exception):
+    """
+    Waited too long on another request fetching the same repo
+    """
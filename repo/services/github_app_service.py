@@ -0,0 +1,147 @@
+"""
+Authenticates as a Github App installation, whose rate limit is well above a single
+user's and grows with the size of the organization it's installed on.
+
+A short lived JWT signed with the app's private key is exchanged for an installation
+token, which lasts an hour. The token is cached until shortly before it expires and,
+when the I/O runtime is running, refreshed ahead of time in the background so fetches
+never wait on the exchange. The installation token joins the token pool alongside any
+service tokens.
+
+More info: https://docs.github.com/en/apps/creating-github-apps/authenticating-with-a-github-app
+"""
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional
+from weakref import WeakKeyDictionary
+
+import jwt
+from aiohttp import ClientError, ClientSession
+from django.conf import settings
+
+from repo.services.rate_limit_service import token_key
+
+logger = logging.getLogger(__name__)
+
+# Github rejects JWTs that live longer than 10 minutes, or are issued in its future
+JWT_LIFETIME = 540
+JWT_CLOCK_DRIFT = 60
+
+# After a failed exchange fetches carry on without the app token for a while rather than retrying every request
+RETRY_PAUSE = 60
+
+
+def make_jwt(app_id: str, private_key: str, now: Optional[float] = None) -> str:
+    now = time.time() if now is None else now
+    payload = {"iat": int(now - JWT_CLOCK_DRIFT), "exp": int(now + JWT_LIFETIME), "iss": app_id}
+    return jwt.encode(payload, private_key, algorithm="RS256")
+
+
+@dataclass
+class InstallationToken:
+    token: str
+    expires_at: float  # Epoch seconds
+
+
+class GithubAppAuth:
+    """
+    The cached token is shared by every event loop in the process, each loop
+    refreshes it at most once at a time
+    """
+
+    def __init__(self, app_id: str, private_key: str, installation_id: str, refresh_margin: float) -> None:
+        self.app_id = app_id
+        self.private_key = private_key
+        self.installation_id = installation_id
+        self.refresh_margin = refresh_margin
+        self._token: Optional[InstallationToken] = None
+        self._unavailable_until = 0.0
+        self._token_lock = threading.Lock()
+        self._refresh_locks: "WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = WeakKeyDictionary()
+
+    def cached(self) -> Optional[str]:
+        """
+        The current token, as long as it isn't about to expire
+        """
+        with self._token_lock:
+            token = self._token
+        if token and token.expires_at - self.refresh_margin > time.time():
+            return token.token
+        return None
+
+    async def _exchange(self, session: ClientSession) -> InstallationToken:
+        headers = {"Authorization": f"Bearer {make_jwt(self.app_id, self.private_key)}", "Accept": "application/vnd.github+json"}
+        async with session.post(f"/app/installations/{self.installation_id}/access_tokens", headers=headers) as response:
+            response_json: Dict[str, str] = await response.json()
+        expires_at = datetime.fromisoformat(response_json["expires_at"].replace("Z", "+00:00")).timestamp()
+        return InstallationToken(token=response_json["token"], expires_at=expires_at)
+
+    async def token(self, session: ClientSession) -> Optional[str]:
+        """
+        Returns the cached token, exchanging a new JWT for one first if it's about to expire.
+        None if the exchange failed recently.
+        """
+        cached = self.cached()
+        if cached or time.time() < self._unavailable_until:
+            return cached
+        return await self.refresh(session, only_if_stale=True)
+
+    async def refresh(self, session: ClientSession, only_if_stale: bool = False) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        lock = self._refresh_locks.setdefault(loop, asyncio.Lock())
+        async with lock:
+            # Someone else may have refreshed while we waited for the lock
+            cached = self.cached()
+            if only_if_stale and (cached or time.time() < self._unavailable_until):
+                return cached
+
+            try:
+                installation_token = await self._exchange(session)
+            except (ClientError, KeyError, ValueError):
+                logger.exception("Unable to get a Github App installation token, continuing without it for %ss", RETRY_PAUSE)
+                self._unavailable_until = time.time() + RETRY_PAUSE
+                return cached
+            with self._token_lock:
+                self._token = installation_token
+            logger.info("Refreshed Github App installation token %s, expires in %.0fs", token_key(installation_token.token), installation_token.expires_at - time.time())
+            return installation_token.token
+
+    async def refresh_forever(self, session: ClientSession) -> None:
+        """
+        Replaces the token a margin ahead of when cached() would stop returning it, until cancelled
+        """
+        while True:
+            if await self.refresh(session) is None:
+                await asyncio.sleep(RETRY_PAUSE)
+                continue
+
+            with self._token_lock:
+                expires_at = self._token.expires_at if self._token else 0.0
+            await asyncio.sleep(max(expires_at - 2 * self.refresh_margin - time.time(), 0.0))
+
+
+_APP_AUTH: Optional[GithubAppAuth] = None
+_app_auth_lock = threading.Lock()
+
+
+def get_app_auth() -> Optional[GithubAppAuth]:
+    """
+    Returns the process's app credentials, or None if no Github App is configured
+    """
+    global _APP_AUTH  # pylint: disable=global-statement
+    if not (settings.GITHUB_APP_ID and settings.GITHUB_APP_PRIVATE_KEY and settings.GITHUB_APP_INSTALLATION_ID):
+        return None
+
+    with _app_auth_lock:
+        if _APP_AUTH is None or _APP_AUTH.app_id != settings.GITHUB_APP_ID:
+            _APP_AUTH = GithubAppAuth(
+                app_id=settings.GITHUB_APP_ID,
+                private_key=settings.GITHUB_APP_PRIVATE_KEY,
+                installation_id=settings.GITHUB_APP_INSTALLATION_ID,
+                refresh_margin=settings.GITHUB_APP_TOKEN_REFRESH_MARGIN,
+            )
+        return _APP_AUTH
@@ -0,0 +1,112 @@
+"""
+Every call to Github goes through a GithubClient, it binds the credentials of a single
+fetch to a ClientSession that may be shared by many fetches at once, and schedules
+each request around Github's rate limits and the process-wide cap on requests in flight.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Dict, Optional
+
+from aiohttp import ClientError, ClientResponse, ClientResponseError, ClientSession
+
+from repo.services.governor_service import get_governor
+from repo.services.rate_limit_service import get_scheduler, token_key
+from repo.services.token_pool_service import TokenPool, get_token_pool, headroom
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 3
+
+
+def _resource(path: str) -> str:
+    return "graphql" if path == "/graphql" else "core"
+
+
+async def _raise_for_status(response: ClientResponse) -> None:
+    """
+    Like raise_for_status, but keeps Github's message from the body, it's the only
+    place a 403 says it's a secondary rate limit
+    """
+    if response.ok:
+        return
+    message = response.reason or ""
+    try:
+        body = await response.json(content_type=None)
+    except (ClientError, ValueError):
+        body = None
+    if isinstance(body, dict) and body.get("message"):
+        message = str(body["message"])
+    response.release()
+    raise ClientResponseError(response.request_info, response.history, status=response.status, message=message, headers=response.headers)
+
+
+class GithubClient:
+    """
+    Thin wrapper around a ClientSession that adds the Authorization header for this fetch,
+    since the session itself may be a long-lived one shared across requests.
+
+    The job names the grade this client works for, requests in flight are shared fairly between jobs.
+
+    The token for each request comes from the token pool, the visitor's own token first,
+    so a paginated fetch moves on to another token as soon as the one it's using runs dry.
+    """
+
+    def __init__(self, session: ClientSession, token: Optional[str] = None, job: str = "default", pool: Optional[TokenPool] = None) -> None:
+        self.session = session
+        self.token = token
+        self.job = job
+        self.pool = pool if pool is not None else get_token_pool()
+
+    @property
+    def authenticated(self) -> bool:
+        return bool(self.token or self.pool.configured)
+
+    @staticmethod
+    def _headers(headers: Optional[Dict[str, str]], token: Optional[str]) -> Dict[str, str]:
+        merged = dict(headers or {})
+        if token:
+            merged["Authorization"] = f"Bearer {token}"
+        return merged
+
+    @asynccontextmanager
+    async def _request(self, method: str, path: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> AsyncIterator[ClientResponse]:
+        governor = get_governor()
+        scheduler = get_scheduler()
+        resource = _resource(path)
+        await self.pool.prepare(self.session)
+
+        for attempt in range(MAX_RETRIES + 1):
+            token = self.pool.choose(self.token, resource)
+            await scheduler.wait_for_budget(token, resource)
+            async with governor.slot(self.job), scheduler.slot():
+                try:
+                    response = await self.session.request(method, path, headers=self._headers(headers, token), raise_for_status=False, **kwargs)
+                    await _raise_for_status(response)
+                except ClientResponseError as error:
+                    retry_in = scheduler.record_error(token, resource, error)
+                    if headroom(token, resource) <= 0 and self.pool.choose(self.token, resource) != token:
+                        logger.info("Token %s exhausted for %s, rotating", token_key(token), resource)
+                        retry_in = 0.0
+                    if retry_in is None or attempt == MAX_RETRIES:
+                        raise
+                    logger.info("Retrying %s %s in %.2fs (attempt %s)", method, path, retry_in, attempt + 1)
+                else:
+                    scheduler.record_success(token, resource, response.headers)
+                    try:
+                        yield response
+                    finally:
+                        response.release()
+                    return
+            await asyncio.sleep(retry_in)
+
+    def get(self, path: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> AsyncContextManager[ClientResponse]:
+        return self._request("GET", path, headers, **kwargs)
+
+    def post(self, path: str, headers: Optional[Dict[str, str]] = None, **kwargs: Any) -> AsyncContextManager[ClientResponse]:
+        return self._request("POST", path, headers, **kwargs)
+
+    def ensure_budget(self, requests_needed: int, resource: str = "core") -> None:
+        if self.pool.headroom(self.token, resource) >= requests_needed:
+            return
+        get_scheduler().ensure_budget(self.pool.choose(self.token, resource), resource, requests_needed)
@@ -0,0 +1,204 @@
+"""
+Caps the number of requests in flight to Github across every grade running in this
+process, no matter which thread or event loop they run on.
+
+Waiting requests are queued per grade job and slots are handed out round-robin between
+jobs, so a huge repo paging through hundreds of commits can't starve the small repos
+being graded at the same time.
+
+With settings.GITHUB_GOVERNOR_DATABASE enabled, each worker heartbeats an
+OutboundWorker row and takes an equal share of GITHUB_MAX_IN_FLIGHT, which caps the
+total across workers and nodes sharing the database. The rows also record each
+worker's queue depth and wait times for the admin.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import AsyncIterator, Deque, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from repo.models import OutboundWorker
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GovernorStats:
+    max_in_flight: int
+    in_flight: int
+    queue_depth: int
+    active_jobs: int
+    waits: int
+    mean_wait_ms: float
+    max_wait_ms: float
+
+
+@dataclass
+class _Waiter:
+    loop: asyncio.AbstractEventLoop
+    future: "asyncio.Future[None]"
+
+
+class OutboundGovernor:
+    def __init__(self, max_in_flight: int) -> None:
+        self.max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def acquire(self, job: str) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._queues:
+                self._in_flight += 1
+                return
+
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._queues.setdefault(job, deque()).append(waiter)
+
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                queue = self._queues.get(job)
+                still_queued = bool(queue and waiter in queue)
+                if queue and still_queued:
+                    queue.remove(waiter)
+                    if not queue:
+                        del self._queues[job]
+            if not still_queued and waiter.future.done() and not waiter.future.cancelled():
+                # Granted just before being cancelled, hand the slot on
+                self.release()
+            raise
+
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def _next_waiter(self) -> _Waiter:
+        """
+        Takes the first waiter of the next job in line, that job then goes to the back
+        """
+        job, queue = next(iter(self._queues.items()))
+        waiter = queue.popleft()
+        if queue:
+            self._queues.move_to_end(job)
+        else:
+            del self._queues[job]
+        return waiter
+
+    def release(self) -> None:
+        with self._lock:
+            if self._in_flight > self.max_in_flight or not self._queues:
+                # Shrinks toward a lowered max_in_flight rather than handing the slot on
+                self._in_flight -= 1
+                return
+            waiter = self._next_waiter()
+
+        waiter.loop.call_soon_threadsafe(self._grant, waiter)
+
+    def resize(self, max_in_flight: int) -> None:
+        granted = []
+        with self._lock:
+            self.max_in_flight = max_in_flight
+            while self._queues and self._in_flight < self.max_in_flight:
+                self._in_flight += 1
+                granted.append(self._next_waiter())
+
+        for waiter in granted:
+            waiter.loop.call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, waiter: _Waiter) -> None:
+        if waiter.future.cancelled():
+            self.release()
+        else:
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, job: str) -> AsyncIterator[None]:
+        await self.acquire(job)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> GovernorStats:
+        with self._lock:
+            return GovernorStats(
+                max_in_flight=self.max_in_flight,
+                in_flight=self._in_flight,
+                queue_depth=sum(len(queue) for queue in self._queues.values()),
+                active_jobs=len(self._queues),
+                waits=self._waits,
+                mean_wait_ms=1000 * self._wait_total / self._waits if self._waits else 0.0,
+                max_wait_ms=1000 * self._wait_max,
+            )
+
+    def heartbeat(self, worker_name: str) -> None:
+        """
+        Records this worker in the database and resizes to its share of the global cap
+        """
+        now = timezone.now()
+        stats = self.stats()
+        OutboundWorker.objects.update_or_create(
+            name=worker_name,
+            defaults={
+                "heartbeat": now,
+                "max_in_flight": stats.max_in_flight,
+                "in_flight": stats.in_flight,
+                "queue_depth": stats.queue_depth,
+                "mean_wait_ms": stats.mean_wait_ms,
+                "max_wait_ms": stats.max_wait_ms,
+            },
+        )
+        stale = now - timedelta(seconds=settings.GITHUB_GOVERNOR_HEARTBEAT * 3)
+        OutboundWorker.objects.filter(heartbeat__lt=stale).delete()
+        live_workers = OutboundWorker.objects.count()
+        self.resize(max(1, settings.GITHUB_MAX_IN_FLIGHT // max(1, live_workers)))
+        logger.debug("  outbound share for %s: %s of %s (%s workers)", worker_name, self.max_in_flight, settings.GITHUB_MAX_IN_FLIGHT, live_workers)
+
+
+def _heartbeat_forever(governor: OutboundGovernor, worker_name: str) -> None:
+    while True:
+        # Like a request would, so heartbeats resume after the database drops the connection
+        close_old_connections()
+        try:
+            governor.heartbeat(worker_name)
+        except Exception:  # pylint: disable=broad-except  # keep heartbeating through DB blips
+            logger.exception("Failed to record outbound governor heartbeat")
+        finally:
+            close_old_connections()
+        time.sleep(settings.GITHUB_GOVERNOR_HEARTBEAT)
+
+
+_GOVERNOR: Optional[OutboundGovernor] = None
+_GOVERNOR_PID: Optional[int] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> OutboundGovernor:
+    global _GOVERNOR, _GOVERNOR_PID  # pylint: disable=global-statement
+    with _governor_lock:
+        if _GOVERNOR is None or _GOVERNOR_PID != os.getpid():
+            _GOVERNOR = OutboundGovernor(settings.GITHUB_MAX_IN_FLIGHT)
+            _GOVERNOR_PID = os.getpid()
+            if settings.GITHUB_GOVERNOR_DATABASE:
+                worker_name = f"{socket.gethostname()}:{os.getpid()}"
+                threading.Thread(target=_heartbeat_forever, args=(_GOVERNOR, worker_name), name="outbound-governor", daemon=True).start()
+        return _GOVERNOR
@@ -205,10 +205,15 @@ def grade_commits_all_by_primary_author(total_commits: int, primary_author_commi
         else:
             points_earned = points_max * 0.5
 
+    if total_commits:
+        raw_number = round(100 * (primary_author_commits / total_commits), 2)
+    else:
+        raw_number = 0
+
     return _construct_grade(
         points_max=points_max,
         points_earned=points_earned,
-        raw_number=round(100 * (primary_author_commits / total_commits), 2),
+        raw_number=raw_number,
         unit="Percent",
     )
 
@@ -304,12 +309,12 @@ def calculate_grade(data: GitData) -> TestGrades:
     test_grades = {
         "days_since_commit": grade_days_since_commit(data.contributor.days_since_commit),
         "days_since_create": grade_days_since_create(data.contributor.days_since_create),
-        # "author_count_all": grade_authors_total(data.contributor.author_count_all),
+        "author_count_all": grade_authors_total(data.contributor.author_count_all),
         "author_count_recent": grade_authors_recent(data.contributor.author_count_recent),
-        # "commit_count_primary_author_all": grade_commits_all_by_primary_author(
-        #     data.commit_all.count,
-        #     data.commit_all.count_primary_author,
-        # ),
+        "commit_count_primary_author_all": grade_commits_all_by_primary_author(
+            data.commit_all.count,
+            data.commit_all.count_primary_author,
+        ),
         "commit_count_primary_author_recent": grade_commits_recent_by_primary_author(
             data.commit_recent.count,
             data.commit_recent.count_primary_author,
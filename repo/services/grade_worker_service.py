@@ -0,0 +1,98 @@
+"""
+Runs grade jobs from the GradeJob queue, see job_queue_service. Each worker process
+(`manage.py grade_worker`) claims one job at a time and runs the same fetch and grade
+as a request would, on an event loop of its own, writing the result through the cache
+tiers and reporting each stage of the fetch as the job's progress. The fetch takes the
+repo's FetchLease like any other, so a job never fetches alongside a request or another
+job grading the same repo.
+"""
+import asyncio
+import functools
+import logging
+import time
+
+from aiohttp import ClientError
+from django.conf import settings
+from django.db import close_old_connections
+
+from gitgrade.util import get_version
+from repo.data.general import RepoRequest
+from repo.models import GradeJob
+from repo.services.db_access import database_sync_to_async
+from repo.services.db_cache_service import acheck_graded_cache
+from repo.services.errors import CacheMiss, FetchTimedOut, RateLimitExhausted
+from repo.services.input_service import UNEXPECTED_ERROR_MESSAGE, afetch_and_cache, fetch_error
+from repo.services.io_runtime import close_loop_session
+from repo.services.job_queue_service import claim, finish, purge_finished, report_progress, requeue_abandoned
+from repo.services.single_flight_service import afetch_once
+from repo.services.task_graph import stage_listener
+
+logger = logging.getLogger(__name__)
+
+
+async def _beat(job: GradeJob) -> None:
+    # Stages like paging through a big repo's commits can outlast the timeout on their own
+    while True:
+        await asyncio.sleep(settings.GITGRADE_JOB_HEARTBEAT_SECONDS)
+        if not await database_sync_to_async(report_progress)(job.pk, job.worker):
+            logger.warning("Grade job %s was taken from %s while it ran", job.pk, job.worker)
+            return
+
+
+async def _grade(job: GradeJob) -> None:
+    url_metadata = RepoRequest(source=job.source, owner=job.owner, repo=job.repo)
+    current_version = get_version()
+
+    async def on_stage(stage: str, finished: int, total: int) -> None:
+        await database_sync_to_async(report_progress)(job.pk, job.worker, f"Fetched {stage} ({finished} of {total})")
+
+    try:
+        # A visitor's request may have graded it while the job was queued
+        await acheck_graded_cache(current_version, url_metadata)
+        return
+    except CacheMiss:
+        pass
+
+    await database_sync_to_async(report_progress)(job.pk, job.worker, "Fetching from Github")
+    listening = stage_listener.set(on_stage)
+    beating = asyncio.create_task(_beat(job))
+    try:
+        await afetch_once(current_version, url_metadata, functools.partial(afetch_and_cache, current_version, url_metadata))
+    finally:
+        beating.cancel()
+        stage_listener.reset(listening)
+        await close_loop_session()
+
+
+def run_job(job: GradeJob) -> None:
+    url_metadata = RepoRequest(source=job.source, owner=job.owner, repo=job.repo)
+    logger.info("Running grade job %s for: %s", job.pk, url_metadata)
+    try:
+        asyncio.run(_grade(job))
+    except (ClientError, RateLimitExhausted, FetchTimedOut) as error:
+        finish(job.pk, job.worker, fetch_error(error, url_metadata, None)["error_message"])
+    except Exception:  # pylint: disable=broad-except  # the job fails, the worker carries on with the next
+        logger.exception("Grade job %s failed for: %s", job.pk, url_metadata)
+        finish(job.pk, job.worker, UNEXPECTED_ERROR_MESSAGE)
+    else:
+        finish(job.pk, job.worker)
+
+
+def work(worker: str, stop_when_idle: bool = False) -> int:
+    """
+    Claims and runs jobs until stopped, or until the queue is empty with stop_when_idle, returns the jobs run
+    """
+    jobs_run = 0
+    while True:
+        # Like a request would, so the worker outlives the database dropping its connection
+        close_old_connections()
+        requeue_abandoned()
+        job = claim(worker)
+        if job is None:
+            if stop_when_idle:
+                return jobs_run
+            purge_finished()
+            time.sleep(settings.GITGRADE_JOB_POLL_SECONDS)
+            continue
+        run_job(job)
+        jobs_run += 1
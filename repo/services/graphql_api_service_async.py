@@ -0,0 +1,294 @@
+"""
+Collects the same data as rest_api_service_async but through Github's GraphQL API,
+a single query returns the repo metadata, pull request counts, latest release and
+the first page of recent commits. Only the remaining pages of commit history need
+follow-up queries. GraphQL has no contributor listing, the all-time author totals come
+from a single REST probe that runs alongside the query.
+
+Note: Github's GraphQL API doesn't support anonymous access, so this engine
+requires a token.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Final, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import ClientResponse, ClientResponseError, ClientSession
+
+from repo.data.from_source import DataFromAPI
+from repo.data.general import RepoRequest
+from repo.data.github import Author, Commit, Release, Repo
+from repo.services.activity_service import record_activity
+from repo.services.commit_accumulator import CommitAccumulator
+from repo.services.commit_window_service import Watermark, advance, commits_after_watermark, load_watermark, save_watermark, trim_days
+from repo.services.github_client import GithubClient
+from repo.services.rest_api_service_async import (
+    BASE_URL,
+    GITHUB_DATETIME_FORMAT,
+    RECENT_DAYS,
+    RecentCommits,
+    build_api_data,
+)
+from repo.services.totals_service import get_contributor_totals
+
+logger = logging.getLogger(__name__)
+
+COMMIT_PAGE_SIZE: Final = 100
+
+HISTORY_FRAGMENT: Final = f"""
+fragment recentHistory on Commit {{
+  history(first: {COMMIT_PAGE_SIZE}, since: $since, after: $cursor) {{
+    pageInfo {{ hasNextPage endCursor }}
+    nodes {{ oid committedDate author {{ name date }} }}
+  }}
+}}
+"""
+
+REPO_QUERY: Final = (
+    """
+query($owner: String!, $name: String!, $since: GitTimestamp!, $cursor: String) {
+  rateLimit { cost remaining }
+  repository(owner: $owner, name: $name) {
+    databaseId
+    name
+    createdAt
+    updatedAt
+    primaryLanguage { name }
+    stargazerCount
+    forkCount
+    issues(states: OPEN) { totalCount }
+    openPullRequests: pullRequests(states: OPEN) { totalCount }
+    allPullRequests: pullRequests { totalCount }
+    refs(refPrefix: "refs/tags/", first: 1, orderBy: {field: TAG_COMMIT_DATE, direction: DESC}) {
+      totalCount
+      nodes {
+        name
+        target {
+          ... on Tag { tagger { date } target { ... on Commit { committedDate } } }
+          ... on Commit { committedDate }
+        }
+      }
+    }
+    defaultBranchRef {
+      target {
+        ...recentHistory
+        ... on Commit { allHistory: history { totalCount } }
+      }
+    }
+  }
+}
+"""
+    + HISTORY_FRAGMENT
+)
+
+HISTORY_QUERY: Final = (
+    """
+query($owner: String!, $name: String!, $since: GitTimestamp!, $cursor: String) {
+  rateLimit { cost remaining }
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef { target { ...recentHistory } }
+  }
+}
+"""
+    + HISTORY_FRAGMENT
+)
+
+# Maps GraphQL error types onto the HTTP status the REST API would have used,
+# so callers can handle both engines the same way
+ERROR_TYPE_TO_STATUS: Final = {
+    "NOT_FOUND": 404,
+    "RATE_LIMITED": 403,
+    "FORBIDDEN": 403,
+}
+
+
+async def _raise_for_errors(response: ClientResponse, response_json: Dict[str, Any]) -> None:
+    errors = response_json.get("errors")
+    if not errors:
+        return
+
+    logger.debug("  graphql errors: %s", errors)
+    status = ERROR_TYPE_TO_STATUS.get(errors[0].get("type", ""), 500)
+    raise ClientResponseError(
+        response.request_info,
+        response.history,
+        status=status,
+        message=errors[0].get("message", "Unknown GraphQL error"),
+    )
+
+
+async def _query(client: GithubClient, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    async with client.post("/graphql", json={"query": query, "variables": variables}) as response:
+        response_json: Dict[str, Any] = await response.json()
+        await _raise_for_errors(response, response_json)
+
+    data: Dict[str, Any] = response_json["data"]
+    rate_limit = data.get("rateLimit") or {}
+    logger.debug("  graphql query cost: %s (remaining: %s)", rate_limit.get("cost"), rate_limit.get("remaining"))
+    return data
+
+
+def _extract_history(repository_json: Dict[str, Any]) -> Tuple[List[Commit], Optional[str]]:
+    """
+    Returns the commits on this page of history and the cursor for the next page, if any
+    """
+    branch = repository_json.get("defaultBranchRef") or {}
+    history = (branch.get("target") or {}).get("history") or {}
+
+    commits = []
+    for node in history.get("nodes", []):
+        author_json = node.get("author") or {}
+        author = Author(name=author_json.get("name", "unknown"), date=author_json.get("date", "1970-01-01T00:00:00Z"))
+        commits.append(Commit(sha=node.get("oid", ""), author=author, committed_at=node.get("committedDate", author.date)))
+
+    page_info = history.get("pageInfo") or {}
+    cursor = page_info.get("endCursor") if page_info.get("hasNextPage") else None
+    return commits, cursor
+
+
+async def _next_page(client: GithubClient, variables: Dict[str, Any], cursor: str) -> Tuple[List[Commit], Optional[str]]:
+    variables["cursor"] = cursor
+    history_data = await _query(client, HISTORY_QUERY, variables)
+    return _extract_history(history_data.get("repository") or {})
+
+
+async def _get_commits(client: GithubClient, variables: Dict[str, Any], commits: List[Commit], cursor: Optional[str]) -> RecentCommits:
+    """
+    Folds in the first page of history and every page after it
+    """
+    recent_commits = CommitAccumulator()
+    newest = commits[0] if commits else None
+    recent_commits.add_commits(1, commits)
+
+    # Cursors make the pages of history strictly sequential
+    page = 1
+    while cursor:
+        page += 1
+        commits, cursor = await _next_page(client, variables, cursor)
+        recent_commits.add_commits(page, commits)
+
+    return recent_commits, advance(None, newest, recent_commits.days())
+
+
+async def _get_commits_after(  # pylint: disable=too-many-arguments
+    client: GithubClient,
+    variables: Dict[str, Any],
+    commits: List[Commit],
+    cursor: Optional[str],
+    watermark: Watermark,
+    since: datetime,
+) -> Optional[RecentCommits]:
+    """
+    Collects the history since the watermark's date, None if the watermark commit is gone
+    """
+    while cursor:
+        page, cursor = await _next_page(client, variables, cursor)
+        commits.extend(page)
+
+    new_commits = commits_after_watermark(commits, watermark.sha)
+    if new_commits is None:
+        return None
+    logger.debug("  --> %s commits since the watermark", len(new_commits))
+
+    recent_commits = CommitAccumulator()
+    recent_commits.seed(trim_days(watermark.days, int(since.timestamp())))
+    recent_commits.add_commits(1, new_commits)
+    return recent_commits, advance(watermark, new_commits[0] if new_commits else None, recent_commits.days())
+
+
+def _extract_repo(repository_json: Dict[str, Any]) -> Repo:
+    open_pulls = repository_json["openPullRequests"]["totalCount"]
+    return Repo(
+        id=repository_json.get("databaseId", -1),
+        name=repository_json.get("name", "unknown"),
+        created_at=repository_json.get("createdAt", "1970-01-01T00:00:00Z"),
+        updated_at=repository_json.get("updatedAt", "1970-01-01T00:00:00Z"),
+        language=(repository_json.get("primaryLanguage") or {}).get("name", "unknown"),
+        # The REST API counts open pull requests as issues, match it
+        open_issues_count=repository_json["issues"]["totalCount"] + open_pulls,
+        watchers_count=repository_json.get("stargazerCount", -1),
+        forks_count=repository_json.get("forkCount", -1),
+    )
+
+
+def _extract_commit_total(repository_json: Dict[str, Any]) -> int:
+    target = (repository_json.get("defaultBranchRef") or {}).get("target") or {}
+    return int((target.get("allHistory") or {}).get("totalCount", 0))
+
+
+def _extract_newest_release(repository_json: Dict[str, Any]) -> Tuple[Optional[Release], int]:
+    refs = repository_json.get("refs") or {}
+    nodes = refs.get("nodes") or []
+    if not nodes:
+        return None, 0
+
+    # Annotated tags without a tagger date go by the commit they tag, tags of trees or blobs have no date
+    target = nodes[0].get("target") or {}
+    created_at = (target.get("tagger") or {}).get("date") or target.get("committedDate") or (target.get("target") or {}).get("committedDate")
+    if not created_at:
+        return None, refs.get("totalCount", 0)
+    return Release(tag=nodes[0]["name"], created_at=str(created_at)), refs.get("totalCount", 0)
+
+
+async def _fetch_with_session(repo_request_data: RepoRequest, session: ClientSession) -> DataFromAPI:
+    six_months_ago = datetime.today() - timedelta(days=RECENT_DAYS)
+    watermark = await load_watermark(repo_request_data)
+    if watermark and watermark.committed_at < six_months_ago.timestamp():
+        watermark = None
+
+    since = datetime.fromtimestamp(watermark.committed_at, tz=timezone.utc) if watermark else six_months_ago
+    variables: Dict[str, Any] = {
+        "owner": repo_request_data.owner,
+        "name": repo_request_data.repo,
+        "since": since.strftime(GITHUB_DATETIME_FORMAT),
+        "cursor": None,
+    }
+    client = GithubClient(session, repo_request_data.sso_token, job=f"{repo_request_data.owner}/{repo_request_data.repo}")
+
+    data, contributor_totals = await asyncio.gather(
+        _query(client, REPO_QUERY, variables),
+        get_contributor_totals(f"{repo_request_data.owner}/{repo_request_data.repo}", client),
+    )
+    repository_json = data.get("repository") or {}
+    commits, cursor = _extract_history(repository_json)
+
+    recent: Optional[RecentCommits] = None
+    if watermark:
+        recent = await _get_commits_after(client, variables, commits, cursor, watermark, six_months_ago)
+        if recent is None:
+            logger.info("  watermark %s is no longer on the default branch of %s, fetching every recent commit", watermark.sha, variables["name"])
+            variables["since"] = six_months_ago.strftime(GITHUB_DATETIME_FORMAT)
+            variables["cursor"] = None
+            history_data = await _query(client, HISTORY_QUERY, variables)
+            commits, cursor = _extract_history(history_data.get("repository") or {})
+    if recent is None:
+        recent = await _get_commits(client, variables, commits, cursor)
+
+    recent_commits, new_watermark = recent
+    await save_watermark(repo_request_data, new_watermark)
+    await record_activity(repo_request_data, new_watermark, int(six_months_ago.timestamp()), int(time.time()))
+
+    newest_release, releases_count = _extract_newest_release(repository_json)
+
+    return await build_api_data(
+        _extract_repo(repository_json),
+        repository_json["openPullRequests"]["totalCount"],
+        repository_json["allPullRequests"]["totalCount"],
+        recent_commits.activity(),
+        _extract_commit_total(repository_json),
+        contributor_totals,
+        newest_release,
+        releases_count,
+    )
+
+
+async def fetch_github_graphql_data(repo_request_data: RepoRequest, session: Optional[ClientSession] = None) -> DataFromAPI:
+    logger.debug("  fetching data from github graphql for: %s", repo_request_data)
+
+    if session:
+        return await _fetch_with_session(repo_request_data, session)
+
+    async with aiohttp.ClientSession(base_url=BASE_URL, raise_for_status=True) as new_session:
+        return await _fetch_with_session(repo_request_data, new_session)
@@ -1,9 +1,15 @@
+import asyncio
+import functools
 import logging
+import time
+from contextlib import aclosing
 from dataclasses import asdict, dataclass
-from typing import Optional, Dict, Final, Any, Literal
+from datetime import date
+from typing import Optional, Dict, Any, Literal, Callable, Coroutine, Tuple, Union, AsyncGenerator, AsyncIterator, Iterator, List, Sequence, TypeVar
 
 from aiohttp import ClientResponseError, ClientError
-from asgiref.sync import async_to_sync
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from gitgrade.util import get_version
@@ -13,13 +19,24 @@ from repo.data.git_data import (
     GitData,
     PullRequestData,
     CommitData,
+    CommitTotalData,
     ContributorData,
     PopularityData,
 )
-from repo.data.grade import TestGrades
-from repo.services.db_cache_service import check_cache, patch_cache
-from repo.services.errors import CacheMiss, UnsupportedURL
+from repo.data.grade import GradedRepo, TestGrades
+from repo.services.access_service import record_access
+from repo.services.cache_metrics import record_lookup
+from repo.services.db_access import database_sync_to_async
+from repo.services.db_cache_service import acheck_graded_cache, apatch_cache, check_graded_cache, check_graded_cache_many, patch_cache
+from repo.services.errors import CacheMiss, FetchTimedOut, StaleCache, UnsupportedURL, RateLimitExhausted
 from repo.services.grade_calculator_service import calculate_grade
+from repo.services.graphql_api_service_async import fetch_github_graphql_data
+from repo.services.io_runtime import get_io_runtime, loop_session
+from repo.services.job_queue_service import enqueue
+from repo.services.negative_cache_service import get_negative_cache, repo_key, url_key
+from repo.services.refresh_service import get_refresher
+from repo.services.single_flight_service import afetch_once, fetch_once
+from repo.services.token_pool_service import get_token_pool
 from repo.services.rest_api_service_async import (
     fetch_github_api_data as fetch_github_api_data_async,
 )
@@ -27,6 +44,8 @@ from repo.services.url_service import identify_source
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 @dataclass
 class RepoResult:
@@ -48,6 +67,56 @@ class ErrorResult:
     error_message: str
 
 
+@dataclass
+class QueuedResult:
+    """
+    The repo is being graded by a grade job, see job_queue_service
+    """
+
+    status: Literal["queued"]
+    job_id: int
+
+
+NOT_FOUND_MESSAGE = "The repo you requested does not exist."
+UNEXPECTED_ERROR_MESSAGE = "Unexpected error, please retry or create an issue on our github."
+RATE_LIMITED_MESSAGE = "You've reached the rate limit for Github, please wait a while and try again"
+
+
+def _remembered_error(key: str, github_token: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    negative_cache = get_negative_cache()
+    error_message = negative_cache.get(key, github_token) if negative_cache is not None else None
+    return asdict(ErrorResult(status="error", error_message=error_message)) if error_message else None
+
+
+def _remember_response_error(repo_request: RepoRequest, github_token: Optional[str], status: int) -> None:
+    negative_cache = get_negative_cache()
+    if negative_cache is None:
+        return
+    if status == 404:
+        negative_cache.put_for_token(repo_key(repo_request), NOT_FOUND_MESSAGE, settings.GITGRADE_NEGATIVE_NOT_FOUND_SECONDS, github_token)
+    elif status >= 500:
+        negative_cache.put(repo_key(repo_request), UNEXPECTED_ERROR_MESSAGE, settings.GITGRADE_NEGATIVE_ERROR_SECONDS, blocks_after=settings.GITGRADE_NEGATIVE_ERROR_THRESHOLD)
+
+
+def _forget_errors(repo_request: RepoRequest) -> None:
+    """
+    A successful grade clears what failed before, a repo that was a 404 for one token may be visible to another
+    """
+    negative_cache = get_negative_cache()
+    if negative_cache is not None:
+        negative_cache.clear(repo_key(repo_request))
+
+
+def _url_error(repo_url: Optional[str], error_message: str) -> Dict[str, Any]:
+    """
+    The error for a URL that can't be graded, remembered so asking again is answered straight away
+    """
+    negative_cache = get_negative_cache()
+    if repo_url and negative_cache is not None:
+        negative_cache.put(url_key(repo_url), error_message, settings.GITGRADE_NEGATIVE_URL_SECONDS)
+    return asdict(ErrorResult(status="error", error_message=error_message))
+
+
 # def _convert(api_data: DataFromAPI, clone_data: DataFromClone) -> GitData:
 def _convert(api_data: DataFromAPI) -> GitData:
     return GitData(
@@ -64,6 +133,10 @@ def _convert(api_data: DataFromAPI) -> GitData:
         #     count_primary_author=clone_data.time_all.commit_count_primary_author,
         #     interval=clone_data.time_all.commit_interval,
         # ),
+        commit_all=CommitTotalData(
+            count=api_data.time_all.commit_count,
+            count_primary_author=api_data.time_all.commit_count_primary_author,
+        ),
         commit_recent=CommitData(
             # count=clone_data.time_recent.commit_count,
             # count_primary_author=clone_data.time_recent.commit_count_primary_author,
@@ -79,6 +152,7 @@ def _convert(api_data: DataFromAPI) -> GitData:
             # author_count_all=clone_data.time_all.author_count,
             # author_count_recent=clone_data.time_recent.author_count,
             days_since_commit=api_data.days_since_commit,
+            author_count_all=api_data.time_all.author_count,
             author_count_recent=api_data.time_recent.author_count,
         ),
         popularity=PopularityData(
@@ -88,13 +162,107 @@ def _convert(api_data: DataFromAPI) -> GitData:
     )
 
 
-def input_util(  # pylint: disable=too-many-return-statements  # refactor this later
-    repo_url: Optional[str] = None,
-    source: Optional[str] = None,
-    owner: Optional[str] = None,
-    repo: Optional[str] = None,
-    github_token: Optional[str] = None,
-) -> Dict[str, Any]:
+def _select_fetcher(repo_request: RepoRequest) -> Callable[..., Coroutine[Any, Any, DataFromAPI]]:
+    """
+    Picks the API used to collect data based on settings.GITHUB_FETCH_ENGINE
+    """
+    if settings.GITHUB_FETCH_ENGINE == "graphql":
+        if repo_request.sso_token or get_token_pool().configured:
+            return fetch_github_graphql_data
+        logger.info("  graphql requires a token, falling back to rest for: %s/%s", repo_request.owner, repo_request.repo)
+    return fetch_github_api_data_async
+
+
+def _fetched(repo_request: RepoRequest, fetcher: Callable[..., Any], api_data: DataFromAPI, fetch_start: float) -> GitData:
+    fetch_seconds = time.perf_counter() - fetch_start
+    record_lookup("github", fetch_seconds, hit=True)
+    logger.info("Fetched %s/%s using %s in %.3fs", repo_request.owner, repo_request.repo, fetcher.__name__, fetch_seconds)
+    # clone_data = fetch_clone_data(repo_request)
+
+    return _convert(api_data)
+
+
+def _fetch_git_data(repo_request: RepoRequest) -> GitData:
+    fetcher = _select_fetcher(repo_request)
+    fetch_start = time.perf_counter()
+    if settings.GITHUB_IO_RUNTIME:
+        api_data = get_io_runtime().run(fetcher, repo_request)
+    else:
+        api_data = async_to_sync(fetcher)(repo_request)  # type: ignore
+    return _fetched(repo_request, fetcher, api_data, fetch_start)
+
+
+async def _afetch_git_data(repo_request: RepoRequest) -> GitData:
+    fetcher = _select_fetcher(repo_request)
+    fetch_start = time.perf_counter()
+    if settings.GITHUB_IO_RUNTIME:
+        api_data = await fetcher(repo_request, session=await loop_session())
+    else:
+        api_data = await fetcher(repo_request)
+    return _fetched(repo_request, fetcher, api_data, fetch_start)
+
+
+def fetch_and_cache(current_version: str, repo_request: RepoRequest) -> GradedRepo:
+    git_data = _fetch_git_data(repo_request)
+    test_grades = calculate_grade(git_data)
+    patch_cache(current_version, repo_request, git_data, test_grades)
+    return GradedRepo(data=git_data, grades=test_grades)
+
+
+async def afetch_and_cache(current_version: str, repo_request: RepoRequest) -> GradedRepo:
+    git_data = await _afetch_git_data(repo_request)
+    test_grades = calculate_grade(git_data)
+    await apatch_cache(current_version, repo_request, git_data, test_grades)
+    return GradedRepo(data=git_data, grades=test_grades)
+
+
+def _fetch(current_version: str, repo_request: RepoRequest) -> GradedRepo:
+    """
+    Fetches the repo and caches its grades, shared with any other request fetching it at the same time
+    """
+    return fetch_once(current_version, repo_request, functools.partial(fetch_and_cache, current_version, repo_request))
+
+
+async def _afetch(current_version: str, repo_request: RepoRequest) -> GradedRepo:
+    return await afetch_once(current_version, repo_request, functools.partial(afetch_and_cache, current_version, repo_request))
+
+
+def _refresh_in_background(stale_cache: StaleCache, current_version: str, repo_request: RepoRequest, github_token: Optional[str]) -> Tuple[GradedRepo, date]:
+    refresher = get_refresher()
+    if refresher is None:
+        raise stale_cache
+    repo_request.sso_token = github_token
+    refresher.submit(repo_request, functools.partial(_fetch, current_version, repo_request))
+    return stale_cache.graded, stale_cache.row_updated_date
+
+
+def _check_cache_or_refresh(current_version: str, repo_request: RepoRequest, github_token: Optional[str]) -> Tuple[GradedRepo, Optional[date]]:
+    """
+    Cached grades, stale grades are returned along with the date they're from while a
+    refresh is queued in the background
+    """
+    try:
+        return check_graded_cache(current_version, repo_request), None
+    except StaleCache as stale_cache:
+        return _refresh_in_background(stale_cache, current_version, repo_request, github_token)
+
+
+async def _acheck_cache_or_refresh(current_version: str, repo_request: RepoRequest, github_token: Optional[str]) -> Tuple[GradedRepo, Optional[date]]:
+    try:
+        return await acheck_graded_cache(current_version, repo_request), None
+    except StaleCache as stale_cache:
+        # Refreshes run on the refresher's threads, apart from the event loop
+        return _refresh_in_background(stale_cache, current_version, repo_request, github_token)
+
+
+def _parse_request(repo_url: Optional[str], source: Optional[str], owner: Optional[str], repo: Optional[str], github_token: Optional[str]) -> Union[RepoRequest, Dict[str, Any]]:
+    """
+    The repo asked for, or the error to answer with
+    """
+    remembered = _remembered_error(url_key(repo_url)) if repo_url else None
+    if remembered:
+        return remembered
+
     try:
         if repo_url:
             repo_request = identify_source(repo_url)
@@ -104,51 +272,294 @@ def input_util(  # pylint: disable=too-many-return-statements  # refactor this l
             raise UnsupportedURL("Could not figure out source")
     except ValidationError:
         logger.exception("Error parsing request URL")
-        return asdict(ErrorResult(status="error", error_message="Please provide a valid Github URL"))
+        return _url_error(repo_url, "Please provide a valid Github URL")
     except UnsupportedURL:
         logger.exception("Unsupported URL received")
-        return asdict(ErrorResult(status="error", error_message="URL provided is not supported, please provide a valid Github URL"))
+        return _url_error(repo_url, "URL provided is not supported, please provide a valid Github URL")
 
     if repo_request.source != "github":
-        return {"status": "error", "error_message": "Please provide a valid Github URL, the URL provided was not from Github."}
+        return _url_error(repo_url, "Please provide a valid Github URL, the URL provided was not from Github.")
+
+    remembered = _remembered_error(repo_key(repo_request), github_token)
+    if remembered:
+        logger.info("Answering from the negative cache for: %s", repo_request)
+        return remembered
+    return repo_request
+
+
+def fetch_error(error: Exception, repo_request: RepoRequest, github_token: Optional[str]) -> Dict[str, Any]:
+    """
+    The error to answer with when fetching the repo raised, called from the except block
+    """
+    error_message = UNEXPECTED_ERROR_MESSAGE
+    if isinstance(error, ClientResponseError) and error.status == 403:
+        if not (github_token or get_token_pool().configured):
+            return {"status": "error", "error_message": "Please sign in to Github to proceed."}
+        error_message = RATE_LIMITED_MESSAGE
+    elif isinstance(error, ClientResponseError):
+        _remember_response_error(repo_request, github_token, error.status)
+        if error.status == 404:
+            error_message = NOT_FOUND_MESSAGE
+        else:
+            logger.exception("Unexpected ClientResponseError while parsing data")
+    elif isinstance(error, RateLimitExhausted):
+        logger.warning("Rate limit exhausted fetching %s/%s", repo_request.owner, repo_request.repo)
+        error_message = RATE_LIMITED_MESSAGE
+    elif isinstance(error, FetchTimedOut):
+        logger.warning("Timed out waiting on another fetch of %s/%s", repo_request.owner, repo_request.repo)
+        error_message = "This repo is still being graded for another request, please try again in a minute"
+    else:
+        logger.exception("Unexpected ClientError while parsing data")
+    return asdict(ErrorResult(status="error", error_message=error_message))
+
+
+def _queue_instead(github_token: Optional[str]) -> bool:
+    """
+    Whether a miss is graded by a grade job, visitors' tokens aren't handed to jobs
+    """
+    return settings.GITGRADE_GRADE_JOBS and not github_token
+
+
+def _graded_result(repo_request: RepoRequest, graded: GradedRepo, refreshing_from: Optional[date]) -> Dict[str, Any]:
+    test_grades = graded.grades
+    view_only = ViewOnly(
+        # commit_interval_days_all=f"{test_grades.commit_interval_all.raw_number:.2f}",
+        commit_interval_days_recent=f"{test_grades.commit_interval_recent.raw_number:.2f}",
+        refreshing_from=refreshing_from.isoformat() if refreshing_from else None,
+    )
+
+    _forget_errors(repo_request)
+    result = RepoResult(request=repo_request, grades=test_grades, data=graded.data, view=view_only, status="success")
+    return asdict(result)
+
+
+def input_util(
+    repo_url: Optional[str] = None,
+    source: Optional[str] = None,
+    owner: Optional[str] = None,
+    repo: Optional[str] = None,
+    github_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    repo_request = _parse_request(repo_url, source, owner, repo, github_token)
+    if not isinstance(repo_request, RepoRequest):
+        return repo_request
 
     current_version = get_version()
 
     try:
-        git_data = check_cache(current_version, repo_request)
+        graded, refreshing_from = _check_cache_or_refresh(current_version, repo_request, github_token)
     except CacheMiss:
+        if _queue_instead(github_token):
+            return asdict(QueuedResult(status="queued", job_id=enqueue(repo_request).pk))
         repo_request.sso_token = github_token
 
-        fetch_github_api_data = async_to_sync(fetch_github_api_data_async)  # type: ignore
         try:
-            api_data = fetch_github_api_data(repo_request)
-        except ClientResponseError as client_response_error:
+            graded = _fetch(current_version, repo_request)
+        except (ClientError, RateLimitExhausted, FetchTimedOut) as error:
+            return fetch_error(error, repo_request, github_token)
+        refreshing_from = None
 
-            if client_response_error.status == 403:
-                if github_token:
-                    return asdict(ErrorResult(status="error", error_message="You've reached the rate limit for Github, please wait a while and try again"))
-                return {"status": "error", "error_message": "Please sign in to Github to proceed."}
+    record_access(repo_request)
+    return _graded_result(repo_request, graded, refreshing_from)
 
-            if client_response_error.status == 404:
-                return asdict(ErrorResult(status="error", error_message="The repo you requested does not exist."))
 
-            logger.exception("Unexpected ClientResponseError while parsing data")
-            return asdict(ErrorResult(status="error", error_message="Unexpected error, please retry or create an issue on our github."))
+async def input_util_async(
+    repo_url: Optional[str] = None,
+    source: Optional[str] = None,
+    owner: Optional[str] = None,
+    repo: Optional[str] = None,
+    github_token: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    input_util for async views, the fetch from Github is awaited on the running event
+    loop rather than holding a thread while it's in flight
+    """
+    repo_request = _parse_request(repo_url, source, owner, repo, github_token)
+    if not isinstance(repo_request, RepoRequest):
+        return repo_request
 
-        except ClientError:
-            logger.exception("Unexpected ClientError while parsing data")
-            return asdict(ErrorResult(status="error", error_message="Unexpected error, please retry or create an issue on our github."))
-        # clone_data = fetch_clone_data(repo_request)
+    current_version = get_version()
 
-        git_data = _convert(api_data)
-        patch_cache(current_version, repo_request, git_data)
+    try:
+        graded, refreshing_from = await _acheck_cache_or_refresh(current_version, repo_request, github_token)
+    except CacheMiss:
+        if _queue_instead(github_token):
+            job = await sync_to_async(enqueue)(repo_request)
+            return asdict(QueuedResult(status="queued", job_id=job.pk))
+        repo_request.sso_token = github_token
 
-    test_grades: Final[TestGrades] = calculate_grade(git_data)
+        try:
+            graded = await _afetch(current_version, repo_request)
+        except (ClientError, RateLimitExhausted, FetchTimedOut) as error:
+            return fetch_error(error, repo_request, github_token)
+        refreshing_from = None
 
-    view_only = ViewOnly(
-        # commit_interval_days_all=f"{test_grades.commit_interval_all.raw_number:.2f}",
-        commit_interval_days_recent=f"{test_grades.commit_interval_recent.raw_number:.2f}",
-    )
+    await database_sync_to_async(record_access)(repo_request)
+    return _graded_result(repo_request, graded, refreshing_from)
 
-    result = RepoResult(request=repo_request, grades=test_grades, data=git_data, view=view_only, status="success")
-    return asdict(result)
+
+def _bulk_line(repo_url: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if result["status"] == "success":
+        return {"repo_url": repo_url, "status": "success", "grades": result["grades"], "refreshing_from": result["view"]["refreshing_from"]}
+    return {"repo_url": repo_url, "status": result["status"], "error_message": result["error_message"]}
+
+
+async def _afetch_many(current_version: str, repo_requests: List[RepoRequest], github_token: Optional[str]) -> AsyncGenerator[Tuple[RepoRequest, Dict[str, Any]], None]:
+    """
+    Fetches the repos settings.GITGRADE_BULK_CONCURRENCY at a time, yielding each
+    result as it finishes. Once Github's rate limit runs out the repos not yet started
+    answer with the rate limit error instead of each waiting on it
+    """
+    semaphore = asyncio.Semaphore(settings.GITGRADE_BULK_CONCURRENCY)
+    rate_limited = False
+
+    async def fetch(repo_request: RepoRequest) -> Tuple[RepoRequest, Dict[str, Any]]:
+        nonlocal rate_limited
+        async with semaphore:
+            if rate_limited:
+                return repo_request, asdict(ErrorResult(status="error", error_message=RATE_LIMITED_MESSAGE))
+            repo_request.sso_token = github_token
+            try:
+                graded = await _afetch(current_version, repo_request)
+            except (ClientError, RateLimitExhausted, FetchTimedOut) as error:
+                rate_limited = rate_limited or isinstance(error, RateLimitExhausted)
+                return repo_request, fetch_error(error, repo_request, github_token)
+            except Exception:  # pylint: disable=broad-except  # one repo failing shouldn't end the others' stream
+                logger.exception("Unexpected error grading %s/%s", repo_request.owner, repo_request.repo)
+                return repo_request, asdict(ErrorResult(status="error", error_message=UNEXPECTED_ERROR_MESSAGE))
+            await database_sync_to_async(record_access)(repo_request)
+            return repo_request, _graded_result(repo_request, graded, None)
+
+    tasks = [asyncio.create_task(fetch(repo_request)) for repo_request in repo_requests]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _anext(iterator: AsyncIterator[T]) -> T:
+    return await anext(iterator)
+
+
+async def _aclose(generator: AsyncGenerator[Any, None]) -> None:
+    await generator.aclose()
+
+
+def _stream_fetches(current_version: str, repo_requests: List[RepoRequest], github_token: Optional[str]) -> Iterator[Tuple[RepoRequest, Dict[str, Any]]]:
+    # Run on the I/O runtime's loop whatever settings.GITHUB_IO_RUNTIME says, the calling
+    # thread may already be running a loop of its own under ASGI
+    runtime = get_io_runtime()
+    fetches = _afetch_many(current_version, repo_requests, github_token)
+    try:
+        while True:
+            try:
+                yield runtime.submit(_anext(fetches)).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        runtime.submit(_aclose(fetches)).result()
+
+
+_RepoKey = Tuple[str, str, str]
+
+
+@dataclass
+class _BulkRequest:
+    """
+    The repos a bulk request asks for, each once however many of its URLs name it, and
+    the lines for the URLs that can't be graded
+    """
+
+    errors: List[Dict[str, Any]]
+    repo_requests: Dict[_RepoKey, RepoRequest]
+    asked_by: Dict[_RepoKey, List[str]]
+
+    def lines(self, repo_request: RepoRequest, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [_bulk_line(repo_url, result) for repo_url in self.asked_by[(repo_request.source, repo_request.owner, repo_request.repo)]]
+
+
+def _parse_bulk(repo_urls: Sequence[str], github_token: Optional[str]) -> _BulkRequest:
+    bulk = _BulkRequest(errors=[], repo_requests={}, asked_by={})
+    for repo_url in repo_urls:
+        repo_request = _parse_request(repo_url, None, None, None, github_token)
+        if not isinstance(repo_request, RepoRequest):
+            bulk.errors.append(_bulk_line(repo_url, repo_request))
+            continue
+        key = (repo_request.source, repo_request.owner, repo_request.repo)
+        bulk.repo_requests.setdefault(key, repo_request)
+        bulk.asked_by.setdefault(key, []).append(repo_url)
+    return bulk
+
+
+def _bulk_cached(
+    current_version: str, bulk: _BulkRequest, cached_results: Sequence[Union[GradedRepo, CacheMiss]], github_token: Optional[str]
+) -> Tuple[List[Tuple[RepoRequest, Dict[str, Any]]], List[RepoRequest]]:
+    """
+    The results for the repos check_graded_cache_many found, and the repos left to fetch
+    """
+    results: List[Tuple[RepoRequest, Dict[str, Any]]] = []
+    missed: List[RepoRequest] = []
+    for repo_request, cached in zip(bulk.repo_requests.values(), cached_results):
+        if isinstance(cached, GradedRepo):
+            graded, refreshing_from = cached, None
+        elif isinstance(cached, StaleCache) and get_refresher() is not None:
+            graded, refreshing_from = _refresh_in_background(cached, current_version, repo_request, github_token)
+        else:
+            missed.append(repo_request)
+            continue
+        results.append((repo_request, _graded_result(repo_request, graded, refreshing_from)))
+    return results, missed
+
+
+def _record_accesses(repo_requests: List[RepoRequest]) -> None:
+    for repo_request in repo_requests:
+        record_access(repo_request)
+
+
+def input_util_many(repo_urls: Sequence[str], github_token: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Grades many repos for the bulk API, yielding a result for each URL as soon as it's
+    known: URLs that can't be graded first, then the repos found in the cache, read
+    together, then the rest as their fetches finish. A repo asked for by several URLs
+    is fetched once.
+    """
+    current_version = get_version()
+    bulk = _parse_bulk(repo_urls, github_token)
+    yield from bulk.errors
+
+    cached, missed = _bulk_cached(current_version, bulk, check_graded_cache_many(current_version, list(bulk.repo_requests.values())), github_token)
+    _record_accesses([repo_request for repo_request, _ in cached])
+    for repo_request, result in cached:
+        yield from bulk.lines(repo_request, result)
+
+    if missed:
+        logger.info("Fetching %s of %s repos for a bulk request", len(missed), len(bulk.repo_requests))
+        for repo_request, result in _stream_fetches(current_version, missed, github_token):
+            yield from bulk.lines(repo_request, result)
+
+
+async def input_util_many_async(repo_urls: Sequence[str], github_token: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    input_util_many for async views, the cache is read in one query on a thread and the
+    misses are fetched on the running event loop, so the stream never blocks it
+    """
+    current_version = get_version()
+    bulk = _parse_bulk(repo_urls, github_token)
+    for line in bulk.errors:
+        yield line
+
+    cached_results = await database_sync_to_async(check_graded_cache_many)(current_version, list(bulk.repo_requests.values()))
+    cached, missed = _bulk_cached(current_version, bulk, cached_results, github_token)
+    await database_sync_to_async(_record_accesses)([repo_request for repo_request, _ in cached])
+    for repo_request, result in cached:
+        for line in bulk.lines(repo_request, result):
+            yield line
+
+    if missed:
+        logger.info("Fetching %s of %s repos for a bulk request", len(missed), len(bulk.repo_requests))
+        async with aclosing(_afetch_many(current_version, missed, github_token)) as fetches:
+            async for repo_request, result in fetches:
+                for line in bulk.lines(repo_request, result):
+                    yield line
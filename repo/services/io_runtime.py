@@ -0,0 +1,203 @@
+"""
+A process-wide home for Github I/O under WSGI. Each worker runs one event loop on a
+background thread, and that loop owns a single long-lived ClientSession so fetches
+reuse warm keep-alive connections and cached DNS instead of paying for a new TCP+TLS
+handshake on every cache miss.
+
+Sync code submits fetch coroutines with GithubIORuntime.run(). When a Github App is
+configured the loop also keeps its installation token fresh in the background.
+
+Async views under ASGI await fetches on the server's event loop instead, with a session
+of the same kind kept for that loop by loop_session().
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+from weakref import WeakKeyDictionary
+
+import aiohttp
+from aiohttp import ClientSession, TCPConnector, TraceConfig, TraceConnectionCreateEndParams, TraceConnectionReuseconnParams
+from django.conf import settings
+
+from repo.services.github_app_service import get_app_auth
+from repo.services.rest_api_service_async import BASE_URL
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class ConnectionStats:
+    created: int = 0
+    reused: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.created + self.reused
+        return self.reused / total if total else 0.0
+
+
+class GithubIORuntime:
+    """
+    Owns the background event loop and the shared session, started lazily on first use
+    """
+
+    def __init__(self, base_url: str = BASE_URL) -> None:
+        self.base_url = base_url
+        self.stats = ConnectionStats()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[ClientSession] = None
+        self._app_refresh: Optional[concurrent.futures.Future[None]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _trace_config(self) -> TraceConfig:
+        async def on_connection_create_end(_: ClientSession, __: SimpleNamespace, ___: TraceConnectionCreateEndParams) -> None:
+            self.stats.created += 1
+
+        async def on_connection_reuseconn(_: ClientSession, __: SimpleNamespace, ___: TraceConnectionReuseconnParams) -> None:
+            self.stats.reused += 1
+
+        trace_config = TraceConfig()
+        # aiohttp's annotations for signal callbacks don't match its documented signature
+        trace_config.on_connection_create_end.append(on_connection_create_end)  # type: ignore[arg-type]
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)  # type: ignore[arg-type]
+        return trace_config
+
+    async def create_session(self) -> ClientSession:
+        connector = TCPConnector(
+            limit=settings.GITHUB_CONNECTION_LIMIT,
+            limit_per_host=settings.GITHUB_CONNECTION_LIMIT,
+            ttl_dns_cache=settings.GITHUB_DNS_CACHE_SECONDS,
+            keepalive_timeout=settings.GITHUB_KEEPALIVE_SECONDS,
+        )
+        return aiohttp.ClientSession(
+            base_url=self.base_url,
+            connector=connector,
+            raise_for_status=True,
+            trace_configs=[self._trace_config()],
+        )
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+
+            logger.info("Starting Github I/O runtime in process %s", os.getpid())
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="github-io", daemon=True)
+            self._thread.start()
+            self._session = asyncio.run_coroutine_threadsafe(self.create_session(), self._loop).result()
+            # Fetches awaited on the runtime's loop share its session, see loop_session
+            _loop_sessions[self._loop] = self._session
+
+            app_auth = get_app_auth()
+            if app_auth:
+                self._app_refresh = asyncio.run_coroutine_threadsafe(app_auth.refresh_forever(self._session), self._loop)
+
+    def run(self, fetch: Callable[..., Coroutine[Any, Any, T]], *args: Any) -> T:
+        """
+        Runs fetch(*args, session=shared_session) on the background loop and blocks until it returns
+        """
+        self.start()
+        assert self._loop and self._session  # Set by start()
+
+        result = asyncio.run_coroutine_threadsafe(fetch(*args, session=self._session), self._loop).result()
+        logger.debug("  github connections created: %s, reused: %s", self.stats.created, self.stats.reused)
+        return result
+
+    def submit(self, coroutine: Coroutine[Any, Any, T]) -> "concurrent.futures.Future[T]":
+        """
+        Schedules coroutine on the background loop, for callers that wait on it in their own time
+        """
+        self.start()
+        assert self._loop  # Set by start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if not self.running or not self._loop:
+                return
+
+            logger.info(
+                "Stopping Github I/O runtime in process %s, connections created: %s, reused: %s (%.0f%%)",
+                os.getpid(),
+                self.stats.created,
+                self.stats.reused,
+                100 * self.stats.reuse_ratio,
+            )
+            if self._app_refresh:
+                self._app_refresh.cancel()
+                self._app_refresh = None
+            if self._session:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if self._thread:
+                self._thread.join()
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            self._session = None
+
+
+_RUNTIME: Optional[GithubIORuntime] = None
+_RUNTIME_PID: Optional[int] = None
+
+
+def get_io_runtime() -> GithubIORuntime:
+    """
+    Returns this process's runtime, uwsgi forks workers after importing the app so
+    a runtime inherited from the parent process is replaced rather than reused
+    """
+    global _RUNTIME, _RUNTIME_PID  # pylint: disable=global-statement
+    if _RUNTIME is None or _RUNTIME_PID != os.getpid():
+        _RUNTIME = GithubIORuntime()
+        _RUNTIME_PID = os.getpid()
+    return _RUNTIME
+
+
+_loop_sessions: "WeakKeyDictionary[asyncio.AbstractEventLoop, ClientSession]" = WeakKeyDictionary()
+
+
+async def loop_session() -> ClientSession:
+    """
+    The session shared by fetches awaited on the running event loop
+    """
+    loop = asyncio.get_running_loop()
+    session = _loop_sessions.get(loop)
+    if session is None or session.closed:
+        session = _loop_sessions[loop] = await get_io_runtime().create_session()
+    return session
+
+
+async def close_loop_session() -> None:
+    session = _loop_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+def shutdown_io_runtime() -> None:
+    if _RUNTIME is not None and _RUNTIME_PID == os.getpid():
+        _RUNTIME.shutdown()
+
+
+atexit.register(shutdown_io_runtime)
+
+try:
+    import uwsgi  # type: ignore  # pylint: disable=import-error
+
+    # uwsgi doesn't run atexit handlers when it recycles workers (max-requests, reload)
+    uwsgi.atexit = shutdown_io_runtime
+except ImportError:
+    pass
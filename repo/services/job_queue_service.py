@@ -0,0 +1,132 @@
+"""
+Grades repos on worker processes instead of in the request, so a cold grade of a large
+repo doesn't hold the request open past the load balancer's timeout. The queue is the
+GradeJob table, no broker is needed.
+
+Requests that miss the cache enqueue a job and send the visitor to its page, which
+shows the job's progress until the grade is cached. Workers (grade_worker_service)
+claim the oldest queued job with SELECT ... FOR UPDATE SKIP LOCKED where the database
+supports it, then a conditional update, so each job is claimed by one worker. The
+fetch reports each stage as it finishes, and the worker beats every
+settings.GITGRADE_JOB_HEARTBEAT_SECONDS in between. Jobs whose worker has gone quiet
+for settings.GITGRADE_JOB_TIMEOUT_SECONDS are requeued, up to
+settings.GITGRADE_JOB_MAX_ATTEMPTS tries. A worker only writes to a job while it's
+running under its claim, so one that lost the job to a requeue can't overwrite what
+the next worker reports.
+
+Visitors' own tokens aren't written to the database, so jobs fetch with the service
+tokens, and visitors signed in with a token are graded in the request as before.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from repo.data.general import RepoRequest
+from repo.models import GradeJob
+
+logger = logging.getLogger(__name__)
+
+
+def _job_key(url_metadata: RepoRequest) -> Dict[str, str]:
+    return {"source": url_metadata.source, "owner": url_metadata.owner, "repo": url_metadata.repo}
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(url_metadata: RepoRequest) -> GradeJob:
+    """
+    Queues the repo unless it's already queued or running, returns its job either way
+    """
+    active = GradeJob.objects.filter(**_job_key(url_metadata), status__in=[GradeJob.QUEUED, GradeJob.RUNNING]).first()
+    if active:
+        return active
+    try:
+        with transaction.atomic():
+            job: GradeJob = GradeJob.objects.create(**_job_key(url_metadata), stage="Waiting for a worker")
+    except IntegrityError:
+        # Someone queued it between our check and insert
+        return GradeJob.objects.get(**_job_key(url_metadata), status__in=[GradeJob.QUEUED, GradeJob.RUNNING])
+    logger.info("Queued grade job %s for: %s", job.pk, url_metadata)
+    return job
+
+
+def claim(worker: str) -> Optional[GradeJob]:
+    """
+    Takes the oldest queued job, or returns None when there's nothing to do
+    """
+    with transaction.atomic():
+        queued = GradeJob.objects.filter(status=GradeJob.QUEUED).order_by("created", "pk")
+        if connection.features.has_select_for_update_skip_locked:
+            queued = queued.select_for_update(skip_locked=True)
+        job: Optional[GradeJob] = queued.first()
+        if job is None:
+            return None
+
+        now = timezone.now()
+        # Without row locks another worker may have taken it since we looked
+        claimed = GradeJob.objects.filter(pk=job.pk, status=GradeJob.QUEUED).update(
+            status=GradeJob.RUNNING, worker=worker, attempts=job.attempts + 1, heartbeat=now, stage="Starting"
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def _claimed(job_id: int, worker: str) -> "QuerySet[GradeJob]":
+    return GradeJob.objects.filter(pk=job_id, worker=worker, status=GradeJob.RUNNING)
+
+
+def report_progress(job_id: int, worker: str, stage: Optional[str] = None) -> bool:
+    """
+    Beats the job's heartbeat, and shows stage when given, returns False once the worker has lost the job
+    """
+    updates: Dict[str, Any] = {"heartbeat": timezone.now()}
+    if stage is not None:
+        updates["stage"] = stage
+    return bool(_claimed(job_id, worker).update(**updates))
+
+
+def finish(job_id: int, worker: str, error_message: str = "") -> bool:
+    """
+    Marks the job done, or failed with error_message, returns False once the worker has lost the job
+    """
+    finished = _claimed(job_id, worker).update(
+        status=GradeJob.FAILED if error_message else GradeJob.DONE,
+        stage="Failed" if error_message else "Done",
+        error_message=error_message,
+        finished=timezone.now(),
+    )
+    if not finished:
+        logger.warning("Grade job %s was taken from %s before it finished", job_id, worker)
+    return bool(finished)
+
+
+def requeue_abandoned() -> int:
+    """
+    Puts back jobs whose worker stopped reporting, failing those out of attempts, returns how many were requeued
+    """
+    quiet_since = timezone.now() - timedelta(seconds=settings.GITGRADE_JOB_TIMEOUT_SECONDS)
+    abandoned = GradeJob.objects.filter(status=GradeJob.RUNNING, heartbeat__lt=quiet_since)
+    abandoned.filter(attempts__gte=settings.GITGRADE_JOB_MAX_ATTEMPTS).update(
+        status=GradeJob.FAILED, stage="Failed", error_message="Grading this repo keeps failing, please try again later", finished=timezone.now()
+    )
+    requeued = abandoned.update(status=GradeJob.QUEUED, worker="", stage="Waiting for a worker")
+    if requeued:
+        logger.warning("Requeued %s abandoned grade jobs", requeued)
+    return requeued
+
+
+def purge_finished() -> int:
+    kept_since = timezone.now() - timedelta(seconds=settings.GITGRADE_JOB_KEEP_SECONDS)
+    purged, _ = GradeJob.objects.filter(status__in=[GradeJob.DONE, GradeJob.FAILED], finished__lt=kept_since).delete()
+    return purged
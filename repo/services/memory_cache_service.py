@@ -0,0 +1,128 @@
+"""
+Keeps the most recently graded repos in each worker's memory, in front of the shared
+cache and the CacheData lookup, so a popular repo doesn't cost a round trip on every
+request.
+
+Entries are keyed by repo and app version, evicted least recently used first once
+settings.GITGRADE_MEMORY_CACHE_ENTRIES are held, and expire when the database row
+they were read from would go stale. Other workers may refresh the row in the meantime,
+so no entry lives longer than settings.GITGRADE_MEMORY_CACHE_MAX_AGE either. Setting
+the size to 0 turns this tier off.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from django.conf import settings
+
+from repo.data.general import RepoRequest
+from repo.data.grade import GradedRepo
+
+logger = logging.getLogger(__name__)
+
+_RepoKey = Tuple[str, str, str]
+_Key = Tuple[str, str, str, str]  # source, owner, repo, version
+
+
+@dataclass
+class CacheCounters:
+    hits: int = 0
+    misses: int = 0
+    expirations: int = 0
+    evictions: int = 0
+
+
+@dataclass
+class _Entry:
+    graded: GradedRepo
+    expires_at: float  # Epoch seconds
+
+
+def _repo_key(url_metadata: RepoRequest) -> _RepoKey:
+    return url_metadata.source, url_metadata.owner, url_metadata.repo
+
+
+class MemoryCache:
+    """
+    Hands out copies of what it holds, so callers are free to change what they get back
+    """
+
+    def __init__(self, max_entries: int, max_age: float) -> None:
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.counters = CacheCounters()
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._versions: Dict[_RepoKey, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, version: str, url_metadata: RepoRequest) -> Optional[GradedRepo]:
+        key = (*_repo_key(url_metadata), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.counters.expirations += 1
+                self.counters.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters.hits += 1
+            graded = entry.graded
+        return copy.deepcopy(graded)
+
+    def put(self, version: str, url_metadata: RepoRequest, graded: GradedRepo, fresh_until: float) -> None:
+        repo_key = _repo_key(url_metadata)
+        entry = _Entry(graded=copy.deepcopy(graded), expires_at=min(fresh_until, time.time() + self.max_age))
+        with self._lock:
+            key = (*repo_key, version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._versions.setdefault(repo_key, set()).add(version)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.counters.evictions += 1
+
+    def invalidate(self, url_metadata: RepoRequest) -> None:
+        """
+        Drops every version held for the repo
+        """
+        repo_key = _repo_key(url_metadata)
+        with self._lock:
+            for version in list(self._versions.get(repo_key, ())):
+                self._remove((*repo_key, version))
+
+    def _remove(self, key: _Key) -> None:
+        del self._entries[key]
+        repo_key = key[:3]
+        versions = self._versions[repo_key]
+        versions.discard(key[3])
+        if not versions:
+            del self._versions[repo_key]
+
+
+_MEMORY_CACHE: Optional[MemoryCache] = None
+_memory_cache_lock = threading.Lock()
+
+
+def get_memory_cache() -> Optional[MemoryCache]:
+    """
+    Returns the worker's memory cache, or None when the tier is turned off
+    """
+    global _MEMORY_CACHE  # pylint: disable=global-statement
+    max_entries = settings.GITGRADE_MEMORY_CACHE_ENTRIES
+    if max_entries <= 0:
+        return None
+
+    with _memory_cache_lock:
+        if _MEMORY_CACHE is None or _MEMORY_CACHE.max_entries != max_entries or _MEMORY_CACHE.max_age != settings.GITGRADE_MEMORY_CACHE_MAX_AGE:
+            _MEMORY_CACHE = MemoryCache(max_entries=max_entries, max_age=settings.GITGRADE_MEMORY_CACHE_MAX_AGE)
+        return _MEMORY_CACHE
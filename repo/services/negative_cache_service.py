@@ -0,0 +1,127 @@
+"""
+Remembers requests that failed in ways that won't change for a while, so bots and
+typos asking for the same bad URL again get the same error without a call to Github or
+a database lookup.
+
+Three kinds of failure are held, each for its own time:
+  - URLs identify_source couldn't parse or doesn't support, for
+    settings.GITGRADE_NEGATIVE_URL_SECONDS
+  - repos Github answered 404 for, for settings.GITGRADE_NEGATIVE_NOT_FOUND_SECONDS.
+    A private repo is a 404 to anyone without access, so the entry only answers
+    requests made with the same token, and a request with another token that grades
+    the repo clears it
+  - repos Github failed with a 5xx for settings.GITGRADE_NEGATIVE_ERROR_THRESHOLD times
+    in a row, for settings.GITGRADE_NEGATIVE_ERROR_SECONDS after the last one
+
+Entries are held in each worker's memory, at most settings.GITGRADE_NEGATIVE_CACHE_ENTRIES
+of them with the least recently used evicted first. Setting the size to 0 turns the
+cache off.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from repo.data.general import RepoRequest
+from repo.services.rate_limit_service import token_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    error_message: str
+    expires_at: float  # Epoch seconds
+    token: Optional[str]  # token_key the entry answers for, None for every token
+    failures: int
+    blocks_after: int  # Failures before the entry answers requests
+
+
+def url_key(repo_url: str) -> str:
+    return f"url:{repo_url.strip()}"
+
+
+def repo_key(url_metadata: RepoRequest) -> str:
+    # Github's owner and repo names aren't case sensitive
+    return f"repo:{url_metadata.source}:{url_metadata.owner.lower()}:{url_metadata.repo.lower()}"
+
+
+class NegativeCache:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, token: Optional[str] = None) -> Optional[str]:
+        """
+        The error message to answer with, or None if the request should go ahead
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[key]
+                return None
+            if entry.failures < entry.blocks_after or entry.token not in (None, token_key(token)):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.error_message
+
+    def put(self, key: str, error_message: str, seconds: float, blocks_after: int = 1) -> None:
+        """
+        Counts a failure for key, once there have been blocks_after of them in a row
+        every request gets error_message until seconds pass without another
+        """
+        self._put(key, _Entry(error_message=error_message, expires_at=0, token=None, failures=0, blocks_after=blocks_after), seconds)
+
+    def put_for_token(self, key: str, error_message: str, seconds: float, token: Optional[str]) -> None:
+        """
+        Like put, but only requests made with the same token get error_message
+        """
+        self._put(key, _Entry(error_message=error_message, expires_at=0, token=token_key(token), failures=0, blocks_after=1), seconds)
+
+    def _put(self, key: str, new_entry: _Entry, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.time() or (entry.error_message, entry.token) != (new_entry.error_message, new_entry.token):
+                entry = self._entries[key] = new_entry
+            entry.failures += 1
+            entry.expires_at = time.time() + seconds
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_NEGATIVE_CACHE: Optional[NegativeCache] = None
+_negative_cache_lock = threading.Lock()
+
+
+def get_negative_cache() -> Optional[NegativeCache]:
+    """
+    Returns the worker's negative cache, or None when it's turned off
+    """
+    global _NEGATIVE_CACHE  # pylint: disable=global-statement
+    max_entries = settings.GITGRADE_NEGATIVE_CACHE_ENTRIES
+    if max_entries <= 0:
+        return None
+
+    with _negative_cache_lock:
+        if _NEGATIVE_CACHE is None or _NEGATIVE_CACHE.max_entries != max_entries:
+            _NEGATIVE_CACHE = NegativeCache(max_entries=max_entries)
+        return _NEGATIVE_CACHE
@@ -0,0 +1,193 @@
+"""
+Schedules calls to Github around its rate limits.
+
+The remaining budget for each token is tracked from the X-RateLimit-* headers on every
+response, shared by the whole process. Concurrency is adjusted AIMD-style: it grows by
+one after a full window of successful requests and halves whenever Github signals a
+secondary rate limit, pausing the token that hit it until its Retry-After has passed.
+
+More info: https://docs.github.com/en/rest/overview/resources-in-the-rest-api#rate-limiting
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Mapping, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from aiohttp import ClientResponseError
+from django.conf import settings
+
+from repo.services.errors import RateLimitExhausted
+
+logger = logging.getLogger(__name__)
+
+# Github asks clients to wait at least a minute after a secondary rate limit without a Retry-After
+SECONDARY_LIMIT_DEFAULT_WAIT = 60.0
+SECONDARY_LIMIT_MESSAGE = "secondary rate limit"
+
+
+@dataclass
+class RateBudget:
+    limit: int
+    remaining: int
+    reset_at: float  # Epoch seconds
+
+
+def token_key(token: Optional[str]) -> str:
+    """
+    Budgets are keyed by a hash so tokens never end up in logs
+    """
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode("utf8")).hexdigest()[:12]
+
+
+_budgets: Dict[Tuple[str, str], RateBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def record_budget(token: Optional[str], resource: str, headers: Mapping[str, str]) -> Optional[RateBudget]:
+    try:
+        budget = RateBudget(
+            limit=int(headers["X-RateLimit-Limit"]),
+            remaining=int(headers["X-RateLimit-Remaining"]),
+            reset_at=float(headers["X-RateLimit-Reset"]),
+        )
+    except (KeyError, ValueError):
+        return None
+
+    resource = headers.get("X-RateLimit-Resource", resource)
+    with _budgets_lock:
+        _budgets[(token_key(token), resource)] = budget
+    return budget
+
+
+def is_secondary_limit(error: ClientResponseError) -> bool:
+    """
+    Github only documents Retry-After, a 429 or its message as the sign of a secondary limit,
+    any other 403 (SAML, missing permissions, a blocked repo) is an answer, not a limit
+    """
+    headers: Mapping[str, str] = error.headers or {}
+    return error.status == 429 or "Retry-After" in headers or SECONDARY_LIMIT_MESSAGE in (error.message or "").lower()
+
+
+def get_budget(token: Optional[str], resource: str) -> Optional[RateBudget]:
+    with _budgets_lock:
+        budget = _budgets.get((token_key(token), resource))
+    if budget and budget.reset_at <= time.time():
+        # The window has reset since we last heard from Github
+        return None
+    return budget
+
+
+def clear_budgets() -> None:
+    with _budgets_lock:
+        _budgets.clear()
+
+
+class RateLimitScheduler:
+    """
+    One scheduler exists per event loop, every request takes a slot from it
+    """
+
+    def __init__(self, initial_limit: int, max_limit: int, min_limit: int = 1) -> None:
+        self.limit = initial_limit
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.paused_until: Dict[str, float] = {}  # Keyed by token_key
+        self._in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    async def wait_for_budget(self, token: Optional[str], resource: str) -> None:
+        """
+        Sleeps through a secondary rate limit pause on this token, or until its budget
+        resets if it's empty, as long as either is close enough to wait for
+        """
+        paused_for = self.paused_until.get(token_key(token), 0.0) - time.time()
+        if paused_for > 0:
+            if paused_for > settings.GITHUB_RATE_LIMIT_MAX_WAIT:
+                raise RateLimitExhausted(f"Secondary rate limit for {resource} lifts in {paused_for:.0f}s")
+            logger.debug("  paused for secondary rate limit: %.2fs", paused_for)
+            await asyncio.sleep(paused_for)
+
+        budget = get_budget(token, resource)
+        if budget and budget.remaining <= 0:
+            wait = budget.reset_at - time.time()
+            if wait > settings.GITHUB_RATE_LIMIT_MAX_WAIT:
+                raise RateLimitExhausted(f"Rate limit for {resource} resets in {wait:.0f}s")
+            logger.info("Rate limit for %s exhausted, waiting %.2fs for reset", resource, wait)
+            await asyncio.sleep(max(wait, 0.0))
+
+    def ensure_budget(self, token: Optional[str], resource: str, requests_needed: int) -> None:
+        """
+        Refuses to start a paginated fetch that would run out of budget partway through
+        """
+        budget = get_budget(token, resource)
+        if budget and budget.remaining < requests_needed and budget.reset_at - time.time() > settings.GITHUB_RATE_LIMIT_MAX_WAIT:
+            raise RateLimitExhausted(f"{requests_needed} requests needed but only {budget.remaining} remain for {resource}")
+
+    def record_success(self, token: Optional[str], resource: str, headers: Mapping[str, str]) -> None:
+        record_budget(token, resource, headers)
+        self._successes += 1
+        if self._successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self._successes = 0
+            logger.debug("  github concurrency increased to %s", self.limit)
+
+    def record_error(self, token: Optional[str], resource: str, error: ClientResponseError) -> Optional[float]:
+        """
+        Returns how long to wait before retrying, or None if the request shouldn't be retried
+        """
+        if error.status not in (403, 429):
+            return None
+
+        headers: Mapping[str, str] = error.headers or {}
+        budget = record_budget(token, resource, headers)
+
+        if is_secondary_limit(error):
+            retry_after = headers.get("Retry-After")
+            wait = float(retry_after) if retry_after else SECONDARY_LIMIT_DEFAULT_WAIT
+            self.limit = max(self.min_limit, self.limit // 2)
+            self._successes = 0
+            key = token_key(token)
+            self.paused_until[key] = max(self.paused_until.get(key, 0.0), time.time() + wait)
+            logger.warning("Secondary rate limit from Github, concurrency reduced to %s for %.0fs", self.limit, wait)
+            return wait if wait <= settings.GITHUB_RATE_LIMIT_MAX_WAIT else None
+
+        if budget and budget.remaining <= 0:
+            wait = budget.reset_at - time.time()
+            return max(wait, 0.0) if wait <= settings.GITHUB_RATE_LIMIT_MAX_WAIT else None
+
+        return None
+
+
+_schedulers: "WeakKeyDictionary[asyncio.AbstractEventLoop, RateLimitScheduler]" = WeakKeyDictionary()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = RateLimitScheduler(
+            initial_limit=settings.GITHUB_CONCURRENCY_INITIAL,
+            max_limit=settings.GITHUB_CONCURRENCY_MAX,
+        )
+        _schedulers[loop] = scheduler
+    return scheduler
@@ -0,0 +1,92 @@
+"""
+Refreshes stale grades on a small pool of background threads in each worker, so a
+request that finds grades past their freshness can render them straight away and
+leave the fetch from Github to run after the response is sent.
+
+A repo is refreshed once at a time per worker, requests for it while its refresh is
+running don't start another. Failed refreshes are logged and leave the stale row in
+place for the next request to try again.
+"""
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from repo.data.general import RepoRequest
+
+logger = logging.getLogger(__name__)
+
+_RepoKey = Tuple[str, str, str]
+
+
+class Refresher:
+    def __init__(self, max_workers: int) -> None:
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gitgrade-refresh")
+        self._running: Dict[_RepoKey, concurrent.futures.Future[None]] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, url_metadata: RepoRequest, refresh: Callable[[], object]) -> bool:
+        """
+        Queues refresh unless the repo is already being refreshed, returns whether it was queued
+        """
+        key = (url_metadata.source, url_metadata.owner, url_metadata.repo)
+        with self._lock:
+            if key in self._running:
+                logger.debug("  refresh already running for: %s", url_metadata)
+                return False
+            future = self._executor.submit(self._run, url_metadata, refresh)
+            self._running[key] = future
+        future.add_done_callback(lambda _: self._finished(key))
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Blocks until the refreshes running now have finished
+        """
+        with self._lock:
+            running = list(self._running.values())
+        concurrent.futures.wait(running, timeout=timeout)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _run(url_metadata: RepoRequest, refresh: Callable[[], object]) -> None:
+        logger.info("Refreshing stale data for: %s", url_metadata)
+        try:
+            refresh()
+        except Exception:  # pylint: disable=broad-except  # a failed refresh leaves the stale row for the next request
+            logger.exception("Unable to refresh stale data for: %s", url_metadata)
+        finally:
+            # Django opens a connection per thread, and this thread outlives the request
+            connections.close_all()
+
+    def _finished(self, key: _RepoKey) -> None:
+        with self._lock:
+            del self._running[key]
+
+
+_REFRESHER: Optional[Refresher] = None
+_REFRESHER_PID: Optional[int] = None
+_refresher_lock = threading.Lock()
+
+
+def get_refresher() -> Optional[Refresher]:
+    """
+    Returns this process's refresher, or None when background refreshes are turned off
+    """
+    global _REFRESHER, _REFRESHER_PID  # pylint: disable=global-statement
+    max_workers = settings.GITGRADE_REFRESH_WORKERS
+    if max_workers <= 0:
+        return None
+
+    with _refresher_lock:
+        if _REFRESHER is None or _REFRESHER_PID != os.getpid() or _REFRESHER.max_workers != max_workers:
+            _REFRESHER = Refresher(max_workers=max_workers)
+            _REFRESHER_PID = os.getpid()
+        return _REFRESHER
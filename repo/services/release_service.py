@@ -0,0 +1,136 @@
+"""
+Finds the number of tags on a repo and the newest of them without a request per tag.
+
+Git objects never change, so the date of every tag object (or commit, for lightweight
+tags) we've seen is kept in TagObject keyed by its SHA. Dates missing from that store
+are resolved with one GraphQL query per 100 tags when we have a token, otherwise the
+newest entry of the releases listing stands in for them. Repos that only tag, like
+git/git, have no releases listed, so the highest numbered tag is dated on its own instead.
+"""
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Final, Iterable, List, Optional, Tuple
+
+from repo.data.github import Release
+from repo.models import TagObject
+from repo.services.db_access import database_sync_to_async
+from repo.services.github_client import GithubClient
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_BATCH_SIZE: Final = 100
+SHA_PATTERN: Final = re.compile(r"^[0-9a-f]{40}$")
+TAG_PREFIX: Final = "refs/tags/"
+
+
+def _normalize_date(date_str: str) -> str:
+    """
+    GraphQL dates keep the committer's offset, store everything in UTC the way the REST API formats it
+    """
+    parsed = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@database_sync_to_async
+def _load_dates(shas: List[str]) -> Dict[str, str]:
+    return dict(TagObject.objects.filter(sha__in=shas).values_list("sha", "dated_at"))
+
+
+@database_sync_to_async
+def _store_dates(dates: Dict[str, str]) -> None:
+    TagObject.objects.bulk_create([TagObject(sha=sha, dated_at=dated_at) for sha, dated_at in dates.items()], ignore_conflicts=True)
+
+
+def _batch_query(shas: Iterable[str]) -> str:
+    objects = "\n".join(f'    o{sha}: object(oid: "{sha}") {{ ... on Tag {{ tagger {{ date }} }} ... on Commit {{ committedDate }} }}' for sha in shas if SHA_PATTERN.match(sha))
+    return f"query($owner: String!, $name: String!) {{\n  repository(owner: $owner, name: $name) {{\n{objects}\n  }}\n}}"
+
+
+async def _resolve_with_graphql(uri: str, client: GithubClient, shas: List[str]) -> Dict[str, str]:
+    owner, name = uri.split("/", 1)
+    dates: Dict[str, str] = {}
+    for start in range(0, len(shas), GRAPHQL_BATCH_SIZE):
+        batch = shas[start : start + GRAPHQL_BATCH_SIZE]
+        async with client.post("/graphql", json={"query": _batch_query(batch), "variables": {"owner": owner, "name": name}}) as response:
+            response_json: Dict[str, Any] = await response.json()
+
+        repository_json = (response_json.get("data") or {}).get("repository") or {}
+        for alias, object_json in repository_json.items():
+            object_json = object_json or {}
+            date_str = (object_json.get("tagger") or {}).get("date") or object_json.get("committedDate")
+            if date_str:
+                dates[alias[1:]] = _normalize_date(date_str)
+    logger.debug("  resolved %s of %s tag dates with graphql", len(dates), len(shas))
+    return dates
+
+
+async def _get_newest_listed_release(uri: str, client: GithubClient) -> Optional[Release]:
+    async with client.get(f"/repos/{uri}/releases", params={"per_page": 1}) as releases_response:
+        releases_json = await releases_response.json()
+    if not releases_json:
+        return None
+    newest = releases_json[0]
+    return Release(tag=newest["tag_name"], created_at=newest.get("published_at") or newest["created_at"])
+
+
+def _version_key(name: str) -> List[Tuple[int, str]]:
+    """
+    Orders tag names the way versions are numbered, so v2.10.0 comes after v2.9.0
+    """
+    # Splitting on a captured group alternates text and digits, so every position compares like with like
+    return [(int(part), "") if index % 2 else (0, part) for index, part in enumerate(re.split(r"(\d+)", name))]
+
+
+async def _get_object_date(uri: str, client: GithubClient, sha: str, object_type: str) -> Optional[str]:
+    kind = "tags" if object_type == "tag" else "commits"
+    async with client.get(f"/repos/{uri}/git/{kind}/{sha}") as object_response:
+        object_json = await object_response.json()
+    date_str = (object_json.get("tagger") or object_json.get("committer") or {}).get("date")
+    return _normalize_date(date_str) if date_str else None
+
+
+async def _date_highest_tag(uri: str, client: GithubClient, refs_json: List[Dict[str, Any]], dates: Dict[str, str]) -> None:
+    highest = max(refs_json, key=lambda ref: _version_key(ref["ref"][len(TAG_PREFIX) :]))
+    sha = highest["object"]["sha"]
+    if sha in dates:
+        return
+    date_str = await _get_object_date(uri, client, sha, highest["object"].get("type", "commit"))
+    if date_str:
+        await _store_dates({sha: date_str})
+        dates[sha] = date_str
+
+
+async def get_newest_release(uri: str, client: GithubClient) -> Tuple[Optional[Release], int]:
+    """
+    Returns the newest tag and how many tags the repo has
+    """
+    logger.debug("  fetching releases for: %s", uri)
+    async with client.get(f"/repos/{uri}/git/matching-refs/tags") as tags_response:
+        refs_json = await tags_response.json()
+    logger.debug("  received %s tags", len(refs_json))
+
+    if not refs_json:
+        return None, 0
+
+    names = {ref["object"]["sha"]: ref["ref"][len(TAG_PREFIX) :] for ref in refs_json}
+    dates = await _load_dates(list(names))
+    missing = [sha for sha in names if sha not in dates]
+    logger.debug("  %s tag dates cached, %s missing", len(dates), len(missing))
+
+    candidates: List[Release] = []
+    if missing and client.authenticated:
+        resolved = await _resolve_with_graphql(uri, client, missing)
+        await _store_dates(resolved)
+        dates.update(resolved)
+    elif missing:
+        listed = await _get_newest_listed_release(uri, client)
+        if listed:
+            candidates.append(listed)
+        else:
+            await _date_highest_tag(uri, client, refs_json, dates)
+
+    candidates.extend(Release(tag=names[sha], created_at=dated_at) for sha, dated_at in dates.items())
+    # Only the newest matters, so a linear max instead of sorting every tag
+    newest = max(candidates, key=lambda release: _normalize_date(release.created_at), default=None)
+    return newest, len(refs_json)
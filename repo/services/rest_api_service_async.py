@@ -1,17 +1,26 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import List, Dict, Final, Literal
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Final, Literal, Optional, Tuple
 
 import aiohttp
 from aiohttp import ClientSession, ClientResponse
+from django.conf import settings
 from multidict import MultiDict
 from yarl import URL
 
-from repo.data.from_source import DataFromAPI, TimeData
-from repo.data.general import RepoRequest, Statistics
-from repo.data.github import Repo, Commit, Author, Release
-from repo.services.util import get_statistics
+from repo.data.from_source import DataFromAPI, TotalsData
+from repo.data.general import RepoRequest
+from repo.data.github import Repo, Author, Commit, Release
+from repo.services.activity_service import record_activity
+from repo.services.commit_accumulator import CommitAccumulator, RecentActivity
+from repo.services.commit_window_service import Watermark, advance, commits_after_watermark, load_watermark, save_watermark, trim_days
+from repo.services.github_client import GithubClient
+from repo.services.release_service import get_newest_release
+from repo.services.stats_service import get_stats_activity
+from repo.services.task_graph import TaskGraph
+from repo.services.totals_service import ContributorTotals, get_commit_total, get_contributor_totals
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +28,8 @@ GITHUB_DATETIME_FORMAT: Final = "%Y-%m-%dT%H:%M:%S%z"
 BASE_URL: Final = "https://api.github.com"
 RECENT_DAYS: Final = 182  # About 6 months
 
+RecentCommits = Tuple[CommitAccumulator, Optional[Watermark]]
+
 
 def _github_datestring_to_datetime(date_str: str) -> datetime:
     return datetime.strptime(date_str, GITHUB_DATETIME_FORMAT)
@@ -28,9 +39,9 @@ def _github_datetime_to_datestring(date: datetime) -> str:
     return date.strftime(GITHUB_DATETIME_FORMAT)
 
 
-async def _get_repo(uri: str, session: ClientSession) -> Repo:
+async def _get_repo(uri: str, client: GithubClient) -> Repo:
     logger.debug("  fetching repo: %s", uri)
-    async with session.get(f"/repos/{uri}") as repo_response:
+    async with client.get(f"/repos/{uri}") as repo_response:
         repo_response_json = await repo_response.json()
 
     repo = Repo(
@@ -59,71 +70,42 @@ async def _get_last_page_number(paginated_response: ClientResponse) -> int:
     return 0
 
 
-async def _get_pull_request_count(uri: str, session: ClientSession, state: Literal["open", "all"]) -> int:
+async def _get_pull_request_count(uri: str, client: GithubClient, state: Literal["open", "all"]) -> int:
     logger.debug("  fetching pull request count for: %s (%s)", uri, state)
     params = {"per_page": 1, "state": state}
-    async with session.get(f"/repos/{uri}/pulls", params=params) as pulls_response:
+    async with client.get(f"/repos/{uri}/pulls", params=params) as pulls_response:
         return await _get_last_page_number(pulls_response)
 
 
-async def _get_tag(uri: str, tag_sha: str, sem: asyncio.Semaphore, session: ClientSession) -> Release:
-    async with sem:
-        async with session.get(f"/repos/{uri}/git/tags/{tag_sha}") as tag_response:
-            tag_json = await tag_response.json()
-            return Release(tag=tag_json["tag"], created_at=tag_json["tagger"]["date"])
-
-
-async def _get_releases(uri: str, session: ClientSession) -> List[Release]:
-    logger.debug("  fetching releases for: %s", uri)
-
-    tasks = []
-    async with session.get(f"/repos/{uri}/git/matching-refs/tags") as tags_response:
-        tags_json = await tags_response.json()
-        logger.debug("  received %s tags", len(tags_json))
-
-        sem = asyncio.Semaphore(10)
-        for tag in tags_json:
-            sha = tag["object"]["sha"]
-            tasks.append(_get_tag(uri, sha, sem, session))
-
-    releases = await asyncio.gather(*tasks, return_exceptions=False)
-    # Sorts releases (aka tags) by date, puts most recent release first
-    releases.sort(key=lambda r: _github_datestring_to_datetime(r.created_at), reverse=True)
-
-    return releases
-
-
-async def _get_commit_count(uri: str, session: ClientSession, since: datetime) -> int:
+async def _get_commit_count(uri: str, client: GithubClient, since: datetime) -> int:
     logger.debug("  fetching commit count for: %s (since %s)", uri, datetime)
     params = {"per_page": 1, "since": _github_datetime_to_datestring(since)}
-    async with session.get(f"/repos/{uri}/commits", params=params) as pulls_response:
+    async with client.get(f"/repos/{uri}/commits", params=params) as pulls_response:
         return await _get_last_page_number(pulls_response)
 
 
 async def _extract_commit_list(response: ClientResponse) -> List[Commit]:
+    """
+    Only the author and dates of each commit are used for grading, the rest of the payload is dropped
+    """
     commit_list_json = await response.json()
-    commit_list: List[Commit] = []
+    commits = []
     for commit_json in commit_list_json:
-        commit_list.append(
-            Commit(
-                author=Author(
-                    name=commit_json.get("commit", {}).get("author", {}).get("name", "unknown"),
-                    date=commit_json.get("commit", {}).get("author", {}).get("date", "1970-01-01T00:00:00Z"),
-                ),
-                message=commit_json.get("commit", {}).get("message", "unknown"),
-                comment_count=commit_json.get("commit", {}).get("comment_count", 0),
-            )
-        )
-    return commit_list
-
-
-async def _get_page_of_commits(url: URL, session: ClientSession, lock_rate: asyncio.Lock, lock_concurrent: asyncio.Semaphore) -> List[Commit]:
-    async with lock_concurrent:
-        async with lock_rate:
-            await asyncio.sleep(0.1)
-        logger.debug("  --> fetching commit page at url: %s", url)
-        async with session.get(f"{url.path}?{url.query_string}") as commit_response:
-            return await _extract_commit_list(commit_response)
+        author_json = commit_json.get("commit", {}).get("author", {})
+        author = Author(name=author_json.get("name", "unknown"), date=author_json.get("date", "1970-01-01T00:00:00Z"))
+        committed_at = commit_json.get("commit", {}).get("committer", {}).get("date", author.date)
+        commits.append(Commit(sha=commit_json.get("sha", ""), author=author, committed_at=committed_at))
+    return commits
+
+
+async def _get_commit_list(url: URL, client: GithubClient) -> List[Commit]:
+    logger.debug("  --> fetching commit page at url: %s", url)
+    async with client.get(f"{url.path}?{url.query_string}") as commit_response:
+        return await _extract_commit_list(commit_response)
+
+
+async def _get_page_of_commits(url: URL, client: GithubClient, accumulator: CommitAccumulator) -> None:
+    accumulator.add_commits(int(url.query.get("page", "1")), await _get_commit_list(url, client))
 
 
 async def _generate_urls(next_url: URL, last_url: URL) -> List[URL]:
@@ -146,74 +128,83 @@ async def _generate_urls(next_url: URL, last_url: URL) -> List[URL]:
     return urls
 
 
-async def _get_commits(uri: str, session: ClientSession, since: datetime) -> List[Commit]:
+async def _get_remaining_urls(client: GithubClient, first_page: ClientResponse) -> List[URL]:
+    next_page = first_page.links.get("next")
+    last_page = first_page.links.get("last")
+    if not (next_page and last_page):
+        return []
+
+    next_url = next_page.get("url")
+    last_url = last_page.get("url")
+    if not (next_url and last_url):
+        return []
+
+    urls = await _generate_urls(URL(next_url), URL(last_url))
+    client.ensure_budget(len(urls))
+    return urls
+
+
+async def _get_commits_after(uri: str, client: GithubClient, watermark: Watermark, since: datetime) -> Optional[RecentCommits]:
+    """
+    Fetches only the commits newer than the watermark, None if the watermark commit is gone
+    """
+    logger.debug("  getting commits after watermark %s", watermark.sha)
+    params = {"per_page": 100, "since": _github_datetime_to_datestring(datetime.fromtimestamp(watermark.committed_at, tz=timezone.utc))}
+    async with client.get(f"/repos/{uri}/commits", params=params) as first_page:
+        pages = [await _extract_commit_list(first_page)]
+        urls = await _get_remaining_urls(client, first_page)
+    pages.extend(await asyncio.gather(*[_get_commit_list(url, client) for url in urls]))
+
+    new_commits = commits_after_watermark([commit for page in pages for commit in page], watermark.sha)
+    if new_commits is None:
+        return None
+    logger.debug("  --> %s commits since the watermark", len(new_commits))
+
+    accumulator = CommitAccumulator()
+    accumulator.seed(trim_days(watermark.days, int(since.timestamp())))
+    accumulator.add_commits(1, new_commits)
+    return accumulator, advance(watermark, new_commits[0] if new_commits else None, accumulator.days())
+
+
+async def _get_commits(uri: str, client: GithubClient, since: datetime, watermark: Optional[Watermark] = None) -> RecentCommits:
+    if watermark and watermark.committed_at >= since.timestamp():
+        recent_commits = await _get_commits_after(uri, client, watermark, since)
+        if recent_commits:
+            return recent_commits
+        logger.info("  watermark %s is no longer on the default branch of %s, fetching every recent commit", watermark.sha, uri)
+
     logger.debug("  getting commits for this repo")
+    accumulator = CommitAccumulator()
     params = {"per_page": 100, "since": _github_datetime_to_datestring(since)}
-    async with session.get(f"/repos/{uri}/commits", params=params) as first_page:
-        commit_list = await _extract_commit_list(first_page)
+    async with client.get(f"/repos/{uri}/commits", params=params) as first_page:
+        commits = await _extract_commit_list(first_page)
+        accumulator.add_commits(1, commits)
         logger.debug("  --> got the first page of commits")
-        next_page = first_page.links.get("next")
-        last_page = first_page.links.get("last")
-        if next_page and last_page:
-            next_url = next_page.get("url")
-            last_url = last_page.get("url")
+        urls = await _get_remaining_urls(client, first_page)
 
-            if next_url and last_url:
-                lock_rate = asyncio.Lock()
-                lock_concurrent = asyncio.Semaphore(10)
+    await asyncio.gather(*[_get_page_of_commits(url, client, accumulator) for url in urls])
+    return accumulator, advance(None, commits[0] if commits else None, accumulator.days())
 
-                urls = await _generate_urls(URL(next_url), URL(last_url))
-                tasks = [_get_page_of_commits(url, session, lock_rate, lock_concurrent) for url in urls]
-                response_list = await asyncio.gather(*tasks)
-                commit_list += [commit for commit_list in response_list for commit in commit_list]
 
-        return commit_list
+async def _get_recent_activity(uri: str, client: GithubClient, since: datetime, watermark: Optional[Watermark]) -> Tuple[RecentActivity, Optional[Watermark]]:
+    """
+    Uses Github's commit statistics when settings.GITHUB_COMMIT_SOURCE is "stats", paging
+    through commits when they're missing. Statistics carry no commit SHAs, so the
+    watermark is only moved on by paging.
+    """
+    if settings.GITHUB_COMMIT_SOURCE == "stats":
+        activity = await get_stats_activity(uri, client, int(since.timestamp()))
+        if activity:
+            return activity, None
+        logger.info("  commit statistics unavailable for %s, paging through commits", uri)
 
+    accumulator, new_watermark = await _get_commits(uri, client, since, watermark)
+    return accumulator.activity(), new_watermark
 
-async def _process_commit_data(commits: List[Commit]) -> TimeData:
-    logger.info("Getting commit data from APIs")
-    deltas: List[float] = []
-    previous_date = None
-    commit_count = 0
-    commits_by_author: Dict[str, int] = {}
-    popular_author_count = 0
-
-    for commit in commits:
-        commit_count += 1
-        commit_author = commit.author
-        logger.debug("  author: %s", commit_author.name)
-        commits_this_author = commits_by_author.get(commit_author.name, 0) + 1
-        commits_by_author[commit_author.name] = commits_this_author
-        logger.debug("  commits so far: %s", commits_this_author)
-
-        if commits_this_author > popular_author_count:
-            popular_author_count = commits_this_author
-
-        commit_date = _github_datestring_to_datetime(commit_author.date)
-        logger.debug("  commit date: %s", commit_date)
-        if previous_date is None:
-            previous_date = commit_date
-            continue
-
-        deltas.append((previous_date - commit_date).total_seconds())
-        previous_date = commit_date
-
-    if deltas:
-        commit_stats = get_statistics(deltas)
-    else:
-        commit_stats = Statistics(mean=0, standard_deviation=0)
-
-    return TimeData(
-        commit_count=commit_count,
-        commit_count_primary_author=popular_author_count,
-        commit_interval=commit_stats,
-        author_count=len(commits_by_author),
-    )
 
-
-async def _get_days_since_last_commit(commit: Commit) -> int:
+async def _get_days_since_last_commit(newest_commit: int) -> int:
     logger.info("  getting days since last commit")
-    latest_commit = _github_datestring_to_datetime(commit.author.date)
+    latest_commit = datetime.fromtimestamp(newest_commit, tz=timezone.utc)
     since_last_commit = datetime.now().astimezone() - latest_commit
     return since_last_commit.days
 
@@ -225,33 +216,27 @@ async def _get_days_since_last_release(release: Release) -> int:
     return since_last_release.days
 
 
-async def fetch_github_api_data(repo_request_data: RepoRequest) -> DataFromAPI:
-    logger.debug("  fetching data from github for: %s", repo_request_data)
-
+def _or_recent(total: Optional[int], recent: int) -> int:
+    return recent if total is None else max(total, recent)
+
+
+async def build_api_data(  # pylint: disable=too-many-arguments
+    repo_http: Repo,
+    open_pulls: int,
+    all_pulls: int,
+    recent: RecentActivity,
+    commit_total: int,
+    contributor_totals: ContributorTotals,
+    newest_release: Optional[Release],
+    releases_count: int,
+) -> DataFromAPI:
+    """
+    Turns the raw Github responses into the DataFromAPI used by the rest of the app,
+    shared by every fetch engine so they grade repos identically
+    """
     today = datetime.today()
-    six_months_ago = datetime.today() - timedelta(days=RECENT_DAYS)
-
-    repo_uri = f"{repo_request_data.owner}/{repo_request_data.repo}"
-
-    headers = {}
-    if repo_request_data.sso_token:
-        headers["Authorization"] = f"Bearer {repo_request_data.sso_token}"
-
-    async with aiohttp.ClientSession(base_url=BASE_URL, headers=headers, raise_for_status=True) as session:
-        repo_http = await _get_repo(repo_uri, session)
-
-        open_pulls = await _get_pull_request_count(repo_uri, session, "open")
-        all_pulls = await _get_pull_request_count(repo_uri, session, "all")
-
-        # Paginated API calls for recent commits of git/git: 22
-        # Paginated API calls for all commits of git/git: 663
-        recent_commits = await _get_commits(repo_uri, session, six_months_ago)
-
-        releases = await _get_releases(repo_uri, session)
 
-    recent_commits.sort(key=lambda c: c.author.date, reverse=True)
-
-    time_data_recent = await _process_commit_data(recent_commits)
+    logger.info("Getting commit data from APIs")
 
     updated_delta = today.date() - _github_datestring_to_datetime(repo_http.updated_at).date()
     days_since_update = updated_delta.days
@@ -259,19 +244,24 @@ async def fetch_github_api_data(repo_request_data: RepoRequest) -> DataFromAPI:
     created_delta = today.date() - _github_datestring_to_datetime(repo_http.created_at).date()
     days_since_create = created_delta.days
 
-    try:
-        days_since_last_commit = await _get_days_since_last_commit(recent_commits[0])
-    except IndexError:
+    if recent.newest_commit is not None:
+        days_since_last_commit = await _get_days_since_last_commit(recent.newest_commit)
+    else:
         days_since_last_commit = RECENT_DAYS + 1
 
-    try:
-        latest_release = releases[0].tag
-    except IndexError:
-        latest_release = "Unreleased"
+    time_recent = recent.time_recent
+    # Without the contributors listing the recent window is the best lower bound we have
+    time_all = TotalsData(
+        commit_count=max(commit_total, time_recent.commit_count),
+        commit_count_primary_author=_or_recent(contributor_totals.commit_count_primary_author, time_recent.commit_count_primary_author),
+        author_count=_or_recent(contributor_totals.author_count, time_recent.author_count),
+    )
 
-    try:
-        days_since_last_release = await _get_days_since_last_release(releases[0])
-    except IndexError:
+    if newest_release:
+        latest_release = newest_release.tag
+        days_since_last_release: Optional[int] = await _get_days_since_last_release(newest_release)
+    else:
+        latest_release = "Unreleased"
         days_since_last_release = None
 
     return DataFromAPI(
@@ -282,8 +272,58 @@ async def fetch_github_api_data(repo_request_data: RepoRequest) -> DataFromAPI:
         pull_request_count=all_pulls,
         open_issue_count=repo_http.open_issues_count,
         days_since_commit=days_since_last_commit,
-        time_recent=time_data_recent,
+        time_all=time_all,
+        time_recent=time_recent,
         latest_release=latest_release,
-        releases_count=len(releases),
+        releases_count=releases_count,
         days_since_last_release=days_since_last_release,
     )
+
+
+async def _fetch_with_session(repo_request_data: RepoRequest, session: ClientSession) -> DataFromAPI:
+    six_months_ago = datetime.today() - timedelta(days=RECENT_DAYS)
+    repo_uri = f"{repo_request_data.owner}/{repo_request_data.repo}"
+    client = GithubClient(session, repo_request_data.sso_token, job=repo_uri)
+
+    graph = TaskGraph(f"fetch {repo_uri}")
+    graph.add("repo", lambda: _get_repo(repo_uri, client))
+    graph.add("open_pulls", lambda: _get_pull_request_count(repo_uri, client, "open"))
+    graph.add("all_pulls", lambda: _get_pull_request_count(repo_uri, client, "all"))
+    # Paginated API calls for recent commits of git/git: 22
+    # Paginated API calls for all commits of git/git: 663, the all-time totals are counted instead
+    graph.add("commit_total", lambda: get_commit_total(repo_uri, client))
+    graph.add("contributor_totals", lambda: get_contributor_totals(repo_uri, client))
+    graph.add("watermark", lambda: load_watermark(repo_request_data))
+    graph.add("commits", lambda watermark: _get_recent_activity(repo_uri, client, six_months_ago, watermark), depends_on=("watermark",))
+    graph.add("saved_watermark", lambda commits: save_watermark(repo_request_data, commits[1]), depends_on=("commits",))
+    graph.add(
+        "saved_activity",
+        lambda commits: record_activity(repo_request_data, commits[1], int(six_months_ago.timestamp()), int(time.time())),
+        depends_on=("commits",),
+    )
+    graph.add("releases", lambda: get_newest_release(repo_uri, client))
+    graph.add(
+        "api_data",
+        lambda repo, open_pulls, all_pulls, commits, commit_total, contributor_totals, releases: build_api_data(
+            repo, open_pulls, all_pulls, commits[0], commit_total, contributor_totals, *releases
+        ),
+        depends_on=("repo", "open_pulls", "all_pulls", "commits", "commit_total", "contributor_totals", "releases"),
+    )
+    results = await graph.run()
+
+    api_data: DataFromAPI = results["api_data"]
+    return api_data
+
+
+async def fetch_github_api_data(repo_request_data: RepoRequest, session: Optional[ClientSession] = None) -> DataFromAPI:
+    """
+    Collects the data for a grade from Github's REST API, pass in a session to reuse
+    its connections, otherwise a session is opened just for this fetch
+    """
+    logger.debug("  fetching data from github for: %s", repo_request_data)
+
+    if session:
+        return await _fetch_with_session(repo_request_data, session)
+
+    async with aiohttp.ClientSession(base_url=BASE_URL, raise_for_status=True) as new_session:
+        return await _fetch_with_session(repo_request_data, new_session)
@@ -0,0 +1,100 @@
+"""
+Shares graded repos between every node behind the load balancer through one of Django's
+cache backends (settings.CACHES[settings.GITGRADE_SHARED_CACHE_ALIAS]), Redis or
+memcached in production, local memory or files when developing.
+
+Entries hold the GitData and TestGrades of a repo for one app version, and expire
+with the database row they mirror. They're stored in a compact form, the field values
+of each dataclass in declaration order with no names, encoded as JSON. The format
+number at the front lets a later layout ignore entries written by an older one.
+
+The shared cache is an optimization, a backend that's down or full reads as a miss.
+"""
+import json
+import logging
+import time
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from typing import Any, Final, List, Optional, Tuple, Type, TypeVar, get_type_hints
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+
+from repo.data.general import RepoRequest
+from repo.data.grade import GradedRepo
+
+logger = logging.getLogger(__name__)
+
+FORMAT: Final = 1
+
+T = TypeVar("T")
+
+
+def _flatten(value: Any) -> Any:
+    if is_dataclass(value):
+        return [_flatten(getattr(value, field.name)) for field in fields(value) if field.init]
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _build(cls: Type[T], values: List[Any]) -> T:
+    hints = get_type_hints(cls)
+    kwargs = {}
+    for field, value in zip([field for field in fields(cls) if field.init], values):
+        hint = hints[field.name]
+        if is_dataclass(hint):
+            value = _build(hint, value)
+        elif isinstance(hint, type) and issubclass(hint, Enum):
+            value = hint(value)
+        kwargs[field.name] = value
+    return cls(**kwargs)
+
+
+def dump_graded(graded: GradedRepo, fresh_until: float) -> bytes:
+    return json.dumps([FORMAT, int(fresh_until), _flatten(graded)], separators=(",", ":")).encode("utf8")
+
+
+def load_graded(blob: bytes) -> Optional[Tuple[GradedRepo, float]]:
+    """
+    The graded repo and when it stops being fresh, None for entries written in another format
+    """
+    layout, fresh_until, values = json.loads(blob)
+    if layout != FORMAT:
+        return None
+    return _build(GradedRepo, values), float(fresh_until)
+
+
+def _key(version: str, url_metadata: RepoRequest) -> str:
+    return f"grade:{url_metadata.source}:{url_metadata.owner}:{url_metadata.repo}:{version}"
+
+
+class SharedCache:
+    def __init__(self, backend: BaseCache) -> None:
+        self.backend = backend
+
+    def get(self, version: str, url_metadata: RepoRequest) -> Optional[Tuple[GradedRepo, float]]:
+        try:
+            blob = self.backend.get(_key(version, url_metadata))
+            return load_graded(blob) if blob else None
+        except Exception:  # pylint: disable=broad-except  # backends raise their client library's errors
+            logger.exception("Unable to read %s from the shared cache", _key(version, url_metadata))
+            return None
+
+    def put(self, version: str, url_metadata: RepoRequest, graded: GradedRepo, fresh_until: float) -> None:
+        timeout = int(fresh_until - time.time())
+        if timeout <= 0:
+            return
+        try:
+            self.backend.set(_key(version, url_metadata), dump_graded(graded, fresh_until), timeout=timeout)
+        except Exception:  # pylint: disable=broad-except  # backends raise their client library's errors
+            logger.exception("Unable to write %s to the shared cache", _key(version, url_metadata))
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """
+    Returns the shared cache, or None when no cache alias is configured
+    """
+    if not settings.GITGRADE_SHARED_CACHE_ALIAS:
+        return None
+    return SharedCache(caches[settings.GITGRADE_SHARED_CACHE_ALIAS])
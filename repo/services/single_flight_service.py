@@ -0,0 +1,282 @@
+"""
+Coalesces concurrent fetches of the same repo, so a repo linked somewhere popular is
+fetched from Github once rather than once for every request that arrives before its
+grades are cached.
+
+Within a worker the first request to miss becomes the leader and later requests for
+the repo wait on its result, or its error. A 401, 403 or 404 only answers for the leader's
+token though, so waiters run their own fetch rather than share it. Across workers and nodes the leader also
+takes a FetchLease row. A leader that finds the lease held by someone else polls the
+cache for their result instead of fetching, and takes the lease over if it's released
+or expires without one. Waiting is capped at settings.GITGRADE_FETCH_WAIT_SECONDS,
+after which FetchTimedOut is raised.
+
+Async views coalesce fetches on their event loop the same way with AsyncSingleFlight
+and afetch_once, and take the same leases.
+"""
+import asyncio
+import copy
+import functools
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar, cast
+from weakref import WeakKeyDictionary
+
+from aiohttp import ClientResponseError
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from repo.data.general import RepoRequest
+from repo.data.grade import GradedRepo
+from repo.models import FetchLease
+from repo.services.db_access import database_sync_to_async
+from repo.services.db_cache_service import acheck_graded_cache, check_graded_cache
+from repo.services.errors import CacheMiss, FetchTimedOut
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _refused_for_token(error: BaseException) -> bool:
+    return isinstance(error, ClientResponseError) and error.status in (401, 403, 404)
+
+
+@dataclass
+class _Call(Generic[T]):
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[T] = None
+    error: Optional[BaseException] = None
+
+
+class SingleFlight:  # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call[Any]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key: Hashable, fetch: Callable[[], T], timeout: float) -> T:
+        """
+        Runs fetch unless a call for key is already running, in which case waits up to
+        timeout seconds for that call and returns a copy of its result
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.debug("  waiting on the fetch already running for: %s", key)
+            if not call.done.wait(timeout):
+                raise FetchTimedOut()
+            if call.error is not None and _refused_for_token(call.error):
+                logger.debug("  the fetch waited on was refused for its token, fetching with ours: %s", key)
+                return fetch()
+            if call.error is not None:
+                raise call.error
+            return cast(T, copy.deepcopy(call.result))
+
+        try:
+            call.result = fetch()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class _LeaderCancelled(Exception):
+    """
+    The leader was cancelled before finishing its fetch, e.g. its client disconnected
+    """
+
+
+class AsyncSingleFlight:  # pylint: disable=too-few-public-methods
+    """
+    SingleFlight for coroutines on one event loop
+    """
+
+    def __init__(self) -> None:
+        self.coalesced = 0
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def run(self, key: Hashable, fetch: Callable[[], Awaitable[T]], timeout: float) -> T:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while (call := self._calls.get(key)) is not None:
+            self.coalesced += 1
+            logger.debug("  waiting on the fetch already running for: %s", key)
+            try:
+                result = cast(T, await asyncio.wait_for(asyncio.shield(call), max(deadline - loop.time(), 0)))
+            except asyncio.TimeoutError as timeout_error:
+                raise FetchTimedOut() from timeout_error
+            except _LeaderCancelled:
+                # Its waiters' requests are still live, one of them takes over the fetch
+                logger.debug("  the fetch being waited on was cancelled, retrying: %s", key)
+                continue
+            except ClientResponseError as error:
+                if not _refused_for_token(error):
+                    raise
+                logger.debug("  the fetch waited on was refused for its token, fetching with ours: %s", key)
+                return await fetch()
+            return copy.deepcopy(result)
+
+        call = self._calls[key] = loop.create_future()
+        # Nobody may be waiting to see the leader's error
+        call.add_done_callback(lambda done: done.cancelled() or done.exception())
+        try:
+            result = await fetch()
+            call.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            call.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        finally:
+            del self._calls[key]
+
+
+def _lease_key(url_metadata: RepoRequest) -> Dict[str, str]:
+    return {"source": url_metadata.source, "owner": url_metadata.owner, "repo": url_metadata.repo}
+
+
+def acquire_lease(url_metadata: RepoRequest, seconds: float) -> Optional[str]:
+    """
+    Takes the repo's lease unless someone else holds it, returns the holder to release it with
+    """
+    holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=seconds)
+
+    if FetchLease.objects.filter(**_lease_key(url_metadata), expires_at__lte=now).update(holder=holder, expires_at=expires_at):
+        logger.info("Took over an expired fetch lease for: %s", url_metadata)
+        return holder
+    try:
+        with transaction.atomic():
+            FetchLease.objects.create(**_lease_key(url_metadata), holder=holder, expires_at=expires_at)
+    except IntegrityError:
+        return None
+    return holder
+
+
+def release_lease(url_metadata: RepoRequest, holder: str) -> None:
+    FetchLease.objects.filter(**_lease_key(url_metadata), holder=holder).delete()
+
+
+def _fetch_under_lease(current_version: str, url_metadata: RepoRequest, fetch: Callable[[], GradedRepo]) -> GradedRepo:
+    lease_seconds = settings.GITGRADE_FETCH_LEASE_SECONDS
+    if lease_seconds <= 0:
+        return fetch()
+
+    deadline = time.monotonic() + settings.GITGRADE_FETCH_WAIT_SECONDS
+    while True:
+        holder = acquire_lease(url_metadata, lease_seconds)
+        if holder:
+            try:
+                # The last holder may have cached the repo between our miss and taking the lease
+                try:
+                    return check_graded_cache(current_version, url_metadata)
+                except CacheMiss:
+                    return fetch()
+            finally:
+                release_lease(url_metadata, holder)
+
+        if time.monotonic() >= deadline:
+            raise FetchTimedOut()
+        logger.debug("  another worker is fetching, polling the cache for: %s", url_metadata)
+        time.sleep(settings.GITGRADE_FETCH_POLL_SECONDS)
+        try:
+            return check_graded_cache(current_version, url_metadata)
+        except CacheMiss:
+            pass
+
+
+async def _afetch_under_lease(current_version: str, url_metadata: RepoRequest, fetch: Callable[[], Awaitable[GradedRepo]]) -> GradedRepo:
+    lease_seconds = settings.GITGRADE_FETCH_LEASE_SECONDS
+    if lease_seconds <= 0:
+        return await fetch()
+
+    deadline = time.monotonic() + settings.GITGRADE_FETCH_WAIT_SECONDS
+    while True:
+        holder = await database_sync_to_async(acquire_lease)(url_metadata, lease_seconds)
+        if holder:
+            try:
+                try:
+                    return await acheck_graded_cache(current_version, url_metadata)
+                except CacheMiss:
+                    return await fetch()
+            finally:
+                await database_sync_to_async(release_lease)(url_metadata, holder)
+
+        if time.monotonic() >= deadline:
+            raise FetchTimedOut()
+        logger.debug("  another worker is fetching, polling the cache for: %s", url_metadata)
+        await asyncio.sleep(settings.GITGRADE_FETCH_POLL_SECONDS)
+        try:
+            return await acheck_graded_cache(current_version, url_metadata)
+        except CacheMiss:
+            pass
+
+
+def fetch_once(current_version: str, url_metadata: RepoRequest, fetch: Callable[[], GradedRepo]) -> GradedRepo:
+    """
+    Runs fetch for the repo unless another request is already fetching it, in which
+    case that request's result is returned
+    """
+    key = (url_metadata.source, url_metadata.owner, url_metadata.repo, current_version)
+    return get_single_flight().run(
+        key,
+        functools.partial(_fetch_under_lease, current_version, url_metadata, fetch),
+        timeout=settings.GITGRADE_FETCH_WAIT_SECONDS,
+    )
+
+
+_SINGLE_FLIGHT: Optional[SingleFlight] = None
+_SINGLE_FLIGHT_PID: Optional[int] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    global _SINGLE_FLIGHT, _SINGLE_FLIGHT_PID  # pylint: disable=global-statement
+    with _single_flight_lock:
+        if _SINGLE_FLIGHT is None or _SINGLE_FLIGHT_PID != os.getpid():
+            _SINGLE_FLIGHT = SingleFlight()
+            _SINGLE_FLIGHT_PID = os.getpid()
+        return _SINGLE_FLIGHT
+
+
+_async_single_flights: "WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSingleFlight]" = WeakKeyDictionary()
+
+
+def get_async_single_flight() -> AsyncSingleFlight:
+    loop = asyncio.get_running_loop()
+    if loop not in _async_single_flights:
+        _async_single_flights[loop] = AsyncSingleFlight()
+    return _async_single_flights[loop]
+
+
+async def afetch_once(current_version: str, url_metadata: RepoRequest, fetch: Callable[[], Awaitable[GradedRepo]]) -> GradedRepo:
+    """
+    fetch_once for async views
+    """
+    key = (url_metadata.source, url_metadata.owner, url_metadata.repo, current_version)
+    return await get_async_single_flight().run(
+        key,
+        functools.partial(_afetch_under_lease, current_version, url_metadata, fetch),
+        timeout=settings.GITGRADE_FETCH_WAIT_SECONDS,
+    )
@@ -0,0 +1,122 @@
+"""
+A small dependency-aware runner for the coroutines that make up a fetch, every stage
+starts as soon as the stages it depends on have finished so independent calls to
+Github overlap instead of running back to back.
+
+Callers that show progress, like grade jobs, set stage_listener for the fetch and are
+told as each stage finishes.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Called with the name of each stage as it finishes, the count finished so far and the count of stages
+StageListener = Callable[[str, int, int], Awaitable[None]]
+stage_listener: contextvars.ContextVar[Optional[StageListener]] = contextvars.ContextVar("stage_listener", default=None)
+
+
+@dataclass
+class StageTiming:
+    """
+    Start and finish of a stage, in seconds since the graph started running
+    """
+
+    started: float
+    finished: float
+    depends_on: Sequence[str] = field(default_factory=tuple)
+
+    @property
+    def duration(self) -> float:
+        return self.finished - self.started
+
+
+async def _cancel(tasks: Collection["asyncio.Task[Any]"]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@dataclass
+class _Stage:
+    factory: Callable[..., Awaitable[Any]]
+    depends_on: Sequence[str]
+
+
+class TaskGraph:
+    """
+    Stages are added with the names of the stages they depend on, a stage's factory is
+    called with the results of its dependencies as keyword arguments.
+
+    If any stage fails, every other stage still running is cancelled and the error of
+    the earliest added stage that failed is raised from run(). Cancelling run() cancels
+    the stages too.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.timings: Dict[str, StageTiming] = {}
+        self._stages: Dict[str, _Stage] = {}
+
+    def add(self, name: str, factory: Callable[..., Awaitable[Any]], depends_on: Sequence[str] = ()) -> None:
+        for dependency in depends_on:
+            if dependency not in self._stages:
+                raise ValueError(f"Stage {name} depends on unknown stage {dependency}")
+        self._stages[name] = _Stage(factory=factory, depends_on=tuple(depends_on))
+
+    async def run(self) -> Dict[str, Any]:
+        graph_start = time.perf_counter()
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+        async def _run_stage(name: str, stage: _Stage) -> Any:
+            dependency_results = {dependency: await tasks[dependency] for dependency in stage.depends_on}
+            started = time.perf_counter() - graph_start
+            result = await stage.factory(**dependency_results)
+            self.timings[name] = StageTiming(started=started, finished=time.perf_counter() - graph_start, depends_on=stage.depends_on)
+            listener = stage_listener.get()
+            if listener:
+                await listener(name, len(self.timings), len(self._stages))
+            return result
+
+        # Stages can only depend on stages added before them, so tasks exist before they're awaited
+        for name, stage in self._stages.items():
+            tasks[name] = asyncio.create_task(_run_stage(name, stage), name=f"{self.name}:{name}")
+
+        try:
+            await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        except BaseException:
+            # e.g. the fetch itself was cancelled, its stages mustn't carry on with nobody waiting for them
+            await _cancel(tasks.values())
+            raise
+
+        # In the order stages were added, so the error raised doesn't depend on which failed first
+        for task in tasks.values():
+            error = task.exception() if task.done() and not task.cancelled() else None
+            if error:
+                await _cancel(tasks.values())
+                raise error
+
+        self._log_timings()
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> List[str]:
+        """
+        Walks back from the last stage to finish through whichever dependency finished last
+        """
+        if not self.timings:
+            return []
+
+        path = [max(self.timings, key=lambda stage_name: self.timings[stage_name].finished)]
+        while self.timings[path[-1]].depends_on:
+            path.append(max(self.timings[path[-1]].depends_on, key=lambda stage_name: self.timings[stage_name].finished))
+        path.reverse()
+        return path
+
+    def _log_timings(self) -> None:
+        for name, timing in sorted(self.timings.items(), key=lambda item: item[1].started):
+            logger.debug("  %s stage %s: %.3fs (started at +%.3fs)", self.name, name, timing.duration, timing.started)
+        logger.info("%s critical path: %s", self.name, " -> ".join(self.critical_path()))
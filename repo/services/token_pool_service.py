@@ -0,0 +1,88 @@
+"""
+Shares the service tokens in settings.GITHUB_SERVICE_TOKENS, and the Github App
+installation token if an app is configured, between every fetch, so
+visitors who haven't signed in still get an authenticated rate limit and grading
+throughput grows with the number of tokens provisioned.
+
+The pool itself holds no state, the remaining budget of each token is the one
+rate_limit_service records from Github's headers. A visitor's own token is always
+tried first for their requests, after that the service token with the most headroom
+is used, with ties taken in turn so fresh tokens share the load.
+"""
+import itertools
+import logging
+from typing import List, Optional, Sequence
+
+from aiohttp import ClientSession
+from django.conf import settings
+
+from repo.services.github_app_service import GithubAppAuth, get_app_auth
+from repo.services.rate_limit_service import get_budget, token_key
+
+logger = logging.getLogger(__name__)
+
+_rotation = itertools.count()
+
+
+def headroom(token: Optional[str], resource: str) -> float:
+    """
+    Requests left for this token, a token we haven't heard about yet (or whose window has reset) is unlimited
+    """
+    budget = get_budget(token, resource)
+    return float("inf") if budget is None else float(budget.remaining)
+
+
+class TokenPool:
+    def __init__(self, tokens: Sequence[str], app: Optional[GithubAppAuth] = None) -> None:
+        self.service_tokens = list(tokens)
+        self.app = app
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.service_tokens or self.app)
+
+    @property
+    def tokens(self) -> List[str]:
+        app_token = self.app.cached() if self.app else None
+        return self.service_tokens + [app_token] if app_token else list(self.service_tokens)
+
+    async def prepare(self, session: ClientSession) -> None:
+        """
+        Makes sure the Github App installation token, if any, is fresh before choosing
+        """
+        if self.app:
+            await self.app.token(session)
+
+    def _rotated(self) -> List[str]:
+        tokens = self.tokens
+        if not tokens:
+            return []
+        start = next(_rotation) % len(tokens)
+        return tokens[start:] + tokens[:start]
+
+    def choose(self, user_token: Optional[str], resource: str) -> Optional[str]:
+        """
+        Picks the token for the next request, None means an anonymous request
+        """
+        if user_token and headroom(user_token, resource) > 0:
+            return user_token
+
+        # max() keeps the first of equals, so rotating first spreads ties across the pool
+        best = max(self._rotated(), key=lambda token: headroom(token, resource), default=None)
+        if best and headroom(best, resource) > 0:
+            if user_token:
+                logger.debug("  user token exhausted for %s, using service token %s", resource, token_key(best))
+            return best
+
+        # Everything is exhausted, leave it to the scheduler to wait or give up
+        return user_token or best
+
+    def headroom(self, user_token: Optional[str], resource: str) -> float:
+        tokens = ([user_token] if user_token else []) + self.tokens
+        if not tokens:
+            return headroom(None, resource)
+        return sum(headroom(token, resource) for token in tokens)
+
+
+def get_token_pool() -> TokenPool:
+    return TokenPool(settings.GITHUB_SERVICE_TOKENS, app=get_app_auth())
@@ -0,0 +1,69 @@
+"""
+Counts a repo's all-time commits and authors without paging through its history.
+
+Asking for one item per page makes the page number in the "last" link equal to the
+number of items, so each total costs a single request whatever the size of the repo.
+Contributors are listed busiest first, so the one item on the first page of that probe
+is also the primary author.
+
+Github refuses to list contributors for very large histories with a 403 saying so, those
+totals are left as None for the caller to fill in. That 403 is an answer rather than a rate
+limit, the scheduler doesn't pause other fetches for it.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientResponse, ClientResponseError
+from yarl import URL
+
+from repo.services.github_client import GithubClient
+
+logger = logging.getLogger(__name__)
+
+TOO_LARGE_MESSAGE = "too large to list contributors"
+
+
+@dataclass
+class ContributorTotals:
+    author_count: Optional[int]
+    commit_count_primary_author: Optional[int]
+
+
+async def _count_items(response: ClientResponse) -> int:
+    """
+    The number of items in a per_page=1 listing, a single page has no "last" link
+    """
+    last = response.links.get("last")
+    if last:
+        return int(URL(last["url"]).query.get("page", 0))
+
+    if response.status == 204:
+        return 0
+    items: List[Any] = await response.json()
+    return len(items)
+
+
+async def get_commit_total(uri: str, client: GithubClient) -> int:
+    logger.debug("  fetching all-time commit count for: %s", uri)
+    async with client.get(f"/repos/{uri}/commits", params={"per_page": 1}) as commits_response:
+        return await _count_items(commits_response)
+
+
+async def get_contributor_totals(uri: str, client: GithubClient) -> ContributorTotals:
+    """
+    Anonymous contributors are included so authors without a Github account are counted too
+    """
+    logger.debug("  fetching all-time contributor counts for: %s", uri)
+    try:
+        async with client.get(f"/repos/{uri}/contributors", params={"per_page": 1, "anon": 1}) as contributors_response:
+            author_count = await _count_items(contributors_response)
+            busiest: List[Dict[str, Any]] = await contributors_response.json() if author_count else []
+    except ClientResponseError as error:
+        if error.status != 403 or TOO_LARGE_MESSAGE not in (error.message or "").lower():
+            raise
+        logger.info("  github won't list contributors for %s, leaving the all-time author totals out", uri)
+        return ContributorTotals(author_count=None, commit_count_primary_author=None)
+
+    primary_author_commits = busiest[0].get("contributions", 0) if busiest else 0
+    return ContributorTotals(author_count=author_count, commit_count_primary_author=primary_author_commits)
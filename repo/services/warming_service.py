@@ -0,0 +1,168 @@
+"""
+Refreshes the grades of popular repos shortly before their CacheData rows expire, so
+the next visitor finds them fresh instead of waiting on a fetch from Github. Run by
+`manage.py warm_cache`, once or as a long running worker.
+
+Repos are ranked by the hits they'd miss if left alone: their hit rate from
+access_service times the part of the next settings.GITGRADE_WARM_LOOKAHEAD_HOURS they'd
+spend expired. A repo expiring in an hour outranks one as popular expiring tomorrow,
+and one already expired gets the whole lookahead. Repos with fewer than
+settings.GITGRADE_WARM_MIN_HITS_PER_DAY aren't worth the rate limit they'd cost.
+
+Warming shares the service tokens with visitors, so it stops once every token it could
+fetch with has less than 1 - settings.GITGRADE_WARM_BUDGET_SHARE of its limit left. The
+budgets are those Github reports, spent by visitors and warming alike, so warming backs
+off when visitors are busy.
+"""
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from functools import reduce
+from operator import or_
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from gitgrade.util import get_version
+from repo.data.general import SECONDS_IN_DAY, SECONDS_IN_HOUR, RepoRequest
+from repo.models import CacheData, RepoAccess
+from repo.services.access_service import decayed_rate
+from repo.services.db_cache_service import RECENT_DAYS, row_expiry
+from repo.services.input_service import fetch_and_cache
+from repo.services.rate_limit_service import get_budget
+from repo.services.single_flight_service import acquire_lease, release_lease
+from repo.services.token_pool_service import get_token_pool
+
+logger = logging.getLogger(__name__)
+
+_QUERY_CHUNK = 100
+
+_RepoKey = Tuple[str, str, str]
+
+
+@dataclass(order=True)
+class WarmCandidate:
+    priority: float  # Hits expected on the expired row within the lookahead
+    url_metadata: RepoRequest = field(compare=False)
+    hit_rate: float = field(compare=False)  # Hits a day
+    expires_in: float = field(compare=False)  # Seconds, negative once expired
+
+
+@dataclass
+class WarmReport:
+    refreshed: List[WarmCandidate] = field(default_factory=list)
+    failed: List[WarmCandidate] = field(default_factory=list)
+    deferred: List[WarmCandidate] = field(default_factory=list)  # Left for when there's budget
+    busy: List[WarmCandidate] = field(default_factory=list)  # Being fetched by someone else
+
+
+def _hot_repos(min_hit_rate: float, now: datetime) -> Dict[_RepoKey, float]:
+    # Rates only decay between hits, so the stored rate bounds the current one from above
+    hot = {}
+    for access in RepoAccess.objects.filter(hit_rate__gte=min_hit_rate).iterator():
+        hit_rate = decayed_rate(access.hit_rate, access.rate_updated, now)
+        if hit_rate >= min_hit_rate:
+            hot[(access.source, access.owner, access.repo)] = hit_rate
+    return hot
+
+
+def plan_warming(lookahead_hours: float, min_hit_rate: float, limit: Optional[int] = None, now: Optional[datetime] = None) -> List[WarmCandidate]:
+    """
+    The hot repos whose rows expire within the lookahead, highest priority first
+    """
+    now = now or timezone.now()
+    lookahead = lookahead_hours * SECONDS_IN_HOUR
+    horizon = now.timestamp() + lookahead
+    # row_expiry is midnight of the day after RECENT_DAYS, so rows up to this date expire by the horizon
+    expiring_by = datetime.fromtimestamp(horizon).date() - timedelta(days=RECENT_DAYS + 1)
+
+    hot = _hot_repos(min_hit_rate, now)
+    keys = list(hot)
+    queue: List[WarmCandidate] = []
+    for start in range(0, len(keys), _QUERY_CHUNK):
+        matching = reduce(or_, (Q(source=source, owner=owner, repo=repo) for source, owner, repo in keys[start : start + _QUERY_CHUNK]))
+        rows = CacheData.objects.filter(matching, row_updated_date__lte=expiring_by).values_list("source", "owner", "repo", "row_updated_date")
+        for source, owner, repo, row_updated_date in rows:
+            hit_rate = hot[(source, owner, repo)]
+            expires_in = row_expiry(row_updated_date) - now.timestamp()
+            expired_for = lookahead - max(expires_in, 0)
+            # heapq pops the smallest first
+            heapq.heappush(
+                queue,
+                WarmCandidate(
+                    priority=-hit_rate * expired_for / SECONDS_IN_DAY,
+                    url_metadata=RepoRequest(source=source, owner=owner, repo=repo),
+                    hit_rate=hit_rate,
+                    expires_in=expires_in,
+                ),
+            )
+
+    planned: List[WarmCandidate] = []
+    while queue and (limit is None or len(planned) < limit):
+        candidate = heapq.heappop(queue)
+        candidate.priority = -candidate.priority
+        planned.append(candidate)
+    return planned
+
+
+def _warming_resource() -> str:
+    # Warming fetches without a visitor's token, see input_service._select_fetcher
+    if settings.GITHUB_FETCH_ENGINE == "graphql" and get_token_pool().configured:
+        return "graphql"
+    return "core"
+
+
+def within_budget(share: float) -> bool:
+    """
+    Whether any token warming could fetch with has more than 1 - share of its limit left,
+    a token we haven't heard about yet (or whose window has reset) is untouched
+    """
+    resource = _warming_resource()
+    tokens: List[Optional[str]] = list(get_token_pool().tokens) or [None]
+    for token in tokens:
+        budget = get_budget(token, resource)
+        if budget is None or budget.remaining > budget.limit * (1 - share):
+            return True
+    return False
+
+
+def warm(candidates: List[WarmCandidate], budget_share: float, dry_run: bool = False) -> WarmReport:
+    """
+    Refreshes the candidates in order until the budget share is spent, a dry run
+    refreshes nothing and reports what would be
+    """
+    report = WarmReport()
+    current_version = get_version()
+    for position, candidate in enumerate(candidates):
+        if not dry_run and not within_budget(budget_share):
+            logger.info("Warming budget spent, deferring %s repos", len(candidates) - position)
+            report.deferred.extend(candidates[position:])
+            break
+        if dry_run:
+            report.refreshed.append(candidate)
+            continue
+
+        # The row is still fresh, so rather than waiting on the cache like a visitor
+        # would, leave repos another worker is fetching to them
+        lease_seconds = settings.GITGRADE_FETCH_LEASE_SECONDS
+        holder = acquire_lease(candidate.url_metadata, lease_seconds) if lease_seconds > 0 else None
+        if lease_seconds > 0 and holder is None:
+            logger.info("  already being fetched, skipping: %s", candidate.url_metadata)
+            report.busy.append(candidate)
+            continue
+
+        logger.info("Warming %s at %.2f hits a day", candidate.url_metadata, candidate.hit_rate)
+        try:
+            fetch_and_cache(current_version, candidate.url_metadata)
+        except Exception:  # pylint: disable=broad-except  # one repo failing shouldn't stop the rest warming
+            logger.exception("Unable to warm: %s", candidate.url_metadata)
+            report.failed.append(candidate)
+        else:
+            report.refreshed.append(candidate)
+        finally:
+            if holder:
+                release_lease(candidate.url_metadata, holder)
+    return report
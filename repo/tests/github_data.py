@@ -4,7 +4,7 @@
 
 from typing import Final
 
-from repo.data.github import Commit, Author
+from repo.data.github import Author, Commit
 
 COMMITS_PAGE_RAW: Final = [
     {
@@ -406,43 +406,43 @@ COMMITS_PAGE_RAW: Final = [
 
 COMMITS_PAGE_OBJECTS = [
     Commit(
+        sha="e8e737bcf6d22927caebc30c5d57ac4634063219",
         author=Author(
             name="Matthew Rahtz",
             date="2022-03-26T16:55:35Z"
         ),
-        message="bpo-43224: Implement PEP 646 grammar changes (GH-31018)\n\nCo-authored-by: Jelle Zijlstra <jelle.zijlstra@gmail.com>",
-        comment_count=0
+        committed_at="2022-03-26T16:55:35Z"
     ),
     Commit(
+        sha="26cca8067bf5306e372c0e90036d832c5021fd90",
         author=Author(
             name="Pablo Galindo Salgado",
             date="2022-03-26T16:29:02Z"
         ),
-        message="bpo-47117: Don't crash if we fail to decode characters when the tokenizer buffers are uninitialized (GH-32129)\n\n\n\nAutomerge-Triggered-By: GH:pablogsal",
-        comment_count=0
+        committed_at="2022-03-26T16:29:02Z"
     ),
     Commit(
+        sha="ee912ad6f66bb8cf5a8a2b4a7ecd2752bf070864",
         author=Author(
             name="Alex Hedges",
             date="2022-03-26T00:09:40Z"
         ),
-        message="bpo-47105: Cite grp.h instead of pwd.h in grp docs (GH-32091)",
-        comment_count=0
+        committed_at="2022-03-26T00:09:40Z"
     ),
     Commit(
+        sha="bad6ffaa64eecd33f4320ca31b1201b25cd8fc91",
         author=Author(
             name="Andrew Svetlov",
             date="2022-03-25T22:26:23Z"
         ),
-        message="bpo-47062: Rename factory argument to loop_factory (GH-32113)",
-        comment_count=0
+        committed_at="2022-03-25T22:26:23Z"
     ),
     Commit(
+        sha="d03acd7270d66ddb8e987f9743405147ecc15087",
         author=Author(
             name="Duprat",
             date="2022-03-25T22:01:21Z"
         ),
-        message="bpo-43352: Add a Barrier object in asyncio lib (GH-24903)\n\nCo-authored-by: Yury Selivanov <yury@edgedb.com>\r\nCo-authored-by: Andrew Svetlov <andrew.svetlov@gmail.com>",
-        comment_count=0
+        committed_at="2022-03-25T22:01:21Z"
     ),
 ]
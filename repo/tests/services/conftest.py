@@ -0,0 +1,96 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import time
+from typing import Any, Callable, Dict, Generator
+
+import pytest
+from aiohttp import web
+
+from repo.data.from_source import DataFromAPI, TimeData, TotalsData
+from repo.data.general import SECONDS_IN_DAY, Statistics
+from repo.data.git_data import CommitData, CommitTotalData, ContributorData, GitData, PopularityData, PullRequestData
+from repo.data.grade import GradedRepo
+from repo.services.grade_calculator_service import calculate_grade
+from repo.services.rate_limit_service import clear_budgets
+
+
+@pytest.fixture
+def empty_budgets() -> Generator[None, None, None]:
+    """
+    Rate limit budgets are process-wide, keep them from leaking between tests
+    """
+    clear_budgets()
+    yield
+    clear_budgets()
+
+
+@pytest.fixture
+def git_data() -> GitData:
+    return GitData(
+        pull_request=PullRequestData(count=10, count_open=1),
+        commit_all=CommitTotalData(count=100, count_primary_author=50),
+        commit_recent=CommitData(count=10, count_primary_author=5, interval=Statistics(mean=86400.0, standard_deviation=3600.5)),
+        contributor=ContributorData(days_since_create=1000, days_since_commit=1, author_count_all=3, author_count_recent=2),
+        popularity=PopularityData(watcher_count=10, open_issue_count=1),
+    )
+
+
+@pytest.fixture
+def graded(git_data: GitData) -> GradedRepo:
+    return GradedRepo(data=git_data, grades=calculate_grade(git_data))
+
+
+@pytest.fixture
+def rate_headers() -> Callable[..., Dict[str, str]]:
+    """
+    Github's rate limit headers for the core resource, resetting reset_in seconds from now
+    """
+
+    def build(remaining: int, reset_in: float = 3600) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(int(time.time() + reset_in)),
+            "X-RateLimit-Resource": "core",
+        }
+
+    return build
+
+
+@pytest.fixture
+def github_stub(loop: Any, aiohttp_server: Any) -> Callable[..., Any]:
+    """
+    Starts a stand-in for Github's API serving the given routes, e.g. github_stub(web.get("/repos/test/test", get_repo))
+    """
+
+    def start(*routes: web.RouteDef) -> Any:
+        app = web.Application()
+        app.add_routes(routes)
+        return loop.run_until_complete(aiohttp_server(app))
+
+    return start
+
+
+@pytest.fixture
+def expected_api_data() -> DataFromAPI:
+    """
+    What the test/test repository served by the REST and GraphQL stubs grades from, frozen at 2022-01-30
+    """
+    return DataFromAPI(
+        days_since_update=10,
+        days_since_create=1000,
+        watcher_count=1000,
+        pull_request_count_open=10,
+        pull_request_count=100,
+        open_issue_count=10,
+        days_since_commit=10,
+        time_all=TotalsData(commit_count=500, commit_count_primary_author=400, author_count=12),
+        time_recent=TimeData(
+            commit_count=10,
+            commit_count_primary_author=10,
+            commit_interval=Statistics(mean=float(SECONDS_IN_DAY), standard_deviation=0.0),
+            author_count=1,
+        ),
+        latest_release="10.0.0",
+        releases_count=10,
+        days_since_last_release=10,
+    )
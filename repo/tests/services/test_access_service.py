@@ -0,0 +1,47 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+
+from repo.data.general import RepoRequest
+from repo.models import RepoAccess
+from repo.services.access_service import DECAY_DAYS, AccessCounter, decayed_rate, save_hits
+
+REPO = RepoRequest(source="github", owner="test", repo="test")
+KEY = ("github", "test", "test")
+NOW = datetime(2022, 3, 1, tzinfo=timezone.utc)
+
+
+def test_rates_decay() -> None:
+    assert decayed_rate(2.0, NOW, NOW) == 2.0
+    assert decayed_rate(2.0, NOW, NOW + timedelta(days=DECAY_DAYS)) == pytest.approx(2.0 / math.e)
+    assert decayed_rate(2.0, NOW + timedelta(days=1), NOW) == 2.0
+
+
+@pytest.mark.django_db
+def test_hits_add_to_decayed_rate() -> None:
+    save_hits({KEY: 7}, now=NOW)
+    assert RepoAccess.objects.get().hit_rate == pytest.approx(1.0)
+
+    save_hits({KEY: 14}, now=NOW + timedelta(days=DECAY_DAYS))
+    access = RepoAccess.objects.get()
+    assert access.hit_rate == pytest.approx(1.0 / math.e + 2.0)
+    assert access.rate_updated == NOW + timedelta(days=DECAY_DAYS)
+
+
+@pytest.mark.django_db
+def test_hits_buffered_until_flush(settings: Any) -> None:
+    settings.GITGRADE_ACCESS_FLUSH_SECONDS = 60
+    counter = AccessCounter()
+    counter.record(REPO)
+    counter.record(REPO)
+    assert not RepoAccess.objects.exists()
+
+    counter.flush()
+    assert RepoAccess.objects.get().hit_rate == pytest.approx(2 / DECAY_DAYS)
+
+    settings.GITGRADE_ACCESS_FLUSH_SECONDS = 0
+    counter.record(RepoRequest(source="github", owner="test", repo="other"))
+    assert RepoAccess.objects.count() == 2
@@ -0,0 +1,85 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from typing import Dict
+
+import pytest
+
+from repo.data.general import SECONDS_IN_DAY, RepoRequest, Statistics
+from repo.services.activity_service import MAX_DAYS, AuthorSketch, DailyActivity, load_activity, save_activity
+from repo.services.commit_accumulator import DaySummary, even_day_segment, merge
+from repo.services.stats_service import summarize_commit_activity
+
+REPO = RepoRequest(source="github", owner="test", repo="test")
+
+
+def _days(commits_by_day: Dict[int, Dict[str, int]]) -> Dict[int, DaySummary]:
+    return {day: DaySummary(segment=even_day_segment(day * SECONDS_IN_DAY, sum(authors.values())), authors=authors) for day, authors in commits_by_day.items()}
+
+
+def test_sketch_keeps_heavy_hitters() -> None:
+    sketch = AuthorSketch(capacity=3)
+    for author, count in [("a", 10), ("b", 5), ("c", 1), ("d", 2), ("a", 3), ("e", 1)]:
+        sketch.add(author, count)
+
+    assert sketch.top(2) == [("a", 13), ("b", 5)]
+    assert len(sketch.counts) == 3
+    assert AuthorSketch.load(sketch.dump(), capacity=3).counts == sketch.counts
+
+
+def test_fetches_rewrite_their_window() -> None:
+    activity = DailyActivity.empty(100)
+    activity.record(_days({100: {"a": 2}, 105: {"a": 1, "b": 3}, 110: {"b": 1}}), first_day=100, last_day=110)
+    assert (activity.first_day, activity.last_day) == (100, 110)
+    assert activity.sketch.top() == [("a", 3), ("b", 3)]
+
+    # A later fetch covers days 104 to 120, day 105 was rewritten and day 110 finished
+    activity.record(_days({105: {"a": 1}, 110: {"b": 2}, 118: {"c": 4}}), first_day=104, last_day=120)
+    assert (activity.first_day, activity.last_day) == (100, 120)
+    assert activity.commits_by_day(99, 111) == [0, 2, 0, 0, 0, 0, 1, 0, 0, 0, 0, 2, 0]
+    assert activity.sketch.top() == [("b", 5), ("c", 4), ("a", 3)]
+
+    whole = activity.window(0, 200)
+    assert (whole.commit_count, whole.active_days, whole.author_count_low, whole.author_count_high) == (9, 4, 1, 4)
+    recent = activity.window(106, 120)
+    assert (recent.commit_count, recent.active_days) == (6, 2)
+
+
+def test_intervals_match_daily_statistics() -> None:
+    activity = DailyActivity.empty(1000)
+    activity.record(_days({1000: {"a": 3}, 1002: {"a": 1}, 1010: {"b": 4}}), first_day=1000, last_day=1011)
+
+    expected = None
+    for day, count in [(1010, 4), (1002, 1), (1000, 3)]:
+        expected = merge(expected, even_day_segment(day * SECONDS_IN_DAY, count))
+    assert expected
+    assert activity.window(1000, 1011).commit_interval == expected.statistics()
+    assert activity.window(1003, 1009).commit_interval == Statistics(mean=0, standard_deviation=0)
+
+    # The same days from Github's weekly statistics
+    commit_activity = [{"week": 1000 * SECONDS_IN_DAY, "days": [3, 0, 1, 0, 0, 0, 0]}, {"week": 1007 * SECONDS_IN_DAY, "days": [0, 0, 0, 4, 0, 0, 0]}]
+    segment = summarize_commit_activity(commit_activity, since=0)
+    assert segment and segment.statistics() == expected.statistics()
+
+
+def test_record_is_capped() -> None:
+    activity = DailyActivity.empty(0)
+    activity.record(_days({0: {"a": 1}}), first_day=0, last_day=10)
+    activity.record(_days({MAX_DAYS + 20: {"a": 1}}), first_day=MAX_DAYS + 10, last_day=MAX_DAYS + 20)
+
+    assert len(activity.commits) == MAX_DAYS
+    assert activity.window(0, MAX_DAYS + 20).commit_count == 1
+
+
+@pytest.mark.django_db
+def test_saved_packed() -> None:
+    assert load_activity(REPO) is None
+
+    activity = DailyActivity.empty(19000)
+    activity.record(_days({19000: {"a": 70000}, 19001: {f"author-{number}": 1 for number in range(300)}}), first_day=19000, last_day=19002)
+    save_activity(REPO, activity)
+
+    loaded = load_activity(REPO)
+    assert loaded
+    assert loaded.commits_by_day(19000, 19002) == [70000, 300, 0]
+    assert list(loaded.authors) == [1, 300, 0]
+    assert loaded.sketch.counts == activity.sketch.counts
+    assert loaded.sketched_through == 19001
@@ -0,0 +1,121 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import random
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+import pytest
+
+from repo.data.general import SECONDS_IN_DAY
+from repo.data.github import Author, Commit
+from repo.services.commit_accumulator import CommitAccumulator
+from repo.services.util import get_statistics
+
+
+def _pages(commit_count: int, page_size: int) -> List[List[Tuple[str, int]]]:
+    """
+    Newest first, with irregular intervals and a handful of authors
+    """
+    generator = random.Random(1234)
+    date = 1_700_000_000
+    commits = []
+    for index in range(commit_count):
+        commits.append((f"author-{index % 7}", date))
+        date -= generator.randint(60, SECONDS_IN_DAY)
+    return [commits[start : start + page_size] for start in range(0, commit_count, page_size)]
+
+
+@pytest.mark.parametrize("commit_count, page_size", [(1, 100), (2, 100), (250, 100), (1000, 30)])
+def test_matches_sorted_list(commit_count: int, page_size: int) -> None:
+    pages = _pages(commit_count, page_size)
+    page_numbers = list(range(1, len(pages) + 1))
+    random.Random(5678).shuffle(page_numbers)  # Pages finish in whatever order they like
+
+    accumulator = CommitAccumulator()
+    for page_number in page_numbers:
+        accumulator.add_page(page_number, pages[page_number - 1])
+    actual = accumulator.time_data()
+
+    dates = sorted((date for page in pages for _, date in page), reverse=True)
+    deltas = [newer - older for newer, older in zip(dates, dates[1:])]
+    assert actual.commit_count == commit_count
+    assert actual.author_count == min(commit_count, 7)
+    if deltas:
+        expected = get_statistics(deltas)
+        assert actual.commit_interval.mean == pytest.approx(expected.mean)
+        assert actual.commit_interval.standard_deviation == pytest.approx(expected.standard_deviation)
+
+
+def test_neighbouring_pages_merge_as_they_arrive() -> None:
+    pages = _pages(500, 100)
+    accumulator = CommitAccumulator()
+
+    accumulator.add_page(2, pages[1])
+    accumulator.add_page(4, pages[3])
+    assert len(accumulator._runs_by_first) == 2  # pylint: disable=protected-access
+
+    accumulator.add_page(3, pages[2])
+    accumulator.add_page(1, pages[0])
+    accumulator.add_page(5, pages[4])
+    assert len(accumulator._runs_by_first) == 1  # pylint: disable=protected-access
+
+
+def test_empty() -> None:
+    accumulator = CommitAccumulator()
+    accumulator.add_page(1, [])
+    actual = accumulator.time_data()
+
+    assert actual.commit_count == 0
+    assert actual.commit_count_primary_author == 0
+    assert actual.commit_interval.majority == 0
+    assert accumulator.segment() is None
+
+
+def test_seeded_days_match_full_fold() -> None:
+    pages = _pages(300, 100)
+    full = CommitAccumulator()
+    for page_number, page in enumerate(pages, start=1):
+        full.add_page(page_number, page)
+
+    # An earlier fetch that saw every page but the newest
+    earlier = CommitAccumulator()
+    for page_number, page in enumerate(pages[1:], start=1):
+        earlier.add_page(page_number, page)
+
+    seeded = CommitAccumulator()
+    seeded.seed(earlier.days())
+    seeded.add_page(1, pages[0])
+
+    actual = seeded.time_data()
+    expected = full.time_data()
+    assert actual.commit_count == expected.commit_count
+    assert actual.commit_count_primary_author == expected.commit_count_primary_author
+    assert actual.commit_interval.mean == pytest.approx(expected.commit_interval.mean)
+    assert actual.commit_interval.standard_deviation == pytest.approx(expected.commit_interval.standard_deviation)
+
+
+def _github_date(epoch: int) -> str:
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def test_overlapping_author_dates() -> None:
+    # A rebase keeps the author dates, so commits land after the ones they were written before
+    pages = _pages(200, 100)
+    commits = [
+        [
+            Commit(sha=f"{page_number}-{index}", author=Author(name=name, date=_github_date(date - 3 * SECONDS_IN_DAY * (index % 2))), committed_at=_github_date(date))
+            for index, (name, date) in enumerate(page)
+        ]
+        for page_number, page in enumerate(pages, start=1)
+    ]
+    assert min(commit.author.date for commit in commits[0]) < max(commit.author.date for commit in commits[1])
+
+    accumulator = CommitAccumulator()
+    accumulator.add_commits(2, commits[1])
+    accumulator.add_commits(1, commits[0])
+    actual = accumulator.time_data()
+
+    dates = [date for page in pages for _, date in page]
+    expected = get_statistics([newer - older for newer, older in zip(dates, dates[1:])])
+    assert actual.commit_count == 200
+    assert actual.commit_interval.mean == pytest.approx(expected.mean)
+    assert actual.commit_interval.standard_deviation == pytest.approx(expected.standard_deviation)
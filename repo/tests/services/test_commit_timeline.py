@@ -0,0 +1,91 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import logging
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import List
+
+import pytest
+
+from repo.data.general import SECONDS_IN_DAY
+from repo.services.commit_timeline import CommitTimeline, github_date_to_epoch
+from repo.services.util import get_statistics
+
+logger = logging.getLogger(__name__)
+
+
+def _github_dates(commit_count: int) -> List[str]:
+    generator = random.Random(1234)
+    date = 1_700_000_000
+    dates = []
+    for _ in range(commit_count):
+        dates.append(datetime.fromtimestamp(date, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        date -= generator.randint(60, SECONDS_IN_DAY)
+    return dates
+
+
+@pytest.mark.parametrize(
+    "date_str, expected",
+    [
+        ("1970-01-01T00:00:00Z", 0),
+        ("2022-01-20T00:00:00Z", 1642636800),
+        ("2022-01-20T01:00:00+01:00", 1642636800),
+    ],
+)
+def test_github_date_to_epoch(date_str: str, expected: int) -> None:
+    assert github_date_to_epoch(date_str) == expected
+
+
+def test_statistics_match_list_implementation() -> None:
+    dates = [github_date_to_epoch(date) for date in _github_dates(1000)]
+    authors = [f"author-{index % 7}" for index in range(len(dates))]
+    shuffled = list(zip(authors, dates))
+    random.Random(5678).shuffle(shuffled)
+
+    timeline = CommitTimeline(shuffled)
+    actual = timeline.interval_statistics()
+
+    ordered = sorted(dates, reverse=True)
+    deltas = [newer - older for newer, older in zip(ordered, ordered[1:])]
+    expected = get_statistics(deltas)
+    assert actual.mean == pytest.approx(expected.mean)
+    assert actual.standard_deviation == pytest.approx(expected.standard_deviation)
+    assert timeline.interval_percentiles([50, 90]) == pytest.approx(statistics.quantiles(deltas, n=10, method="inclusive")[4:9:4])
+    assert timeline.commits_by_author()["author-0"] == 143
+    assert timeline.time_data().author_count == 7
+
+
+def test_since() -> None:
+    timeline = CommitTimeline([("alpha", 300), ("beta", 200), ("alpha", 100)])
+    recent = timeline.since(200)
+
+    assert len(recent) == 2
+    assert recent.newest() == 300
+    assert recent.commits_by_author() == {"alpha": 1, "beta": 1}
+
+
+@pytest.mark.parametrize("commits", [[], [("alpha", 100)]])
+def test_too_few_commits(commits) -> None:
+    timeline = CommitTimeline(commits)
+
+    assert timeline.interval_statistics().majority == 0
+    assert timeline.interval_percentiles([50]) == [0.0]
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("commit_count", [10_000, 100_000])
+def test_benchmark_against_list_implementation(commit_count: int) -> None:
+    dates = _github_dates(commit_count)
+
+    started = time.perf_counter()
+    parsed = sorted((datetime.strptime(date, "%Y-%m-%dT%H:%M:%S%z").timestamp() for date in dates), reverse=True)
+    get_statistics([newer - older for newer, older in zip(parsed, parsed[1:])])
+    list_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    CommitTimeline(("author", github_date_to_epoch(date)) for date in dates).interval_statistics()
+    timeline_seconds = time.perf_counter() - started
+
+    logger.warning("%s commits: list %.3fs, timeline %.3fs (%.1fx)", commit_count, list_seconds, timeline_seconds, list_seconds / timeline_seconds)
+    assert timeline_seconds < list_seconds
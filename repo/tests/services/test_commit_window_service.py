@@ -0,0 +1,32 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from repo.data.general import SECONDS_IN_DAY
+from repo.data.github import Author, Commit
+from repo.services.commit_accumulator import CommitAccumulator
+from repo.services.commit_window_service import commits_after_watermark, dump_days, load_days, trim_days
+
+
+def _commit(sha: str) -> Commit:
+    return Commit(sha=sha, author=Author(name="test-name", date="2022-01-20T00:00:00Z"), committed_at="2022-01-20T00:00:00Z")
+
+
+def test_days_round_trip() -> None:
+    accumulator = CommitAccumulator()
+    accumulator.add_page(1, [("alpha", 3 * SECONDS_IN_DAY + 100), ("beta", 3 * SECONDS_IN_DAY + 50), ("alpha", SECONDS_IN_DAY)])
+    days = accumulator.days()
+
+    assert load_days(dump_days(days)) == days
+
+
+def test_trim_days() -> None:
+    accumulator = CommitAccumulator()
+    accumulator.add_page(1, [("alpha", 3 * SECONDS_IN_DAY + 100), ("alpha", 2 * SECONDS_IN_DAY + 100), ("alpha", SECONDS_IN_DAY)])
+
+    assert list(trim_days(accumulator.days(), 2 * SECONDS_IN_DAY + 500)) == [3, 2]
+
+
+def test_commits_after_watermark() -> None:
+    commits = [_commit("c"), _commit("b"), _commit("a")]
+
+    assert commits_after_watermark(commits, "b") == [_commit("c")]
+    assert commits_after_watermark(commits, "c") == []
+    assert commits_after_watermark(commits, "rewritten") is None
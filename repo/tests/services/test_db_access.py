@@ -0,0 +1,22 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from typing import Any, List
+
+import pytest
+
+from repo.models import TagObject
+from repo.services import db_access
+from repo.services.db_access import database_sync_to_async
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_connection_checked_around_each_call(monkeypatch: Any) -> None:
+    checks: List[str] = []
+    monkeypatch.setattr(db_access, "close_old_connections", lambda: checks.append("checked"))
+
+    @database_sync_to_async
+    def count_tags(prefix: str) -> int:
+        checks.append("query")
+        return TagObject.objects.filter(sha__startswith=prefix).count()
+
+    assert await count_tags("abc") == 0
+    assert checks == ["checked", "query", "checked"]
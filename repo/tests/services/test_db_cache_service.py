@@ -1,18 +1,24 @@
 # pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
 
+import copy
+from datetime import date
+
 import pytest
 from freezegun import freeze_time
 
 from repo.data.general import Statistics
 from repo.data.git_data import (
+    SCHEMA_VERSION,
     GitData,
     PullRequestData,
     CommitData,
+    CommitTotalData,
     ContributorData,
     PopularityData,
 )
-from repo.services.db_cache_service import patch_cache, check_cache
-from repo.services.errors import CacheMiss
+from repo.models import CacheData
+from repo.services.db_cache_service import patch_cache, patch_cache_many, check_cache, check_graded_cache_many
+from repo.services.errors import CacheMiss, StaleCache
 from repo.services.input_service import RepoRequest
 
 
@@ -32,14 +38,10 @@ def fake_git_data():
             count_open=-1,
             count=-1,
         ),
-        # commit_all=CommitData(
-        #     count=-1,
-        #     count_primary_author=-1,
-        #     interval=Statistics(
-        #         mean=-1,
-        #         standard_deviation=-1,
-        #     ),
-        # ),
+        commit_all=CommitTotalData(
+            count=-1,
+            count_primary_author=-1,
+        ),
         commit_recent=CommitData(
             count=-1,
             count_primary_author=-1,
@@ -51,7 +53,7 @@ def fake_git_data():
         contributor=ContributorData(
             days_since_create=-1,
             days_since_commit=-1,
-            # author_count_all=-1,
+            author_count_all=-1,
             author_count_recent=-1,
         ),
         popularity=PopularityData(watcher_count=-1, open_issue_count=-1),
@@ -65,7 +67,7 @@ def test_cache(fake_url_metadata, fake_git_data):
 
     patch_cache("0.0.0", fake_url_metadata, fake_git_data)
     found = check_cache("0.0.0", fake_url_metadata)
-    assert found
+    assert found == fake_git_data
 
 
 @pytest.mark.django_db
@@ -84,12 +86,94 @@ def test_cache_expired_update(fake_url_metadata, fake_git_data):
 
 
 @pytest.mark.django_db
-def test_cache_old_version_update(fake_url_metadata, fake_git_data):
+def test_cache_survives_new_versions(fake_url_metadata, fake_git_data):
     patch_cache("0.0.0", fake_url_metadata, fake_git_data)
 
-    with pytest.raises(CacheMiss):
-        check_cache("0.0.1", fake_url_metadata)
-
-    patch_cache("0.0.1", fake_url_metadata, fake_git_data)
     found = check_cache("0.0.1", fake_url_metadata)
+    assert found == fake_git_data
+
+
+@pytest.mark.django_db
+def test_cache_old_schema_update(fake_url_metadata, fake_git_data):
+    patch_cache("0.0.0", fake_url_metadata, fake_git_data)
+    CacheData.objects.update(schema_version=SCHEMA_VERSION - 1)
+
+    with pytest.raises(CacheMiss) as cache_miss:
+        check_cache("0.0.0", fake_url_metadata)
+    assert not isinstance(cache_miss.value, StaleCache)
+
+    patch_cache("0.0.0", fake_url_metadata, fake_git_data)
+    found = check_cache("0.0.0", fake_url_metadata)
     assert found
+
+
+@pytest.mark.django_db
+def test_stale_data_served_until_max_staleness(fake_url_metadata, fake_git_data, settings):
+    settings.GITGRADE_STALE_MAX_DAYS = 90
+    with freeze_time("2022-01-01"):
+        patch_cache("0.0.0", fake_url_metadata, fake_git_data)
+
+    with freeze_time("2022-03-01"):
+        with pytest.raises(StaleCache) as stale_cache:
+            check_cache("0.0.0", fake_url_metadata)
+        assert stale_cache.value.graded.data == fake_git_data
+        assert stale_cache.value.row_updated_date == date(2022, 1, 1)
+
+    with freeze_time("2022-04-02"):
+        with pytest.raises(CacheMiss) as cache_miss:
+            check_cache("0.0.0", fake_url_metadata)
+        assert not isinstance(cache_miss.value, StaleCache)
+
+    settings.GITGRADE_STALE_MAX_DAYS = 0
+    with freeze_time("2022-03-01"):
+        with pytest.raises(CacheMiss) as cache_miss:
+            check_cache("0.0.0", fake_url_metadata)
+        assert not isinstance(cache_miss.value, StaleCache)
+
+
+@pytest.mark.django_db
+def test_cache_written_in_one_statement(fake_url_metadata, fake_git_data, django_assert_num_queries):
+    with freeze_time("2022-01-01"):
+        with django_assert_num_queries(1):
+            patch_cache("0.0.0", fake_url_metadata, fake_git_data)
+
+    fake_git_data.popularity.watcher_count = 10
+    with freeze_time("2022-01-20"):
+        with django_assert_num_queries(1):
+            patch_cache("0.0.1", fake_url_metadata, fake_git_data)
+
+    row = CacheData.objects.get()
+    assert (row.version, row.popularity_watcher_count) == ("0.0.1", 10)
+    assert (row.row_created_date, row.row_updated_date) == (date(2022, 1, 1), date(2022, 1, 20))
+
+
+@pytest.mark.django_db
+def test_cache_many(fake_git_data, django_assert_max_num_queries):
+    repos = [RepoRequest(source="test-source", owner="test-owner", repo=f"test-repo-{number}") for number in range(300)]
+    patch_cache_many([("0.0.0", url_metadata, fake_git_data) for url_metadata in repos[:100]])
+
+    updated = copy.deepcopy(fake_git_data)
+    updated.popularity.watcher_count = 10
+    with django_assert_max_num_queries(10):
+        patch_cache_many([("0.0.1", url_metadata, updated) for url_metadata in repos] + [("0.0.2", repos[0], updated)])
+
+    assert CacheData.objects.count() == 300
+    assert check_cache("0.0.1", repos[150]) == updated
+    assert CacheData.objects.get_by_natural_key(source="test-source", owner="test-owner", repo="test-repo-0").version == "0.0.2"
+
+
+@pytest.mark.django_db
+def test_check_many_reads_rows_together(fake_git_data, settings, django_assert_max_num_queries):
+    settings.GITGRADE_STALE_MAX_DAYS = 90
+    repos = [RepoRequest(source="test-source", owner="test-owner", repo=f"test-repo-{number}") for number in range(250)]
+    with freeze_time("2022-01-01"):
+        patch_cache_many([("0.0.0", url_metadata, fake_git_data) for url_metadata in repos[:10]])
+    with freeze_time("2022-03-01"):
+        patch_cache_many([("0.0.0", url_metadata, fake_git_data) for url_metadata in repos[10:200]])
+
+        with django_assert_max_num_queries(3):
+            results = check_graded_cache_many("0.0.0", repos)
+
+    assert all(isinstance(result, StaleCache) for result in results[:10])
+    assert all(result.data == fake_git_data for result in results[10:200])
+    assert all(isinstance(result, CacheMiss) and not isinstance(result, StaleCache) for result in results[200:])
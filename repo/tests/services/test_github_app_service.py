@@ -0,0 +1,145 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional
+
+import aiohttp
+import jwt
+import pytest
+from aiohttp import web
+from aiohttp.abc import Request, StreamResponse
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from repo.services import github_app_service
+from repo.services.github_app_service import GithubAppAuth, make_jwt
+from repo.services.github_client import GithubClient
+from repo.services.token_pool_service import TokenPool
+
+pytestmark = pytest.mark.usefixtures("empty_budgets")
+
+
+@pytest.fixture(scope="module")
+def private_key() -> rsa.RSAPrivateKey:
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+@pytest.fixture(scope="module")
+def private_key_pem(private_key: rsa.RSAPrivateKey) -> str:
+    return private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()).decode("utf8")
+
+
+@pytest.fixture
+def token_lifetime() -> List[float]:
+    """
+    Seconds until each token the stand-in issues expires, tests can shorten it
+    """
+    return [3600.0]
+
+
+@pytest.fixture
+def stand_in(github_stub: Callable[..., Any], private_key: rsa.RSAPrivateKey, token_lifetime: List[float]) -> Any:
+    """
+    Issues fake installation tokens for valid JWTs, and records which token each API call used
+    """
+    issued: List[str] = []
+    authorizations: List[Optional[str]] = []
+
+    async def post_access_tokens(request: Request) -> StreamResponse:
+        encoded = request.headers["Authorization"].removeprefix("Bearer ")
+        claims = jwt.decode(encoded, private_key.public_key(), algorithms=["RS256"])
+        assert claims["iss"] == "1234"
+        assert request.match_info["installation_id"] == "42"
+
+        token = f"ghs_fake{len(issued) + 1}"
+        issued.append(token)
+        expires_at = datetime.fromtimestamp(time.time() + token_lifetime[0], tz=timezone.utc)
+        return web.json_response({"token": token, "expires_at": expires_at.strftime("%Y-%m-%dT%H:%M:%SZ")}, status=201)
+
+    async def get_repo(request: Request) -> StreamResponse:
+        authorizations.append(request.headers.get("Authorization"))
+        return web.json_response({"id": 1})
+
+    server = github_stub(web.post("/app/installations/{installation_id}/access_tokens", post_access_tokens), web.get("/repos/test/test", get_repo))
+    server.issued = issued
+    server.authorizations = authorizations
+    return server
+
+
+def _app(private_key_pem: str, refresh_margin: float = 300) -> GithubAppAuth:
+    return GithubAppAuth(app_id="1234", private_key=private_key_pem, installation_id="42", refresh_margin=refresh_margin)
+
+
+def test_jwt_claims(private_key: rsa.RSAPrivateKey, private_key_pem: str) -> None:
+    claims = jwt.decode(make_jwt("1234", private_key_pem, now=time.time()), private_key.public_key(), algorithms=["RS256"])
+
+    assert claims["iss"] == "1234"
+    assert claims["exp"] - claims["iat"] <= 600
+
+
+@pytest.mark.asyncio
+async def test_token_cached_until_near_expiry(stand_in: Any, private_key_pem: str, token_lifetime: List[float]) -> None:
+    app = _app(private_key_pem)
+    async with aiohttp.ClientSession(base_url=str(stand_in.make_url("/")), raise_for_status=True) as session:
+        assert await app.token(session) == "ghs_fake1"
+        assert await app.token(session) == "ghs_fake1"
+
+        # Inside the refresh margin the token is replaced
+        token_lifetime[0] = 200
+        app = _app(private_key_pem)
+        assert await app.token(session) == "ghs_fake2"
+        assert await app.token(session) == "ghs_fake3"
+
+    assert stand_in.issued == ["ghs_fake1", "ghs_fake2", "ghs_fake3"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_exchange(stand_in: Any, private_key_pem: str) -> None:
+    app = _app(private_key_pem)
+    async with aiohttp.ClientSession(base_url=str(stand_in.make_url("/")), raise_for_status=True) as session:
+        tokens = await asyncio.gather(*[app.token(session) for _ in range(5)])
+
+    assert tokens == ["ghs_fake1"] * 5
+    assert stand_in.issued == ["ghs_fake1"]
+
+
+@pytest.mark.asyncio
+async def test_background_refresh(stand_in: Any, private_key_pem: str, token_lifetime: List[float]) -> None:
+    token_lifetime[0] = 3
+    app = _app(private_key_pem, refresh_margin=0.5)
+    async with aiohttp.ClientSession(base_url=str(stand_in.make_url("/")), raise_for_status=True) as session:
+        refresh = asyncio.create_task(app.refresh_forever(session))
+        await asyncio.sleep(2.5)
+        refresh.cancel()
+
+    assert len(stand_in.issued) >= 2
+    assert app.cached() == stand_in.issued[-1]
+
+
+@pytest.mark.asyncio
+async def test_failed_exchange_falls_back(loop: Any, aiohttp_server: Any, private_key_pem: str) -> None:
+    server = await aiohttp_server(web.Application())
+    app = _app(private_key_pem)
+    async with aiohttp.ClientSession(base_url=str(server.make_url("/")), raise_for_status=True) as session:
+        assert await app.token(session) is None
+
+    assert app.cached() is None
+    assert TokenPool([], app=app).choose(None, "core") is None
+
+
+@pytest.mark.asyncio
+async def test_client_uses_installation_token(stand_in: Any, private_key_pem: str, settings: Any) -> None:
+    settings.GITHUB_APP_ID = "1234"
+    settings.GITHUB_APP_PRIVATE_KEY = private_key_pem
+    settings.GITHUB_APP_INSTALLATION_ID = "42"
+    github_app_service._APP_AUTH = None  # pylint: disable=protected-access
+
+    async with aiohttp.ClientSession(base_url=str(stand_in.make_url("/")), raise_for_status=True) as session:
+        client = GithubClient(session)
+        assert client.authenticated
+        async with client.get("/repos/test/test") as response:
+            assert await response.json() == {"id": 1}
+
+    assert stand_in.authorizations == ["Bearer ghs_fake1"]
+    github_app_service._APP_AUTH = None  # pylint: disable=protected-access
@@ -0,0 +1,115 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+from typing import Any, List
+
+import pytest
+from django.utils import timezone
+
+from repo.models import OutboundWorker
+from repo.services import governor_service
+from repo.services.governor_service import OutboundGovernor
+
+
+@pytest.mark.asyncio
+async def test_caps_requests_in_flight() -> None:
+    governor = OutboundGovernor(max_in_flight=2)
+    in_flight = 0
+    peak = 0
+
+    async def _request() -> None:
+        nonlocal in_flight, peak
+        async with governor.slot("job"):
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    await asyncio.gather(*[_request() for _ in range(6)])
+
+    assert peak == 2
+    stats = governor.stats()
+    assert stats.in_flight == 0
+    assert stats.queue_depth == 0
+    assert stats.waits == 4
+
+
+@pytest.mark.asyncio
+async def test_slots_shared_fairly_between_jobs() -> None:
+    governor = OutboundGovernor(max_in_flight=1)
+    order: List[str] = []
+
+    async def _request(job: str) -> None:
+        async with governor.slot(job):
+            order.append(job)
+            await asyncio.sleep(0)
+
+    await governor.acquire("blocker")
+    big = [asyncio.create_task(_request("big")) for _ in range(4)]
+    await asyncio.sleep(0)
+    small = [asyncio.create_task(_request("small")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert governor.stats().queue_depth == 6
+    assert governor.stats().active_jobs == 2
+
+    governor.release()
+    await asyncio.gather(*big, *small)
+
+    assert order == ["big", "small", "big", "small", "big", "big"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_up_its_place() -> None:
+    governor = OutboundGovernor(max_in_flight=1)
+    await governor.acquire("blocker")
+
+    waiting = asyncio.create_task(governor.acquire("cancelled"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    governor.release()
+    assert governor.stats().in_flight == 0
+
+
+@pytest.mark.django_db
+def test_heartbeat_shares_cap_between_workers(settings) -> None:
+    settings.GITHUB_MAX_IN_FLIGHT = 40
+    OutboundWorker.objects.create(name="other:1", heartbeat=timezone.now(), max_in_flight=20, in_flight=0, queue_depth=0, mean_wait_ms=0, max_wait_ms=0)
+
+    governor = OutboundGovernor(max_in_flight=40)
+    governor.heartbeat("this:1")
+
+    assert governor.max_in_flight == 20
+    assert OutboundWorker.objects.get(name="this:1").max_in_flight == 40
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_connection_checked_around_each_heartbeat(monkeypatch: Any) -> None:
+    checks: List[str] = []
+    heartbeats = iter([ConnectionError("connection already closed"), None])
+
+    def heartbeat(worker_name: str) -> None:
+        checks.append("heartbeat")
+        error = next(heartbeats)
+        if error:
+            raise error
+
+    def sleep(seconds: float) -> None:
+        if checks.count("heartbeat") == 2:
+            raise _Stop()
+
+    governor = OutboundGovernor(max_in_flight=40)
+    monkeypatch.setattr(governor, "heartbeat", heartbeat)
+    monkeypatch.setattr(governor_service, "close_old_connections", lambda: checks.append("checked"))
+    monkeypatch.setattr(governor_service.time, "sleep", sleep)
+
+    with pytest.raises(_Stop):
+        governor_service._heartbeat_forever(governor, "this:1")  # pylint: disable=protected-access
+
+    # A failed heartbeat is followed by a fresh connection for the next one
+    assert checks == ["checked", "heartbeat", "checked"] * 2
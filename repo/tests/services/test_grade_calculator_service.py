@@ -7,6 +7,7 @@ from repo.data.git_data import (
     GitData,
     PullRequestData,
     CommitData,
+    CommitTotalData,
     ContributorData,
     PopularityData,
 )
@@ -25,14 +26,10 @@ def base_git_data():
             count=52 * 10,  # One per week for 10 years
             count_open=0,
         ),
-        # commit_all=CommitData(
-        #     count=52 * 3 * 10,  # Three per week for 10 years
-        #     count_primary_author=52 * 3 * 10,
-        #     interval=Statistics(
-        #         mean=SECONDS_IN_DAY * 5,
-        #         standard_deviation=SECONDS_IN_DAY,
-        #     ),
-        # ),
+        commit_all=CommitTotalData(
+            count=52 * 3 * 10,  # Three per week for 10 years
+            count_primary_author=52 * 3 * 10,
+        ),
         commit_recent=CommitData(
             count=6 * 4 * 3,  # 3 per week for 6 months
             count_primary_author=6 * 4 * 3,
@@ -44,7 +41,7 @@ def base_git_data():
         contributor=ContributorData(
             days_since_create=365 * 10,
             days_since_commit=0,
-            # author_count_all=100,
+            author_count_all=100,
             author_count_recent=100,
         ),
         popularity=PopularityData(watcher_count=100, open_issue_count=0),
@@ -61,7 +58,7 @@ def test_grade_a(base_git_data: GitData):
     base_git_data.contributor.author_count_all = 30
     base_git_data.contributor.author_count_recent = 10
 
-    # base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.30)
+    base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.30)
     base_git_data.commit_recent.count_primary_author = int(6 * 4 * 3 * 0.50)
 
     # base_git_data.commit_all.interval = Statistics(
@@ -82,7 +79,7 @@ def test_grade_b(base_git_data: GitData):
     base_git_data.contributor.author_count_all = 15
     base_git_data.contributor.author_count_recent = 7
 
-    # base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.15)
+    base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.15)
     base_git_data.commit_recent.count_primary_author = int(6 * 4 * 3 * 0.30)
 
     # base_git_data.commit_all.interval = Statistics(
@@ -103,7 +100,7 @@ def test_grade_c(base_git_data: GitData):
     base_git_data.contributor.author_count_all = 5
     base_git_data.contributor.author_count_recent = 4
 
-    # base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.08)
+    base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.08)
     base_git_data.commit_recent.count_primary_author = int(6 * 4 * 3 * 0.15)
 
     # base_git_data.commit_all.interval = Statistics(
@@ -124,7 +121,7 @@ def test_grade_d(base_git_data: GitData):
     base_git_data.contributor.author_count_all = 2
     base_git_data.contributor.author_count_recent = 2
 
-    # base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.04)
+    base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.04)
     base_git_data.commit_recent.count_primary_author = int(6 * 4 * 3 * 0.08)
 
     # base_git_data.commit_all.interval = Statistics(
@@ -145,7 +142,7 @@ def test_grade_f(base_git_data: GitData):
     base_git_data.contributor.author_count_all = 1
     base_git_data.contributor.author_count_recent = 0
 
-    # base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.02)
+    base_git_data.commit_all.count_primary_author = int(52 * 3 * 10 * 0.02)
     base_git_data.commit_recent.count_primary_author = int(6 * 4 * 3 * 0.04)
 
     # base_git_data.commit_all.interval = Statistics(
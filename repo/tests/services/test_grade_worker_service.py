@@ -0,0 +1,80 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from typing import Any, List, Optional
+
+import pytest
+
+from repo.data.general import RepoRequest
+from repo.models import CacheData, GradeJob
+from repo.services import grade_worker_service, input_service
+from repo.services.grade_worker_service import work
+from repo.services.job_queue_service import enqueue, report_progress
+from repo.services.single_flight_service import acquire_lease
+from repo.tests.services.test_input_service import _slow_github
+
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_grades_queued_repos(monkeypatch: Any) -> None:
+    fetched: List[str] = []
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github(fetched))
+    first = enqueue(RepoRequest(source="github", owner="test", repo="first"))
+    second = enqueue(RepoRequest(source="github", owner="test", repo="second"))
+
+    assert work("worker", stop_when_idle=True) == 2
+
+    assert fetched == ["first", "second"]
+    assert {job.status for job in GradeJob.objects.filter(pk__in=[first.pk, second.pk])} == {GradeJob.DONE}
+    assert CacheData.objects.count() == 2
+
+    # Already graded by the time a job for it runs, nothing is fetched
+    enqueue(RepoRequest(source="github", owner="test", repo="first"))
+    assert work("worker", stop_when_idle=True) == 1
+    assert fetched == ["first", "second"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_job_keeps_error(monkeypatch: Any) -> None:
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github([], status=404))
+    job = enqueue(RepoRequest(source="github", owner="test", repo="missing"))
+
+    work("worker", stop_when_idle=True)
+
+    job.refresh_from_db()
+    assert (job.status, job.error_message) == (GradeJob.FAILED, input_service.NOT_FOUND_MESSAGE)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_heartbeat_while_a_stage_runs(settings: Any, monkeypatch: Any) -> None:
+    settings.GITGRADE_JOB_HEARTBEAT_SECONDS = 0.05
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github([], seconds=0.3))
+    beats: List[Optional[str]] = []
+
+    def _report_progress(job_id: int, worker: str, stage: Optional[str] = None) -> bool:
+        beats.append(stage)
+        return report_progress(job_id, worker, stage)
+
+    monkeypatch.setattr(grade_worker_service, "report_progress", _report_progress)
+    job = enqueue(RepoRequest(source="github", owner="test", repo="slow"))
+
+    work("worker", stop_when_idle=True)
+
+    assert beats.count(None) >= 3
+    job.refresh_from_db()
+    assert job.status == GradeJob.DONE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_job_waits_on_the_fetch_lease(settings: Any, monkeypatch: Any) -> None:
+    settings.GITGRADE_FETCH_WAIT_SECONDS = 0.2
+    settings.GITGRADE_FETCH_POLL_SECONDS = 0.05
+    fetched: List[str] = []
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github(fetched))
+    url_metadata = RepoRequest(source="github", owner="test", repo="leased")
+    assert acquire_lease(url_metadata, 60)
+    job = enqueue(url_metadata)
+
+    work("worker", stop_when_idle=True)
+
+    # A request holding the lease is fetching it, the job doesn't fetch alongside
+    assert not fetched
+    job.refresh_from_db()
+    assert job.status == GradeJob.FAILED and "still being graded" in job.error_message
@@ -0,0 +1,107 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import dataclasses
+import json
+from typing import Any, Callable, Dict
+from unittest.mock import patch
+
+import pytest
+from aiohttp import web, ClientResponseError
+from aiohttp.abc import StreamResponse, Request
+from freezegun import freeze_time
+
+from repo.data.from_source import DataFromAPI, TotalsData
+from repo.data.general import RepoRequest
+from repo.data.github import Release
+from repo.services import graphql_api_service_async
+
+
+def _history(first_day: int, cursor: str, has_next_page: bool) -> Dict[str, Any]:
+    return {
+        "pageInfo": {"hasNextPage": has_next_page, "endCursor": cursor},
+        "nodes": [{"author": {"name": "test-name", "date": f"2022-01-{first_day - i:02d}T00:00:00Z"}} for i in range(5)],
+    }
+
+
+async def post_graphql(request: Request) -> StreamResponse:
+    body = await request.json()
+    variables = body["variables"]
+    rate_limit = {"cost": 1, "remaining": 4999}
+
+    if variables["name"] == "missing":
+        data: Dict[str, Any] = {"data": {"repository": None}, "errors": [{"type": "NOT_FOUND", "message": "Could not resolve to a Repository"}]}
+    elif variables["cursor"] is None:
+        data = {
+            "data": {
+                "rateLimit": rate_limit,
+                "repository": {
+                    "databaseId": 1,
+                    "name": "test",
+                    "createdAt": "2019-05-06T00:00:00Z",
+                    "updatedAt": "2022-01-20T00:00:00Z",
+                    "primaryLanguage": {"name": "python"},
+                    "stargazerCount": 1000,
+                    "forkCount": 10,
+                    "issues": {"totalCount": 0},
+                    "openPullRequests": {"totalCount": 10},
+                    "allPullRequests": {"totalCount": 100},
+                    "refs": {"totalCount": 10, "nodes": [{"name": "10.0.0", "target": {"tagger": {"date": "2022-01-20T00:00:00Z"}}}]},
+                    "defaultBranchRef": {"target": {"history": _history(20, "page-2", True), "allHistory": {"totalCount": 500}}},
+                },
+            }
+        }
+    else:
+        data = {"data": {"rateLimit": rate_limit, "repository": {"defaultBranchRef": {"target": {"history": _history(15, "page-3", False)}}}}}
+
+    return web.Response(body=json.dumps(data), headers={"content-type": "application/json"}, status=200)
+
+
+async def get_contributors(request: Request) -> StreamResponse:
+    if request.match_info["repo"] == "missing":
+        return web.Response(status=404)
+    # A single contributor, so no pagination links
+    return web.Response(body=json.dumps([{"login": "test-name", "contributions": 400}]), headers={"content-type": "application/json"}, status=200)
+
+
+@pytest.fixture
+def patched_aiohttp_client(loop: Any, aiohttp_client: Any, github_stub: Callable[..., Any]) -> Any:
+    server = github_stub(web.post("/graphql", post_graphql), web.get("/repos/test/{repo}/contributors", get_contributors))
+    return loop.run_until_complete(aiohttp_client(server))
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@freeze_time("2022-01-30")
+async def test_fetch_github_graphql(patched_aiohttp_client: Any, expected_api_data: DataFromAPI) -> None:
+    with patch("repo.services.graphql_api_service_async.aiohttp.ClientSession") as mock_client_session:
+        mock_client_session.return_value.__aenter__.return_value = patched_aiohttp_client
+
+        source = RepoRequest(source="github", owner="test", repo="test", sso_token="test-token")
+        actual = await graphql_api_service_async.fetch_github_graphql_data(source)
+
+    # Only the one contributor comes back from the stub
+    assert actual == dataclasses.replace(expected_api_data, time_all=TotalsData(commit_count=500, commit_count_primary_author=400, author_count=1))
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_fetch_github_graphql_not_found(patched_aiohttp_client: Any) -> None:
+    with patch("repo.services.graphql_api_service_async.aiohttp.ClientSession") as mock_client_session:
+        mock_client_session.return_value.__aenter__.return_value = patched_aiohttp_client
+
+        source = RepoRequest(source="github", owner="test", repo="missing", sso_token="test-token")
+        with pytest.raises(ClientResponseError) as error:
+            await graphql_api_service_async.fetch_github_graphql_data(source)
+
+    assert error.value.status == 404
+
+
+def test_release_dated_by_tagged_commit() -> None:
+    def repository(target: Dict[str, Any]) -> Dict[str, Any]:
+        return {"refs": {"totalCount": 3, "nodes": [{"name": "1.0.0", "target": target}]}}
+
+    extract = graphql_api_service_async._extract_newest_release  # pylint: disable=protected-access
+    annotated = {"tagger": {"date": None}, "target": {"committedDate": "2022-01-20T00:00:00Z"}}
+    assert extract(repository(annotated)) == (Release(tag="1.0.0", created_at="2022-01-20T00:00:00Z"), 3)
+    assert extract(repository({"committedDate": "2022-01-21T00:00:00Z"})) == (Release(tag="1.0.0", created_at="2022-01-21T00:00:00Z"), 3)
+    # e.g. a tag of a tree
+    assert extract(repository({})) == (None, 3)
@@ -0,0 +1,338 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp import ClientResponseError, ClientSession, web
+from aiohttp.abc import Request, StreamResponse
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import AsyncClient, AsyncRequestFactory, Client
+from django.urls import path
+
+from repo import views
+from repo.data.from_source import DataFromAPI, TimeData, TotalsData
+from repo.data.general import RepoRequest, Statistics
+from repo.models import CacheData
+from repo.services import governor_service, input_service, io_runtime
+from repo.services.io_runtime import GithubIORuntime, close_loop_session, shutdown_io_runtime
+from repo.tests.services.test_rest_api_service_async import (
+    get_commits,
+    get_contributors,
+    get_paginated_commits,
+    get_pull_request,
+    get_releases,
+    get_repo,
+    get_tags,
+    post_graphql,
+)
+
+logger = logging.getLogger(__name__)
+
+API_DATA = DataFromAPI(
+    days_since_update=1,
+    days_since_create=500,
+    watcher_count=42,
+    pull_request_count_open=2,
+    pull_request_count=20,
+    open_issue_count=3,
+    days_since_commit=1,
+    time_all=TotalsData(commit_count=200, commit_count_primary_author=100, author_count=4),
+    time_recent=TimeData(commit_count=20, commit_count_primary_author=10, commit_interval=Statistics(mean=3600.0, standard_deviation=60.0), author_count=2),
+    latest_release="",
+    releases_count=0,
+    days_since_last_release=None,
+)
+
+
+def _slow_github(fetched: List[str], seconds: float = 0.0, status: Optional[int] = None) -> Callable[..., Any]:
+    async def fetch_github_api_data(repo_request: RepoRequest, session: Optional[ClientSession] = None) -> DataFromAPI:
+        fetched.append(repo_request.repo)
+        await asyncio.sleep(seconds)
+        if status:
+            raise ClientResponseError(MagicMock(), (), status=status)
+        return API_DATA
+
+    return fetch_github_api_data
+
+
+@pytest.fixture
+def fetched(monkeypatch: Any) -> List[str]:
+    fetched: List[str] = []
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github(fetched, seconds=0.05))
+    return fetched
+
+
+@pytest.fixture
+async def loop_session_closed() -> Any:
+    yield
+    await close_loop_session()
+
+
+@pytest.fixture
+def runtime_shut_down() -> Any:
+    yield
+    shutdown_io_runtime()
+
+
+# Each view at its own path, the app's urls pick one of them by settings.GITGRADE_ASYNC_VIEWS
+urlpatterns = [
+    path("wsgi/<str:source>/<str:owner>/<str:repo>", views.repo_grade),
+    path("asgi/<str:source>/<str:owner>/<str:repo>", views.repo_grade_async),
+    path("asgi/grades", views.repo_grade_bulk_async),
+]
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_graded_and_cached(fetched: List[str], loop_session_closed: None) -> None:
+    result = await input_service.input_util_async(repo_url="https://github.com/test/test")
+    assert result["status"] == "success"
+    assert result["data"]["popularity"]["watcher_count"] == 42
+
+    again = await input_service.input_util_async(source="github", owner="test", repo="test")
+    assert again["grades"] == result["grades"]
+    assert fetched == ["test"]
+    assert await CacheData.objects.acount() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_concurrent_requests_share_one_fetch(fetched: List[str], loop_session_closed: None) -> None:
+    results = await asyncio.gather(*(input_service.input_util_async(source="github", owner="test", repo="test") for _ in range(5)))
+
+    assert fetched == ["test"]
+    assert all(result["status"] == "success" for result in results)
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_errors_match_sync_path(monkeypatch: Any, loop_session_closed: None) -> None:
+    fetched: List[str] = []
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github(fetched, status=404))
+
+    result = await input_service.input_util_async(source="github", owner="test", repo="missing")
+    assert result == {"status": "error", "error_message": input_service.NOT_FOUND_MESSAGE}
+    assert await input_service.input_util_async(repo_url="https://gitlab.com/test/test") == input_service.input_util(repo_url="https://gitlab.com/test/test")
+
+
+@pytest.mark.django_db(transaction=True)
+async def test_async_view(fetched: List[str], loop_session_closed: None) -> None:
+    request = AsyncRequestFactory().get("/result/github/test/test")
+    response = await views.repo_grade_async(request, source="github", owner="test", repo="test")
+
+    assert response.status_code == 200
+    assert b"test/test" in response.content
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_streams_cached_then_fetched(monkeypatch: Any, runtime_shut_down: None) -> None:
+    fetched: List[str] = []
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: _slow_github(fetched, seconds=0.05))
+    assert input_service.input_util(source="github", owner="test", repo="cached")["status"] == "success"
+    fetched.clear()
+
+    repo_urls = [
+        "https://github.com/test/first",
+        "not a url",
+        "https://github.com/test/cached",
+        "https://github.com/test/second",
+        "https://github.com/test/first",
+    ]
+    lines = list(input_service.input_util_many(repo_urls))
+
+    assert [(line["repo_url"], line["status"]) for line in lines[:2]] == [("not a url", "error"), ("https://github.com/test/cached", "success")]
+    assert sorted(line["repo_url"] for line in lines[2:]) == sorted(repo_urls[:1] + repo_urls[3:])
+    assert all(line["status"] == "success" and line["grades"]["final_grade"]["letter_grade"] for line in lines[1:])
+    assert sorted(fetched) == ["first", "second"]
+    assert CacheData.objects.count() == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_view(fetched: List[str], runtime_shut_down: None) -> None:
+    client = Client()
+    response = client.post("/api/grades", {"repo_urls": ["https://github.com/test/test", "https://gitlab.com/test/test"]}, content_type="application/json")
+
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+    assert [line["status"] for line in lines] == ["error", "success"]
+    assert lines[1]["grades"]["final_grade"]["letter_grade"] in "ABCDF"
+
+    assert client.post("/api/grades", {"repos": []}, content_type="application/json").status_code == 400
+    assert client.get("/api/grades").status_code == 405
+
+
+@pytest.mark.django_db(transaction=True)
+def test_bulk_view_ignores_token_cookie(monkeypatch: Any, settings: Any, runtime_shut_down: None) -> None:
+    tokens: List[Optional[str]] = []
+
+    async def fetch_github_api_data(repo_request: RepoRequest, session: Optional[ClientSession] = None) -> DataFromAPI:
+        tokens.append(repo_request.sso_token)
+        return API_DATA
+
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: fetch_github_api_data)
+    client = Client(enforce_csrf_checks=True)
+    client.cookies[settings.GITHUB_TOKEN_KEY] = "visitor-token"
+
+    # As another site's form would post it, with the visitor's cookies but no CSRF token
+    response = client.post("/api/grades", {"repo_urls": ["https://github.com/test/cross-site"]}, content_type="application/json")
+    assert b"".join(response.streaming_content)
+    response = client.post("/api/grades", {"repo_urls": ["https://github.com/test/api"]}, content_type="application/json", HTTP_AUTHORIZATION="Bearer api-token")
+    assert b"".join(response.streaming_content)
+
+    assert tokens == [None, "api-token"]
+
+
+@pytest.mark.urls(__name__)
+@pytest.mark.django_db(transaction=True)
+async def test_bulk_view_streams_under_asgi(monkeypatch: Any, loop_session_closed: None) -> None:
+    slow_released = asyncio.Event()
+
+    async def fetch_github_api_data(repo_request: RepoRequest, session: Optional[ClientSession] = None) -> DataFromAPI:
+        if repo_request.repo == "slow":
+            await slow_released.wait()
+        return API_DATA
+
+    monkeypatch.setattr(input_service, "_select_fetcher", lambda _: fetch_github_api_data)
+    assert (await input_service.input_util_async(source="github", owner="test", repo="cached"))["status"] == "success"
+
+    repo_urls = ["https://github.com/test/slow", "https://github.com/test/cached", "https://github.com/test/fast"]
+    response = await AsyncClient().post("/asgi/grades", {"repo_urls": repo_urls}, content_type="application/json")
+    assert response["Content-Type"] == "application/x-ndjson"
+
+    # The cached and fast repos arrive while the slow one is still being fetched
+    lines = aiter(response.streaming_content)
+    first = [json.loads(await anext(lines)) for _ in range(2)]
+    assert [(line["repo_url"], line["status"]) for line in first] == [("https://github.com/test/cached", "success"), ("https://github.com/test/fast", "success")]
+
+    slow_released.set()
+    rest = [json.loads(chunk) async for chunk in lines]
+    assert [(line["repo_url"], line["status"]) for line in rest] == [("https://github.com/test/slow", "success")]
+    assert await CacheData.objects.acount() == 3
+
+
+GITHUB_LATENCY_SECONDS = 0.5
+WSGI_THREADS = 8
+CONCURRENCY = 32
+REQUESTS_PER_VIEW = 64
+
+
+def _slowed(handler: Callable[[Request], Awaitable[StreamResponse]]) -> Callable[[Request], Awaitable[StreamResponse]]:
+    async def slow_handler(request: Request) -> StreamResponse:
+        await asyncio.sleep(GITHUB_LATENCY_SECONDS)
+        return await handler(request)
+
+    return slow_handler
+
+
+@pytest.fixture
+def slow_github(github_stub: Callable[..., Any], monkeypatch: Any, settings: Any) -> Any:
+    """
+    The REST stub from test_rest_api_service_async for any test/{repo}, answering after a delay, with
+    the I/O runtime and loop sessions pointed at it. The caps on requests to Github apply the same to
+    both views, they're lifted so the views are what's compared.
+    """
+    settings.GITHUB_MAX_IN_FLIGHT = settings.GITHUB_CONNECTION_LIMIT = 1000
+    settings.GITHUB_CONCURRENCY_INITIAL = settings.GITHUB_CONCURRENCY_MAX = 1000
+    monkeypatch.setattr(governor_service, "_GOVERNOR", None)
+    server = github_stub(
+        web.get("/repos/test/{repo}", _slowed(get_repo)),
+        web.get("/repos/test/{repo}/pulls", _slowed(get_pull_request)),
+        web.get("/repos/test/{repo}/commits", _slowed(get_commits)),
+        web.get("/repositories/1/commits", _slowed(get_paginated_commits)),
+        web.get("/repos/test/{repo}/contributors", _slowed(get_contributors)),
+        web.get("/repos/test/{repo}/git/matching-refs/tags", _slowed(get_tags)),
+        web.get("/repos/test/{repo}/releases", _slowed(get_releases)),
+        web.post("/graphql", _slowed(post_graphql)),
+    )
+    monkeypatch.setattr(io_runtime, "_RUNTIME", GithubIORuntime(base_url=str(server.make_url("/"))))
+    monkeypatch.setattr(io_runtime, "_RUNTIME_PID", os.getpid())
+    yield server
+    shutdown_io_runtime()
+
+
+def _migrate_file_database() -> None:
+    call_command("migrate", verbosity=0)
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=wal")
+
+
+def _begin_immediate(wrapper: SQLiteDatabaseWrapper) -> None:
+    wrapper.cursor().execute("BEGIN IMMEDIATE")
+
+
+@pytest.fixture
+async def file_database(tmp_path: Path, monkeypatch: Any) -> Any:
+    """
+    Points new connections at a migrated SQLite file under tmp_path for the test, the in-memory test
+    database refuses a second writer outright ("database table is locked"). Transactions take the write
+    lock as they begin, as transaction_mode="IMMEDIATE" does from Django 5.1, so one that reads and then
+    writes waits its turn rather than failing. The test's own connection stays open on the in-memory
+    database, which would be lost if it closed.
+    """
+    settings_dict = connection.settings_dict
+    monkeypatch.setitem(settings_dict, "NAME", str(tmp_path / "load_test.sqlite3"))
+    monkeypatch.setitem(settings_dict["OPTIONS"], "timeout", 30)
+    monkeypatch.setattr(SQLiteDatabaseWrapper, "_start_transaction_under_autocommit", _begin_immediate)
+    # Connections earlier tests left on asgiref's thread are closed now that they aren't in memory
+    await sync_to_async(connections.close_all)()
+    await sync_to_async(_migrate_file_database)()
+    yield
+    await sync_to_async(connections.close_all)()
+
+
+def _percentiles(latencies: List[float]) -> Tuple[float, float]:
+    cut_points = statistics.quantiles(latencies, n=100)
+    return cut_points[49], cut_points[98]
+
+
+def _grade_page(response: Any) -> None:
+    assert response.status_code == 200 and b"Pull Requests Total" in response.content
+
+
+async def _latencies(paths: List[str], get: Callable[[str], Awaitable[Any]]) -> List[float]:
+    """
+    Sends the requests CONCURRENCY at a time, timing each from when it's sent until its page is back
+    """
+    in_flight = asyncio.Semaphore(CONCURRENCY)
+
+    async def latency(path: str) -> float:
+        async with in_flight:
+            started = time.perf_counter()
+            _grade_page(await get(path))
+            return time.perf_counter() - started
+
+    return list(await asyncio.gather(*(latency(path) for path in paths)))
+
+
+@pytest.mark.benchmark
+@pytest.mark.urls(__name__)
+@pytest.mark.django_db(transaction=True)
+async def test_benchmark_views_under_load(slow_github: Any, file_database: None, loop_session_closed: None) -> None:
+    """
+    Cold grades of distinct repos with CONCURRENCY requests in flight, through repo_grade on
+    WSGI_THREADS threads, as under uwsgi, then through repo_grade_async on the event loop, as
+    under ASGI. Every call to Github takes GITHUB_LATENCY_SECONDS, the stub answers from the
+    test's event loop so it shares that loop with repo_grade_async.
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=WSGI_THREADS)
+    try:
+        wsgi = await _latencies([f"/wsgi/github/test/wsgi-{number}" for number in range(REQUESTS_PER_VIEW)], lambda path: loop.run_in_executor(executor, Client().get, path))
+    finally:
+        # Waiting here would block the loop the stub answers the threads' requests from
+        executor.shutdown(wait=False, cancel_futures=True)
+    asgi = await _latencies([f"/asgi/github/test/asgi-{number}" for number in range(REQUESTS_PER_VIEW)], AsyncClient().get)
+
+    assert await CacheData.objects.acount() == 2 * REQUESTS_PER_VIEW
+    (wsgi_p50, wsgi_p99), (asgi_p50, asgi_p99) = _percentiles(wsgi), _percentiles(asgi)
+    logger.warning("%s cold grades, %s in flight, repo_grade on %s threads: p50 %.3fs, p99 %.3fs", REQUESTS_PER_VIEW, CONCURRENCY, WSGI_THREADS, wsgi_p50, wsgi_p99)
+    logger.warning("%s cold grades, %s in flight, repo_grade_async: p50 %.3fs, p99 %.3fs", REQUESTS_PER_VIEW, CONCURRENCY, asgi_p50, asgi_p99)
+    assert asgi_p99 < wsgi_p99
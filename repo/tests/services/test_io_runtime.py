@@ -0,0 +1,61 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Generator, Optional
+
+import pytest
+from aiohttp import ClientSession
+
+from repo.services.io_runtime import GithubIORuntime
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def keep_alive_server() -> Generator[str, None, None]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+async def _fetch(path: str, session: Optional[ClientSession] = None) -> Any:
+    assert session
+    async with session.get(path) as response:
+        return await response.json()
+
+
+def test_runtime_reuses_connections(keep_alive_server: str) -> None:
+    runtime = GithubIORuntime(base_url=keep_alive_server)
+    try:
+        for _ in range(3):
+            assert runtime.run(_fetch, "/repos/test/test") == {"ok": True}
+    finally:
+        runtime.shutdown()
+
+    assert runtime.stats.created == 1
+    assert runtime.stats.reused == 2
+    assert not runtime.running
+
+
+def test_runtime_restarts_after_shutdown(keep_alive_server: str) -> None:
+    runtime = GithubIORuntime(base_url=keep_alive_server)
+    runtime.run(_fetch, "/")
+    runtime.shutdown()
+
+    assert runtime.run(_fetch, "/") == {"ok": True}
+    runtime.shutdown()
@@ -0,0 +1,134 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from datetime import timedelta
+from typing import Any
+
+import pytest
+from django.test import Client
+from django.utils import timezone
+
+from repo.data.general import RepoRequest
+from repo.models import GradeJob
+from repo.services import input_service
+from repo.services.job_queue_service import claim, enqueue, finish, purge_finished, report_progress, requeue_abandoned
+
+REPO = RepoRequest(source="github", owner="test", repo="queued")
+
+
+@pytest.mark.django_db
+def test_enqueue_reuses_active_job() -> None:
+    job = enqueue(REPO)
+    assert enqueue(REPO).pk == job.pk
+
+    claim("worker")
+    finish(job.pk, "worker")
+    assert enqueue(REPO).pk != job.pk
+    assert GradeJob.objects.count() == 2
+
+
+@pytest.mark.django_db
+def test_claim_takes_oldest_once() -> None:
+    first = enqueue(REPO)
+    second = enqueue(RepoRequest(source="github", owner="test", repo="other"))
+
+    claimed = claim("worker-a")
+    assert claimed is not None and claimed.pk == first.pk
+    assert (claimed.status, claimed.worker, claimed.attempts) == (GradeJob.RUNNING, "worker-a", 1)
+
+    claimed = claim("worker-b")
+    assert claimed is not None and claimed.pk == second.pk
+    assert claim("worker-c") is None
+
+
+@pytest.mark.django_db
+def test_progress_and_finish() -> None:
+    job = enqueue(REPO)
+    claim("worker")
+    assert report_progress(job.pk, "worker", "Fetched commits (2 of 6)")
+    job.refresh_from_db()
+    assert job.stage == "Fetched commits (2 of 6)"
+
+    assert finish(job.pk, "worker", "The repo you requested does not exist.")
+    job.refresh_from_db()
+    assert (job.status, job.error_message) == (GradeJob.FAILED, "The repo you requested does not exist.")
+
+
+@pytest.mark.django_db
+def test_worker_that_lost_the_job_cant_write() -> None:
+    job = enqueue(REPO)
+    claim("slow-worker")
+    GradeJob.objects.filter(pk=job.pk).update(heartbeat=timezone.now() - timedelta(seconds=600))
+    requeue_abandoned()
+    claim("next-worker")
+
+    assert not report_progress(job.pk, "slow-worker", "Fetched commits (2 of 6)")
+    assert not finish(job.pk, "slow-worker", "The repo you requested does not exist.")
+    job.refresh_from_db()
+    assert (job.status, job.worker, job.stage) == (GradeJob.RUNNING, "next-worker", "Starting")
+
+    assert finish(job.pk, "next-worker")
+    assert not finish(job.pk, "next-worker", "The repo you requested does not exist.")
+    job.refresh_from_db()
+    assert (job.status, job.error_message) == (GradeJob.DONE, "")
+
+
+@pytest.mark.django_db
+def test_requeue_abandoned() -> None:
+    job = enqueue(REPO)
+    claim("worker")
+    quiet = timezone.now() - timedelta(seconds=600)
+    GradeJob.objects.filter(pk=job.pk).update(heartbeat=quiet)
+
+    assert requeue_abandoned() == 1
+    job.refresh_from_db()
+    assert (job.status, job.worker) == (GradeJob.QUEUED, "")
+
+    # Out of attempts, the job fails instead
+    GradeJob.objects.filter(pk=job.pk).update(status=GradeJob.RUNNING, heartbeat=quiet, attempts=3)
+    assert requeue_abandoned() == 0
+    job.refresh_from_db()
+    assert job.status == GradeJob.FAILED
+
+
+@pytest.mark.django_db
+def test_purge_finished() -> None:
+    job = enqueue(REPO)
+    claim("worker")
+    finish(job.pk, "worker")
+    assert purge_finished() == 0
+
+    GradeJob.objects.filter(pk=job.pk).update(finished=timezone.now() - timedelta(days=2))
+    assert purge_finished() == 1
+
+
+@pytest.mark.django_db
+def test_miss_is_queued(settings: Any) -> None:
+    settings.GITGRADE_GRADE_JOBS = True
+
+    result = input_service.input_util(source="github", owner="test", repo="queued")
+    assert result["status"] == "queued"
+    assert GradeJob.objects.get(pk=result["job_id"]).status == GradeJob.QUEUED
+    assert input_service.input_util(repo_url="https://github.com/test/queued")["job_id"] == result["job_id"]
+
+    response = Client().get("/result/github/test/queued")
+    assert response.status_code == 302 and response["Location"] == f"/job/{result['job_id']}"
+
+
+@pytest.mark.django_db
+def test_job_page() -> None:
+    client = Client()
+    job = enqueue(REPO)
+    assert b"Waiting for a worker" in client.get(f"/job/{job.pk}").content
+
+    claim("worker")
+    report_progress(job.pk, "worker", "Fetched commits (2 of 6)")
+    assert b"Fetched commits (2 of 6)" in client.get(f"/job/{job.pk}").content
+
+    finish(job.pk, "worker")
+    response = client.get(f"/job/{job.pk}")
+    assert response.status_code == 302 and response["Location"] == "/result/github/test/queued"
+
+    failed = enqueue(REPO)
+    claim("worker")
+    finish(failed.pk, "worker", "The repo you requested does not exist.")
+    assert b"The repo you requested does not exist." in client.get(f"/job/{failed.pk}").content
+    assert client.get("/job/0").status_code == 404
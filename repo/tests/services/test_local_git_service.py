@@ -2,7 +2,7 @@
 
 import json
 from datetime import datetime
-from typing import Generator, List
+from typing import Generator
 from unittest.mock import patch, Mock
 
 import pytest
@@ -34,21 +34,18 @@ def mock_commit() -> Generator[Mock, None, None]:
 
 
 @pytest.fixture
-def mock_commit_list() -> Generator[List[Mock], None, None]:
-    commits = []
+def mock_git_log() -> str:
+    lines = []
     rolling_seconds = int((datetime(2022, 1, 20) - datetime(1970, 1, 1)).total_seconds())
     for _ in range(10):
-        new_seconds = rolling_seconds - (60 * 60 * 24)  # a day
-        commit = Mock()
-        commit.committed_date = new_seconds
-        commits.append(commit)
-        rolling_seconds = new_seconds
+        rolling_seconds -= 60 * 60 * 24  # a day
+        lines.append(f"{rolling_seconds}\tAuthor Alpha")
 
-    return commits
+    return "\n".join(lines)
 
 
 @pytest.fixture
-def mock_gitpython(mock_commit, mock_commit_list) -> Generator[Mock, None, None]:
+def mock_gitpython(mock_commit, mock_git_log) -> Generator[Mock, None, None]:
     with patch("repo.services.local_git_service.Repo") as mock:
         repo = Mock()
         mock.return_value = repo
@@ -63,7 +60,7 @@ def mock_gitpython(mock_commit, mock_commit_list) -> Generator[Mock, None, None]
 
         repo.head.commit = mock_commit
 
-        repo.iter_commits.return_value = mock_commit_list
+        repo.git.log.return_value = mock_git_log
 
         yield mock
 
@@ -0,0 +1,113 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import time
+from typing import Any
+
+import pytest
+from freezegun import freeze_time
+
+from repo.data.general import RepoRequest
+from repo.data.git_data import GitData
+from repo.data.grade import GradedRepo
+from repo.services.db_cache_service import check_cache, patch_cache
+from repo.services.errors import CacheMiss
+from repo.services.memory_cache_service import MemoryCache, get_memory_cache
+
+
+def _repo(name: str) -> RepoRequest:
+    return RepoRequest(source="github", owner="test", repo=name)
+
+
+@pytest.fixture
+def memory_cache(settings: Any) -> MemoryCache:
+    settings.GITGRADE_MEMORY_CACHE_ENTRIES = 2
+    settings.GITGRADE_MEMORY_CACHE_MAX_AGE = 60
+    memory_cache = get_memory_cache()
+    assert memory_cache is not None
+    memory_cache.invalidate(_repo("test"))
+    return memory_cache
+
+
+def test_least_recently_used_evicted(graded: GradedRepo) -> None:
+    memory_cache = MemoryCache(max_entries=2, max_age=60)
+    far_future = time.time() + 3600
+    memory_cache.put("1.0.0", _repo("a"), graded, fresh_until=far_future)
+    memory_cache.put("1.0.0", _repo("b"), graded, fresh_until=far_future)
+    assert memory_cache.get("1.0.0", _repo("a")) == graded
+
+    memory_cache.put("1.0.0", _repo("c"), graded, fresh_until=far_future)
+
+    assert memory_cache.get("1.0.0", _repo("b")) is None
+    assert memory_cache.get("1.0.0", _repo("a")) == graded
+    assert memory_cache.get("1.0.0", _repo("c")) == graded
+    assert memory_cache.get("0.9.0", _repo("c")) is None
+    assert memory_cache.counters.evictions == 1
+    assert (memory_cache.counters.hits, memory_cache.counters.misses) == (3, 2)
+
+
+def test_entries_expire(graded: GradedRepo) -> None:
+    memory_cache = MemoryCache(max_entries=10, max_age=60)
+    with freeze_time("2022-01-30 00:00:00"):
+        memory_cache.put("1.0.0", _repo("fresh-row"), graded, fresh_until=time.time() + 3600)
+        memory_cache.put("1.0.0", _repo("stale-row"), graded, fresh_until=time.time() + 30)
+
+    with freeze_time("2022-01-30 00:00:45"):
+        assert memory_cache.get("1.0.0", _repo("fresh-row")) == graded
+        assert memory_cache.get("1.0.0", _repo("stale-row")) is None
+
+    with freeze_time("2022-01-30 00:01:15"):
+        assert memory_cache.get("1.0.0", _repo("fresh-row")) is None
+
+    assert memory_cache.counters.expirations == 2
+    assert len(memory_cache) == 0
+
+
+def test_copies_handed_out(graded: GradedRepo) -> None:
+    memory_cache = MemoryCache(max_entries=10, max_age=60)
+    memory_cache.put("1.0.0", _repo("a"), graded, fresh_until=time.time() + 60)
+    graded.data.contributor.author_count_all = 1000
+
+    remembered = memory_cache.get("1.0.0", _repo("a"))
+    assert remembered and remembered.data.contributor.author_count_all == 3
+    remembered.data.contributor.author_count_all = 2000
+    remembered_again = memory_cache.get("1.0.0", _repo("a"))
+    assert remembered_again and remembered_again.data.contributor.author_count_all == 3
+
+
+def test_disabled_by_default_in_tests() -> None:
+    assert get_memory_cache() is None
+
+
+@pytest.mark.django_db
+def test_check_cache_served_from_memory(memory_cache: MemoryCache, git_data: GitData, django_assert_num_queries: Any) -> None:
+    patch_cache("1.0.0", _repo("test"), git_data)
+
+    with django_assert_num_queries(0):
+        assert check_cache("1.0.0", _repo("test")) == git_data
+
+    # A write replaces what's remembered
+    git_data.popularity.watcher_count = 20
+    patch_cache("1.0.0", _repo("test"), git_data)
+    with django_assert_num_queries(0):
+        assert check_cache("1.0.0", _repo("test")).popularity.watcher_count == 20
+
+    # A newer version of the app grades the data again rather than using the old version's grades
+    with django_assert_num_queries(1):
+        assert check_cache("1.0.1", _repo("test")).popularity.watcher_count == 20
+
+
+@pytest.mark.django_db
+def test_memory_follows_database_freshness(memory_cache: MemoryCache, git_data: GitData, settings: Any) -> None:
+    settings.GITGRADE_MEMORY_CACHE_MAX_AGE = 365 * 24 * 60 * 60
+    memory_cache = get_memory_cache()
+    assert memory_cache is not None
+
+    with freeze_time("2022-01-01"):
+        patch_cache("1.0.0", _repo("test"), git_data)
+
+    with freeze_time("2022-01-31"):
+        assert check_cache("1.0.0", _repo("test")) == git_data
+        assert memory_cache.counters.hits == 1
+
+    with freeze_time("2022-02-01"):
+        with pytest.raises(CacheMiss):
+            check_cache("1.0.0", _repo("test"))
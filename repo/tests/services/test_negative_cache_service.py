@@ -0,0 +1,120 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from typing import Any, List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp import ClientResponseError
+from freezegun import freeze_time
+
+from repo.data.general import RepoRequest
+from repo.data.git_data import GitData
+from repo.services import input_service, negative_cache_service
+from repo.services.negative_cache_service import NegativeCache, get_negative_cache, repo_key, url_key
+
+REPO = RepoRequest(source="github", owner="Test", repo="Test")
+
+
+@pytest.fixture
+def negative_cache(settings: Any, monkeypatch: Any) -> NegativeCache:
+    monkeypatch.setattr(negative_cache_service, "_NEGATIVE_CACHE", None)
+    settings.GITGRADE_NEGATIVE_CACHE_ENTRIES = 100
+    settings.GITGRADE_NEGATIVE_NOT_FOUND_SECONDS = 600
+    settings.GITGRADE_NEGATIVE_URL_SECONDS = 3600
+    settings.GITGRADE_NEGATIVE_ERROR_SECONDS = 60
+    settings.GITGRADE_NEGATIVE_ERROR_THRESHOLD = 3
+    cache = get_negative_cache()
+    assert cache is not None
+    return cache
+
+
+def test_disabled(settings: Any) -> None:
+    assert get_negative_cache() is None
+
+
+def test_entries_expire_and_are_bounded() -> None:
+    cache = NegativeCache(max_entries=2)
+    with freeze_time("2022-01-30 00:00:00"):
+        cache.put(url_key("https://gitlab.com/a/b"), "not supported", seconds=60)
+        cache.put(url_key("https://gitlab.com/c/d"), "not supported", seconds=600)
+        assert cache.get(url_key(" https://gitlab.com/a/b ")) == "not supported"
+
+        cache.put(url_key("https://gitlab.com/e/f"), "not supported", seconds=600)
+        assert len(cache) == 2
+        assert cache.get(url_key("https://gitlab.com/c/d")) is None, "Least recently used"
+
+    with freeze_time("2022-01-30 00:01:00"):
+        assert cache.get(url_key("https://gitlab.com/a/b")) is None
+        assert cache.get(url_key("https://gitlab.com/e/f")) == "not supported"
+    assert cache.hits == 2
+
+
+def test_not_found_only_for_the_same_token() -> None:
+    cache = NegativeCache(max_entries=10)
+    cache.put_for_token(repo_key(REPO), "missing", seconds=600, token=None)
+
+    assert cache.get(repo_key(RepoRequest(source="github", owner="test", repo="test"))) == "missing"
+    assert cache.get(repo_key(REPO), "user-token") is None
+
+
+def test_errors_block_once_repeated() -> None:
+    cache = NegativeCache(max_entries=10)
+    for _ in range(2):
+        cache.put(repo_key(REPO), "unexpected", seconds=60, blocks_after=3)
+        assert cache.get(repo_key(REPO)) is None
+    cache.put(repo_key(REPO), "unexpected", seconds=60, blocks_after=3)
+    assert cache.get(repo_key(REPO)) == "unexpected"
+
+    cache.clear(repo_key(REPO))
+    assert cache.get(repo_key(REPO)) is None
+
+
+def test_bad_urls_remembered(negative_cache: NegativeCache, monkeypatch: Any) -> None:
+    parsed: List[str] = []
+    identify_source = input_service.identify_source
+
+    def counting_identify_source(repo_url: str) -> RepoRequest:
+        parsed.append(repo_url)
+        return identify_source(repo_url)
+
+    monkeypatch.setattr(input_service, "identify_source", counting_identify_source)
+    for _ in range(3):
+        result = input_service.input_util(repo_url="https://gitlab.com/test/test")
+        assert result["status"] == "error"
+        assert "not supported" in result["error_message"]
+    assert len(parsed) == 1
+
+
+@pytest.mark.django_db
+def test_not_found_cleared_by_another_token(negative_cache: NegativeCache, git_data: GitData, monkeypatch: Any) -> None:
+    fetched: List[Optional[str]] = []
+
+    def fetch(repo_request: RepoRequest) -> GitData:
+        fetched.append(repo_request.sso_token)
+        if repo_request.sso_token != "member-token":
+            raise ClientResponseError(MagicMock(), (), status=404)
+        return git_data
+
+    monkeypatch.setattr(input_service, "_fetch_git_data", fetch)
+    for _ in range(2):
+        result = input_service.input_util(source="github", owner="test", repo="private")
+        assert result["error_message"] == input_service.NOT_FOUND_MESSAGE
+    assert fetched == [None]
+
+    assert input_service.input_util(source="github", owner="test", repo="private", github_token="member-token")["status"] == "success"
+    assert fetched == [None, "member-token"]
+    assert negative_cache.get(repo_key(RepoRequest(source="github", owner="test", repo="private"))) is None
+
+
+@pytest.mark.django_db
+def test_repeated_server_errors(negative_cache: NegativeCache, monkeypatch: Any) -> None:
+    fetched: List[Optional[str]] = []
+
+    def fetch(repo_request: RepoRequest) -> GitData:
+        fetched.append(repo_request.sso_token)
+        raise ClientResponseError(MagicMock(), (), status=502)
+
+    monkeypatch.setattr(input_service, "_fetch_git_data", fetch)
+    for _ in range(5):
+        result = input_service.input_util(source="github", owner="test", repo="test", github_token="user-token")
+        assert result["error_message"] == input_service.UNEXPECTED_ERROR_MESSAGE
+    assert len(fetched) == 3
@@ -0,0 +1,160 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import time
+from typing import Any, Callable, Dict, List
+from unittest.mock import MagicMock
+
+import aiohttp
+import pytest
+from aiohttp import web, ClientResponseError
+from aiohttp.abc import Request, StreamResponse
+
+from repo.services.errors import RateLimitExhausted
+from repo.services.github_client import GithubClient
+from repo.services.rate_limit_service import SECONDARY_LIMIT_DEFAULT_WAIT, RateLimitScheduler, get_budget, get_scheduler, record_budget, token_key
+
+
+pytestmark = pytest.mark.usefixtures("empty_budgets")
+
+
+def _secondary_limit_error(retry_after: str) -> ClientResponseError:
+    return ClientResponseError(MagicMock(), (), status=403, message="You have exceeded a secondary rate limit", headers={"Retry-After": retry_after})
+
+
+def test_budget_tracked_per_token(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    record_budget("token-a", "core", rate_headers(remaining=10, reset_in=600))
+
+    budget = get_budget("token-a", "core")
+    assert budget and budget.remaining == 10
+    assert get_budget("token-b", "core") is None
+
+
+def test_refuses_fetch_that_would_run_out(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=10, max_limit=20)
+    record_budget("token", "core", rate_headers(remaining=5, reset_in=600))
+
+    scheduler.ensure_budget("token", "core", 5)
+    with pytest.raises(RateLimitExhausted):
+        scheduler.ensure_budget("token", "core", 20)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_aimd() -> None:
+    scheduler = RateLimitScheduler(initial_limit=4, max_limit=5)
+    for _ in range(4):
+        scheduler.record_success("token", "core", {})
+    assert scheduler.limit == 5
+
+    assert scheduler.record_error("token", "core", _secondary_limit_error("1")) == 1.0
+    assert scheduler.limit == 2
+    assert scheduler.paused_until[token_key("token")] > time.time()
+
+    scheduler.record_error("token", "core", _secondary_limit_error("1"))
+    scheduler.record_error("token", "core", _secondary_limit_error("1"))
+    assert scheduler.limit == 1
+
+
+def test_secondary_limit_without_retry_after(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=8, max_limit=20)
+    error = ClientResponseError(MagicMock(), (), status=403, message="You have exceeded a secondary rate limit.", headers=rate_headers(remaining=4000, reset_in=3600))
+
+    assert scheduler.record_error("token", "core", error) is None  # The default wait is longer than we'll hold a request
+    assert scheduler.limit == 4
+    assert scheduler.paused_until[token_key("token")] >= time.time() + SECONDARY_LIMIT_DEFAULT_WAIT - 1
+
+
+def test_forbidden_isnt_secondary(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=8, max_limit=20)
+    error = ClientResponseError(MagicMock(), (), status=403, message="Resource not accessible by integration", headers=rate_headers(remaining=4000, reset_in=3600))
+
+    assert scheduler.record_error("token", "core", error) is None
+    assert (scheduler.limit, scheduler.paused_until) == (8, {})
+
+
+def test_primary_limit_isnt_secondary(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=8, max_limit=20)
+    error = ClientResponseError(MagicMock(), (), status=403, message="Forbidden", headers=rate_headers(remaining=0, reset_in=3600))
+
+    assert scheduler.record_error("token", "core", error) is None
+    assert (scheduler.limit, scheduler.paused_until) == (8, {})
+
+
+@pytest.mark.asyncio
+async def test_secondary_limit_pauses_only_its_token() -> None:
+    scheduler = RateLimitScheduler(initial_limit=8, max_limit=20)
+    scheduler.record_error("token-a", "core", _secondary_limit_error("600"))
+
+    started = time.time()
+    await scheduler.wait_for_budget("token-b", "core")
+    assert time.time() - started < 1
+    with pytest.raises(RateLimitExhausted):
+        await scheduler.wait_for_budget("token-a", "core")
+
+
+@pytest.mark.asyncio
+async def test_refuses_to_wait_for_distant_reset(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=10, max_limit=20)
+    record_budget("token", "core", rate_headers(remaining=0, reset_in=3600))
+
+    with pytest.raises(RateLimitExhausted):
+        await scheduler.wait_for_budget("token", "core")
+
+
+@pytest.mark.asyncio
+async def test_waits_for_imminent_reset(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    scheduler = RateLimitScheduler(initial_limit=10, max_limit=20)
+    headers = rate_headers(remaining=0, reset_in=2)
+    record_budget("token", "core", headers)
+
+    await scheduler.wait_for_budget("token", "core")
+
+    assert time.time() >= float(headers["X-RateLimit-Reset"]) - 0.01
+
+
+@pytest.fixture
+def secondary_limited_server(github_stub: Callable[..., Any], rate_headers: Callable[..., Dict[str, str]]) -> Any:
+    calls: List[float] = []
+
+    async def get_repo(request: Request) -> StreamResponse:
+        calls.append(time.time())
+        if len(calls) == 1:
+            return web.json_response({"message": "You have exceeded a secondary rate limit"}, status=403, headers={"Retry-After": "0"})
+        return web.json_response({"id": 1}, headers=rate_headers(remaining=4999, reset_in=3600))
+
+    server = github_stub(web.get("/repos/test/test", get_repo))
+    server.calls = calls
+    return server
+
+
+@pytest.mark.asyncio
+async def test_client_retries_after_secondary_limit(secondary_limited_server: Any) -> None:
+    async with aiohttp.ClientSession(base_url=str(secondary_limited_server.make_url("/")), raise_for_status=True) as session:
+        client = GithubClient(session, "token")
+        async with client.get("/repos/test/test") as response:
+            assert await response.json() == {"id": 1}
+
+    assert len(secondary_limited_server.calls) == 2
+    budget = get_budget("token", "core")
+    assert budget and budget.remaining == 4999
+
+
+@pytest.fixture
+def forbidding_server(github_stub: Callable[..., Any], rate_headers: Callable[..., Dict[str, str]]) -> Any:
+    async def get_repo(request: Request) -> StreamResponse:
+        if request.headers["Authorization"] == "Bearer limited":
+            message = "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."
+        else:
+            message = "Resource not accessible by integration"
+        return web.json_response({"message": message}, status=403, headers=rate_headers(remaining=4000, reset_in=3600))
+
+    return github_stub(web.get("/repos/test/test", get_repo))
+
+
+@pytest.mark.asyncio
+async def test_client_reads_secondary_limit_from_body(forbidding_server: Any) -> None:
+    async with aiohttp.ClientSession(base_url=str(forbidding_server.make_url("/")), raise_for_status=True) as session:
+        for token in ("forbidden", "limited"):
+            with pytest.raises(ClientResponseError):
+                async with GithubClient(session, token).get("/repos/test/test"):
+                    pass
+
+    assert set(get_scheduler().paused_until) == {token_key("limited")}
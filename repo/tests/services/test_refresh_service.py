@@ -0,0 +1,94 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import threading
+from typing import Any, Callable, List, Tuple
+
+import pytest
+from freezegun import freeze_time
+
+from gitgrade.util import get_version
+from repo.data.general import RepoRequest
+from repo.data.git_data import GitData
+from repo.services import input_service
+from repo.services.db_cache_service import check_cache, patch_cache
+from repo.services.refresh_service import Refresher, get_refresher
+
+REPO = RepoRequest(source="github", owner="test", repo="test")
+
+
+class RecordingRefresher:  # pylint: disable=too-few-public-methods
+    def __init__(self) -> None:
+        self.submitted: List[Tuple[RepoRequest, Callable[[], None]]] = []
+
+    def submit(self, url_metadata: RepoRequest, refresh: Callable[[], None]) -> bool:
+        self.submitted.append((url_metadata, refresh))
+        return True
+
+
+def test_one_refresh_per_repo() -> None:
+    refresher = Refresher(max_workers=2)
+    release = threading.Event()
+    calls: List[str] = []
+
+    def refresh() -> None:
+        calls.append("refresh")
+        release.wait(timeout=5)
+
+    assert refresher.submit(REPO, refresh)
+    assert not refresher.submit(REPO, refresh)
+    assert refresher.submit(RepoRequest(source="github", owner="test", repo="other"), refresh)
+
+    release.set()
+    refresher.wait(timeout=5)
+    assert calls == ["refresh", "refresh"]
+
+    assert refresher.submit(REPO, refresh)
+    refresher.shutdown()
+    assert len(calls) == 3
+
+
+def test_failed_refresh_can_be_retried() -> None:
+    refresher = Refresher(max_workers=1)
+
+    def refresh() -> None:
+        raise ConnectionError("Github is down")
+
+    assert refresher.submit(REPO, refresh)
+    refresher.wait(timeout=5)
+    assert refresher.submit(REPO, refresh)
+    refresher.shutdown()
+
+
+def test_disabled(settings: Any) -> None:
+    settings.GITGRADE_REFRESH_WORKERS = 0
+    assert get_refresher() is None
+
+    settings.GITGRADE_REFRESH_WORKERS = 1
+    refresher = get_refresher()
+    assert refresher is not None and refresher is get_refresher()
+
+
+@pytest.mark.django_db
+def test_stale_grades_shown_while_refreshing(git_data: GitData, settings: Any, monkeypatch: Any) -> None:
+    settings.GITGRADE_STALE_MAX_DAYS = 90
+    refresher = RecordingRefresher()
+    monkeypatch.setattr(input_service, "get_refresher", lambda: refresher)
+    with freeze_time("2022-01-01"):
+        patch_cache(get_version(), REPO, git_data)
+
+    with freeze_time("2022-03-01"):
+        result = input_service.input_util(source="github", owner="test", repo="test")
+        assert result["status"] == "success"
+        assert result["data"]["popularity"]["watcher_count"] == 10
+        assert result["view"]["refreshing_from"] == "2022-01-01"
+
+        (url_metadata, refresh), *others = refresher.submitted
+        assert url_metadata == REPO and not others
+
+        git_data.popularity.watcher_count = 20
+        monkeypatch.setattr(input_service, "_fetch_git_data", lambda _: git_data)
+        refresh()
+        assert check_cache(get_version(), REPO).popularity.watcher_count == 20
+
+        result = input_service.input_util(source="github", owner="test", repo="test")
+        assert result["view"]["refreshing_from"] is None
+        assert len(refresher.submitted) == 1
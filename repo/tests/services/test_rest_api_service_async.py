@@ -1,17 +1,23 @@
 # pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
 import json
 import logging
-from typing import Any, Generator
+from typing import Any, Callable, Dict, Generator
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from aiohttp import web
 from aiohttp.abc import StreamResponse, Request
+from asgiref.sync import sync_to_async
 from freezegun import freeze_time
 
 from repo.data.from_source import DataFromAPI, TimeData
 from repo.data.general import RepoRequest, Statistics, SECONDS_IN_DAY
-from repo.services import rest_api_service_async
+from repo.data.github import Release
+from repo.models import CommitWatermark, TagObject
+from repo.services import release_service, rest_api_service_async
+from repo.services.activity_service import load_activity
+from repo.services.commit_timeline import github_date_to_epoch
+from repo.services.github_client import GithubClient
 from repo.tests import github_data
 from repo.tests.github_data import COMMITS_PAGE_OBJECTS
 
@@ -69,14 +75,45 @@ async def get_pull_request(request: Request) -> StreamResponse:
     return web.Response(body="", headers=headers, status=200)
 
 
+def _commit(date: str, commits_back: int) -> Dict[str, Any]:
+    return {
+        "sha": f"sha-{date}",
+        "commit": {
+            "author": {"name": "test-name", "date": date},
+            "committer": {"name": "test-name", "date": date},
+            "message": f"commits_back: {commits_back}",
+            "comment_count": 0,
+        },
+    }
+
+
+COMMIT_PAGE_REQUESTS = []
+
+
+def _last_page_headers(path: str, last_page: int) -> Dict[str, str]:
+    return {
+        "content-type": "application/json",
+        "link": f'<https://api.github.com/repositories/1/{path}?per_page=1&page=2>; rel="next", '
+        f'<https://api.github.com/repositories/1/{path}?per_page=1&page={last_page}>; rel="last"',
+    }
+
+
 async def get_commits(request: Request) -> StreamResponse:
+    if "since" not in request.query:
+        # Counting every commit on the default branch
+        return web.Response(body=json.dumps([_commit("2022-01-20T00:00:00Z", 0)]), headers=_last_page_headers("commits", 500), status=200)
+
+    COMMIT_PAGE_REQUESTS.append(request.query["since"])
+    if request.query["since"].startswith("2022-01-20T00:00:00"):
+        # A refresh, everything since the watermark fits on one page
+        return web.Response(
+            body=json.dumps([_commit("2022-01-22T00:00:00Z", -2), _commit("2022-01-21T00:00:00Z", -1), _commit("2022-01-20T00:00:00Z", 0)]),
+            headers={"content-type": "application/json"},
+            status=200,
+        )
+
     return web.Response(
-        body=json.dumps(
-            [
-                {"commit": {"author": {"name": "test-name", "date": "2022-01-20T00:00:00Z"}, "message": "commits_back: 0", "comment_count": 0}},
-                {"commit": {"author": {"name": "test-name", "date": "2022-01-19T00:00:00Z"}, "message": "commits_back: 1", "comment_count": 0}},
-            ]
-        ),
+        body=json.dumps([_commit("2022-01-20T00:00:00Z", 0), _commit("2022-01-19T00:00:00Z", 1)]),
         headers={
             "content-type": "application/json",
             "link": "<https://api.github.com/repositories/1/commits?per_page=2&since=2022-01-20T00%3A00%3A00Z&page=2>; "
@@ -92,18 +129,13 @@ async def get_commits(request: Request) -> StreamResponse:
 async def get_paginated_commits(request: Request) -> StreamResponse:
     page = request.url.query.get("page")
     logger.debug("  page: %s", page)
+    COMMIT_PAGE_REQUESTS.append(f"page {page}")
     commit_counter = (int(page if page else 2) - 1) * 2
     return web.Response(
         body=json.dumps(
             [
-                {"commit": {"author": {"name": "test-name", "date": f"2022-01-{20 - commit_counter}T00:00:00Z"}, "message": f"commits_back: {commit_counter}", "comment_count": 0}},
-                {
-                    "commit": {
-                        "author": {"name": "test-name", "date": f"2022-01-{20 - commit_counter - 1}T00:00:00Z"},
-                        "message": f"commits_back: {commit_counter + 1}",
-                        "comment_count": 0,
-                    }
-                },
+                _commit(f"2022-01-{20 - commit_counter}T00:00:00Z", commit_counter),
+                _commit(f"2022-01-{20 - commit_counter - 1}T00:00:00Z", commit_counter + 1),
             ]
         ),
         headers={"content-type": "application/json"},
@@ -111,18 +143,41 @@ async def get_paginated_commits(request: Request) -> StreamResponse:
     )
 
 
-async def get_tag(request: Request) -> StreamResponse:
-    # The sha is hacked to be a mock hash with the last digit being a sequential int
-    sha: str = request.match_info["sha"]
-    int_hack = int(sha[-1]) + 1
+async def get_contributors(request: Request) -> StreamResponse:
+    assert request.query["anon"] == "1"
+    return web.Response(body=json.dumps([{"login": "test-name", "contributions": 400}]), headers=_last_page_headers("contributors", 12), status=200)
+
+
+STATS_REQUESTS = []
+WEEK_OF_2022_01_09 = 1641686400
+
 
-    tag = {"tag": f"{int_hack}.0.0", "tagger": {"date": f"2022-01-{10 + int_hack}T00:00:00Z"}}
+async def get_stats(request: Request) -> StreamResponse:
+    """
+    Answers 202 the first time each statistic is asked for, as Github does while it computes them.
+    One commit a day from 2022-01-11 to 2022-01-20, matching the commit pages.
+    """
+    STATS_REQUESTS.append(request.path)
+    if STATS_REQUESTS.count(request.path) == 1:
+        return web.json_response({}, status=202)
+
+    second_week = WEEK_OF_2022_01_09 + 7 * SECONDS_IN_DAY
+    if request.path.endswith("commit_activity"):
+        stats = [
+            {"week": WEEK_OF_2022_01_09, "total": 5, "days": [0, 0, 1, 1, 1, 1, 1]},
+            {"week": second_week, "total": 5, "days": [1, 1, 1, 1, 1, 0, 0]},
+        ]
+    else:
+        stats = [{"author": {"login": "test-name"}, "total": 400, "weeks": [{"w": WEEK_OF_2022_01_09, "c": 5}, {"w": second_week, "c": 5}]}]
+    return web.json_response(stats)
 
-    return web.Response(body=json.dumps(tag), headers={"content-type": "application/json"}, status=200)
+
+def _tag_sha(number: int) -> str:
+    return f"{number:040x}"
 
 
 async def get_tags(request: Request) -> StreamResponse:
-    tags = [{"object": {"sha": f"abcdefg{i}"}} for i in range(10, 0, -1)]
+    tags = [{"ref": f"refs/tags/{i}.0.0", "object": {"sha": _tag_sha(i), "type": "tag"}} for i in range(10, 0, -1)]
 
     return web.Response(
         body=json.dumps(tags),
@@ -131,19 +186,39 @@ async def get_tags(request: Request) -> StreamResponse:
     )
 
 
-@pytest.fixture
-def patched_aiohttp_client(loop, aiohttp_client: AsyncMock) -> Any:
-    github_stub = web.Application()
-    github_stub.router.add_get("/repos/test/test", get_repo)
-    github_stub.router.add_get("/repos/test/test/pulls", get_pull_request)
+async def get_releases(request: Request) -> StreamResponse:
+    assert request.query["per_page"] == "1"
+    releases = [{"tag_name": "10.0.0", "published_at": "2022-01-20T00:00:00Z"}]
+
+    return web.Response(body=json.dumps(releases), headers={"content-type": "application/json"}, status=200)
+
+
+GRAPHQL_QUERIES = []
+
 
-    github_stub.router.add_get("/repos/test/test/commits", get_commits)
-    github_stub.router.add_get("/repositories/1/commits", get_paginated_commits)
+async def post_graphql(request: Request) -> StreamResponse:
+    query = (await request.json())["query"]
+    GRAPHQL_QUERIES.append(query)
+    # Tag i was created at 2022-01-(10 + i) in the committer's time zone, an hour ahead of UTC
+    objects = {f"o{_tag_sha(i)}": {"tagger": {"date": f"2022-01-{10 + i}T01:00:00+01:00"}} for i in range(1, 11) if _tag_sha(i) in query}
+    return web.Response(body=json.dumps({"data": {"repository": objects}}), headers={"content-type": "application/json"}, status=200)
 
-    github_stub.router.add_get("/repos/test/test/git/matching-refs/tags", get_tags)
-    github_stub.router.add_get("/repos/test/test/git/tags/{sha}", get_tag)
 
-    return loop.run_until_complete(aiohttp_client(github_stub))
+@pytest.fixture
+def patched_aiohttp_client(loop: Any, aiohttp_client: Any, github_stub: Callable[..., Any]) -> Any:
+    server = github_stub(
+        web.get("/repos/test/test", get_repo),
+        web.get("/repos/test/test/pulls", get_pull_request),
+        web.get("/repos/test/test/commits", get_commits),
+        web.get("/repositories/1/commits", get_paginated_commits),
+        web.get("/repos/test/test/contributors", get_contributors),
+        web.get("/repos/test/test/stats/commit_activity", get_stats),
+        web.get("/repos/test/test/stats/contributors", get_stats),
+        web.get("/repos/test/test/git/matching-refs/tags", get_tags),
+        web.get("/repos/test/test/releases", get_releases),
+        web.post("/graphql", post_graphql),
+    )
+    return loop.run_until_complete(aiohttp_client(server))
 
 
 @pytest.fixture
@@ -153,29 +228,132 @@ def disable_sleep() -> Generator[None, None, None]:
 
 
 @pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
 @freeze_time("2022-01-30")
-async def test_fetch_github(patched_aiohttp_client: Any, disable_sleep: None) -> None:
+async def test_fetch_github(patched_aiohttp_client: Any, disable_sleep: None, expected_api_data: DataFromAPI) -> None:
     with patch("repo.services.rest_api_service_async.aiohttp.ClientSession") as mock_client_session:
         mock_client_session.return_value.__aenter__.return_value = patched_aiohttp_client
 
         source = RepoRequest(source="test", owner="test", repo="test")
         actual = await rest_api_service_async.fetch_github_api_data(source)
-        expected = DataFromAPI(
-            days_since_update=10,
-            days_since_create=1000,
-            watcher_count=1000,
-            pull_request_count_open=10,
-            pull_request_count=100,
-            open_issue_count=10,
-            days_since_commit=10,
-            time_recent=TimeData(
-                commit_count=10,
-                commit_count_primary_author=10,
-                commit_interval=Statistics(mean=float(SECONDS_IN_DAY), standard_deviation=0.0),
-                author_count=1,
-            ),
-            latest_release="10.0.0",
-            releases_count=10,
-            days_since_last_release=10,
-        )
-    assert actual == expected
+    assert actual == expected_api_data
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@freeze_time("2022-01-30")
+async def test_fetch_github_from_stats(patched_aiohttp_client: Any, settings: Any, expected_api_data: DataFromAPI) -> None:
+    settings.GITHUB_COMMIT_SOURCE = "stats"
+    STATS_REQUESTS.clear()
+    COMMIT_PAGE_REQUESTS.clear()
+
+    source = RepoRequest(source="test", owner="test", repo="test")
+    with patch("repo.services.stats_service.asyncio.sleep") as mock_sleep:
+        actual = await rest_api_service_async.fetch_github_api_data(source, session=patched_aiohttp_client)
+
+    assert actual == expected_api_data
+    assert not COMMIT_PAGE_REQUESTS
+    assert len(STATS_REQUESTS) == 4
+    assert mock_sleep.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@freeze_time("2022-01-30")
+async def test_fetch_github_stats_not_ready(patched_aiohttp_client: Any, disable_sleep: None, settings: Any, expected_api_data: DataFromAPI) -> None:
+    settings.GITHUB_COMMIT_SOURCE = "stats"
+    settings.GITHUB_STATS_POLL_ATTEMPTS = 1
+    STATS_REQUESTS.clear()
+    COMMIT_PAGE_REQUESTS.clear()
+
+    source = RepoRequest(source="test", owner="test", repo="test")
+    actual = await rest_api_service_async.fetch_github_api_data(source, session=patched_aiohttp_client)
+
+    assert actual == expected_api_data
+    assert COMMIT_PAGE_REQUESTS
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+@freeze_time("2022-01-30")
+async def test_tag_dates_batched_and_cached(patched_aiohttp_client: Any, disable_sleep: None) -> None:
+    GRAPHQL_QUERIES.clear()
+    client = GithubClient(patched_aiohttp_client, "token")
+
+    newest, count = await release_service.get_newest_release("test/test", client)
+    assert newest == Release(tag="10.0.0", created_at="2022-01-20T00:00:00Z")
+    assert count == 10
+    assert len(GRAPHQL_QUERIES) == 1
+
+    newest, count = await release_service.get_newest_release("test/test", client)
+    assert newest == Release(tag="10.0.0", created_at="2022-01-20T00:00:00Z")
+    assert count == 10
+    assert len(GRAPHQL_QUERIES) == 1
+    assert await TagObject.objects.acount() == 10
+
+
+async def get_tags_only(request: Request) -> StreamResponse:
+    # Listed by name the way Github lists refs, so v2.9.0 comes last
+    tags = [{"ref": f"refs/tags/v2.{minor}.0", "object": {"sha": _tag_sha(minor), "type": "tag"}} for minor in (1, 10, 9)]
+    return web.json_response(tags)
+
+
+async def get_no_releases(request: Request) -> StreamResponse:
+    return web.json_response([])
+
+
+async def get_git_tag(request: Request) -> StreamResponse:
+    assert request.match_info["sha"] == _tag_sha(10)
+    return web.json_response({"tag": "v2.10.0", "tagger": {"date": "2022-01-20T01:00:00+01:00"}})
+
+
+@pytest.fixture
+def tag_only_client(loop: Any, aiohttp_client: Any, github_stub: Callable[..., Any]) -> Any:
+    server = github_stub(
+        web.get("/repos/test/test/git/matching-refs/tags", get_tags_only),
+        web.get("/repos/test/test/releases", get_no_releases),
+        web.get("/repos/test/test/git/tags/{sha}", get_git_tag),
+    )
+    return loop.run_until_complete(aiohttp_client(server))
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_anonymous_tag_only_repo(tag_only_client: Any) -> None:
+    client = GithubClient(tag_only_client)
+    assert not client.authenticated
+
+    newest, count = await release_service.get_newest_release("test/test", client)
+    assert newest == Release(tag="v2.10.0", created_at="2022-01-20T00:00:00Z")
+    assert count == 3
+    assert await TagObject.objects.acount() == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_refresh_fetches_only_commits_after_watermark(patched_aiohttp_client: Any, disable_sleep: None) -> None:
+    source = RepoRequest(source="test", owner="test", repo="test")
+    with freeze_time("2022-01-30"):
+        await rest_api_service_async.fetch_github_api_data(source, session=patched_aiohttp_client)
+
+    COMMIT_PAGE_REQUESTS.clear()
+    with freeze_time("2022-02-02"):
+        actual = await rest_api_service_async.fetch_github_api_data(source, session=patched_aiohttp_client)
+
+    assert len(COMMIT_PAGE_REQUESTS) == 1
+    assert actual.days_since_commit == 11
+    assert actual.time_recent == TimeData(
+        commit_count=12,
+        commit_count_primary_author=12,
+        commit_interval=Statistics(mean=float(SECONDS_IN_DAY), standard_deviation=0.0),
+        author_count=1,
+    )
+    watermark = await CommitWatermark.objects.aget(source="test", owner="test", repo="test")
+    assert watermark.sha == "sha-2022-01-22T00:00:00Z"
+
+    activity = await sync_to_async(load_activity)(source)
+    assert activity
+    january = activity.window(github_date_to_epoch("2022-01-01T00:00:00Z") // SECONDS_IN_DAY, github_date_to_epoch("2022-01-31T00:00:00Z") // SECONDS_IN_DAY)
+    assert (january.commit_count, january.active_days, january.author_count_low) == (12, 12, 1)
+    # Days are sketched once, commits dated on days already sketched aren't counted again
+    assert activity.sketch.top() == [("test-name", 10)]
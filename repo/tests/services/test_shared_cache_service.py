@@ -0,0 +1,83 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import pickle
+import time
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from django.core.cache import caches
+
+from repo.data.general import RepoRequest
+from repo.data.grade import GradedRepo
+from repo.services.cache_metrics import reset_metrics, tier_metrics
+from repo.services.db_cache_service import check_graded_cache, patch_cache
+from repo.services.memory_cache_service import get_memory_cache
+from repo.services.shared_cache_service import FORMAT, SharedCache, dump_graded, load_graded
+
+REPO = RepoRequest(source="github", owner="test", repo="test")
+
+
+@pytest.fixture
+def shared_tier(settings: Any) -> None:
+    settings.GITGRADE_SHARED_CACHE_ALIAS = "grades"
+    caches["grades"].clear()
+    reset_metrics()
+
+
+def test_round_trip(graded: GradedRepo) -> None:
+    blob = dump_graded(graded, fresh_until=1700000000)
+
+    assert load_graded(blob) == (graded, 1700000000.0)
+    assert b"days_since_commit" not in blob
+    assert len(blob) < len(pickle.dumps(graded)) / 2
+
+
+def test_other_formats_ignored(graded: GradedRepo) -> None:
+    blob = dump_graded(graded, fresh_until=1700000000).replace(f"[{FORMAT},".encode(), f"[{FORMAT + 1},".encode(), 1)
+
+    assert load_graded(blob) is None
+
+
+def test_backend_errors_read_as_misses(graded: GradedRepo) -> None:
+    backend = MagicMock()
+    backend.get.side_effect = ConnectionError("cache is down")
+    backend.set.side_effect = ConnectionError("cache is down")
+    shared_cache = SharedCache(backend)
+
+    shared_cache.put("1.0.0", REPO, graded, fresh_until=time.time() + 60)
+    assert shared_cache.get("1.0.0", REPO) is None
+
+
+@pytest.mark.django_db
+def test_other_nodes_read_shared_grades(shared_tier: None, graded: GradedRepo, settings: Any, django_assert_num_queries: Any) -> None:
+    patch_cache("1.0.0", REPO, graded.data)
+
+    # Another node, with nothing in its own memory yet
+    settings.GITGRADE_MEMORY_CACHE_ENTRIES = 10
+    memory_cache = get_memory_cache()
+    assert memory_cache is not None
+    memory_cache.invalidate(REPO)
+    with django_assert_num_queries(0):
+        assert check_graded_cache("1.0.0", REPO) == graded
+        assert check_graded_cache("1.0.0", REPO) == graded
+
+    metrics = tier_metrics()
+    assert (metrics["memory"].lookups, metrics["memory"].hits) == (2, 1)
+    assert (metrics["shared"].lookups, metrics["shared"].hits) == (1, 1)
+    assert metrics["database"].lookups == 0
+
+
+@pytest.mark.django_db
+def test_database_hits_fill_the_tiers_in_front(shared_tier: None, graded: GradedRepo, settings: Any) -> None:
+    settings.GITGRADE_SHARED_CACHE_ALIAS = ""
+    patch_cache("1.0.0", REPO, graded.data)
+
+    settings.GITGRADE_SHARED_CACHE_ALIAS = "grades"
+    assert check_graded_cache("1.0.0", REPO) == graded
+    assert check_graded_cache("1.0.0", REPO) == graded
+
+    metrics = tier_metrics()
+    assert (metrics["database"].lookups, metrics["database"].hits) == (1, 1)
+    assert (metrics["shared"].lookups, metrics["shared"].hits) == (2, 1)
+    assert metrics["shared"].mean_ms >= 0
+    assert get_memory_cache() is None
@@ -0,0 +1,195 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from unittest.mock import MagicMock
+
+import pytest
+from aiohttp import ClientResponseError
+from freezegun import freeze_time
+
+from repo.data.general import RepoRequest
+from repo.data.grade import GradedRepo
+from repo.services.db_cache_service import patch_cache
+from repo.services.errors import FetchTimedOut
+from repo.services.single_flight_service import AsyncSingleFlight, SingleFlight, acquire_lease, fetch_once, release_lease
+
+REPO = RepoRequest(source="github", owner="test", repo="test")
+
+
+@pytest.fixture
+def quick_waits(settings: Any) -> None:
+    settings.GITGRADE_FETCH_WAIT_SECONDS = 0.2
+    settings.GITGRADE_FETCH_POLL_SECONDS = 0.01
+
+
+def test_concurrent_calls_share_one_fetch() -> None:
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls: List[str] = []
+
+    def fetch() -> Dict[str, int]:
+        calls.append("fetch")
+        release.wait(timeout=5)
+        return {"watchers": 10}
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(single_flight.run, "repo", fetch, 5)
+        while not calls:
+            pass
+        waiters = [executor.submit(single_flight.run, "repo", fetch, 5) for _ in range(3)]
+        while single_flight.coalesced < 3:
+            pass
+        release.set()
+        results = [future.result() for future in [leader, *waiters]]
+
+    assert calls == ["fetch"]
+    assert results == [{"watchers": 10}] * 4
+    assert len({id(result) for result in results}) == 4
+
+    # Once the fetch is done the next call runs its own
+    assert single_flight.run("repo", fetch, 5) == {"watchers": 10}
+    assert calls == ["fetch", "fetch"]
+
+
+def test_waiters_share_errors_and_time_out() -> None:
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fetch() -> None:
+        started.set()
+        release.wait(timeout=5)
+        raise ConnectionError("Github is down")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        leader = executor.submit(single_flight.run, "repo", fetch, 5)
+        started.wait(timeout=5)
+        patient = executor.submit(single_flight.run, "repo", fetch, 5)
+        impatient = executor.submit(single_flight.run, "repo", fetch, 0.01)
+
+        with pytest.raises(FetchTimedOut):
+            impatient.result()
+        release.set()
+        for future in (leader, patient):
+            with pytest.raises(ConnectionError):
+                future.result()
+
+
+def test_waiters_fetch_with_their_own_token() -> None:
+    single_flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def fetch_without_access() -> Dict[str, int]:
+        started.set()
+        release.wait(timeout=5)
+        raise ClientResponseError(MagicMock(), (), status=404, message="Not Found")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(single_flight.run, "repo", fetch_without_access, 5)
+        started.wait(timeout=5)
+        waiter = executor.submit(single_flight.run, "repo", lambda: {"watchers": 10}, 5)
+        while not single_flight.coalesced:
+            pass
+        release.set()
+
+        with pytest.raises(ClientResponseError):
+            leader.result()
+        assert waiter.result() == {"watchers": 10}
+
+
+async def test_async_waiters_fetch_with_their_own_token() -> None:
+    single_flight = AsyncSingleFlight()
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def fetch_without_access() -> Dict[str, int]:
+        started.set()
+        await release.wait()
+        raise ClientResponseError(MagicMock(), (), status=403, message="Forbidden")
+
+    async def fetch_with_access() -> Dict[str, int]:
+        return {"watchers": 10}
+
+    leader = asyncio.create_task(single_flight.run("repo", fetch_without_access, 5))
+    await started.wait()
+    waiter = asyncio.create_task(single_flight.run("repo", fetch_with_access, 5))
+    while not single_flight.coalesced:
+        await asyncio.sleep(0)
+    release.set()
+
+    assert await waiter == {"watchers": 10}
+    with pytest.raises(ClientResponseError):
+        await leader
+
+
+async def test_waiter_takes_over_from_cancelled_leader() -> None:
+    single_flight = AsyncSingleFlight()
+    started = asyncio.Event()
+    calls: List[str] = []
+
+    async def fetch() -> Dict[str, int]:
+        calls.append("fetch")
+        if len(calls) == 1:
+            started.set()
+            await asyncio.sleep(5)
+        return {"watchers": 10}
+
+    leader = asyncio.create_task(single_flight.run("repo", fetch, 5))
+    await started.wait()
+    waiter = asyncio.create_task(single_flight.run("repo", fetch, 5))
+    while not single_flight.coalesced:
+        await asyncio.sleep(0)
+
+    # e.g. the leader's client disconnected, the waiter's request still wants its grades
+    leader.cancel()
+    assert await waiter == {"watchers": 10}
+    assert calls == ["fetch", "fetch"]
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.django_db
+def test_leases() -> None:
+    with freeze_time("2022-01-30 00:00:00"):
+        holder = acquire_lease(REPO, seconds=60)
+        assert holder
+        assert acquire_lease(REPO, seconds=60) is None
+
+        release_lease(REPO, "someone-else")
+        assert acquire_lease(REPO, seconds=60) is None
+
+        release_lease(REPO, holder)
+        holder = acquire_lease(REPO, seconds=60)
+        assert holder
+
+    with freeze_time("2022-01-30 00:01:00"):
+        taken_over = acquire_lease(REPO, seconds=60)
+        assert taken_over and taken_over != holder
+
+        # The original holder finishing late doesn't release the new holder's lease
+        release_lease(REPO, holder)
+        assert acquire_lease(REPO, seconds=60) is None
+
+
+@pytest.mark.django_db
+def test_result_from_lease_holder_used(quick_waits: None, graded: GradedRepo) -> None:
+    assert acquire_lease(REPO, seconds=60)
+    patch_cache("1.0.0", REPO, graded.data)
+
+    def fetch() -> GradedRepo:
+        raise AssertionError("The repo was fetched by the lease holder")
+
+    assert fetch_once("1.0.0", REPO, fetch) == graded
+
+
+@pytest.mark.django_db
+def test_lease_holder_waited_on(quick_waits: None, graded: GradedRepo) -> None:
+    holder = acquire_lease(REPO, seconds=60)
+    assert holder
+
+    with pytest.raises(FetchTimedOut):
+        fetch_once("1.0.0", REPO, lambda: graded)
+
+    release_lease(REPO, holder)
+    assert fetch_once("1.0.0", REPO, lambda: graded) == graded
+    assert acquire_lease(REPO, seconds=60), "Released after fetching"
@@ -0,0 +1,39 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from repo.data.general import SECONDS_IN_DAY
+from repo.services.stats_service import SECONDS_IN_WEEK, recent_commits_by_author, summarize_commit_activity
+
+WEEK: int = 1641686400  # Sunday 2022-01-09
+
+
+def test_commits_spread_across_their_day() -> None:
+    segment = summarize_commit_activity([{"week": WEEK, "total": 4, "days": [0, 0, 0, 4, 0, 0, 0]}], since=0)
+
+    assert segment
+    assert segment.count == 4
+    assert segment.oldest == WEEK + 3 * SECONDS_IN_DAY
+    statistics = segment.statistics()
+    assert statistics.mean == SECONDS_IN_DAY / 4
+    assert statistics.standard_deviation == 0.0
+
+
+def test_days_before_window_dropped() -> None:
+    commit_activity = [
+        {"week": WEEK, "total": 7, "days": [1, 1, 1, 1, 1, 1, 1]},
+        {"week": WEEK - SECONDS_IN_WEEK, "total": 7, "days": [1, 1, 1, 1, 1, 1, 1]},
+    ]
+    segment = summarize_commit_activity(commit_activity, since=WEEK + 2 * SECONDS_IN_DAY)
+
+    assert segment
+    assert segment.count == 5
+    assert segment.statistics().mean == SECONDS_IN_DAY
+    assert summarize_commit_activity([], since=0) is None
+
+
+def test_recent_commits_by_author() -> None:
+    contributors = [
+        {"author": {"login": "old-timer"}, "total": 100, "weeks": [{"w": WEEK - 10 * SECONDS_IN_WEEK, "c": 100}, {"w": WEEK, "c": 0}]},
+        {"author": {"login": "regular"}, "total": 8, "weeks": [{"w": WEEK - SECONDS_IN_WEEK, "c": 3}, {"w": WEEK, "c": 5}]},
+        {"author": None, "total": 2, "weeks": [{"w": WEEK, "c": 2}]},
+    ]
+
+    assert recent_commits_by_author(contributors, since=WEEK - 2) == {"regular": 8, "anonymous-2": 2}
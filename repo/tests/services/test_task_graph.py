@@ -0,0 +1,130 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+import time
+from typing import List, Tuple
+
+import pytest
+
+from repo.services.task_graph import TaskGraph, stage_listener
+
+
+async def _sleep_then_return(value: int, seconds: float = 0.05) -> int:
+    await asyncio.sleep(seconds)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_independent_stages_overlap() -> None:
+    graph = TaskGraph("test")
+    graph.add("first", lambda: _sleep_then_return(1))
+    graph.add("second", lambda: _sleep_then_return(2))
+    graph.add("third", lambda: _sleep_then_return(3))
+
+    start = time.perf_counter()
+    results = await graph.run()
+    elapsed = time.perf_counter() - start
+
+    assert results == {"first": 1, "second": 2, "third": 3}
+    assert elapsed < 0.12  # Sequentially this would take at least 0.15s
+
+
+@pytest.mark.asyncio
+async def test_dependencies_receive_results() -> None:
+    graph = TaskGraph("test")
+    graph.add("slow", lambda: _sleep_then_return(1, 0.05))
+    graph.add("fast", lambda: _sleep_then_return(2, 0.01))
+    graph.add("total", lambda slow, fast: _sleep_then_return(slow + fast, 0.0), depends_on=("slow", "fast"))
+
+    results = await graph.run()
+
+    assert results["total"] == 3
+    assert graph.timings["total"].started >= graph.timings["slow"].finished
+    assert graph.critical_path() == ["slow", "total"]
+
+
+@pytest.mark.asyncio
+async def test_failure_cancels_siblings() -> None:
+    cancelled = asyncio.Event()
+
+    async def _fail() -> None:
+        await asyncio.sleep(0.01)
+        raise RuntimeError("broken stage")
+
+    async def _wait_forever() -> None:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = TaskGraph("test")
+    graph.add("fail", _fail)
+    graph.add("wait", _wait_forever)
+
+    with pytest.raises(RuntimeError, match="broken stage"):
+        await graph.run()
+
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_earliest_stage_error_raised() -> None:
+    async def _fail(error: Exception) -> None:
+        raise error
+
+    graph = TaskGraph("test")
+    graph.add("first", lambda: _fail(KeyError("first")))
+    graph.add("second", lambda: _fail(RuntimeError("second")))
+    graph.add("third", lambda: _fail(ValueError("third")))
+
+    # Every stage fails on its first step, before run() sees any of them
+    with pytest.raises(KeyError, match="first"):
+        await graph.run()
+
+
+@pytest.mark.asyncio
+async def test_cancelling_run_cancels_stages() -> None:
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    async def _wait_forever() -> None:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    graph = TaskGraph("test")
+    graph.add("wait", _wait_forever)
+    running = asyncio.create_task(graph.run())
+    await started.wait()
+
+    running.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await running
+    assert cancelled.is_set()
+
+
+def test_unknown_dependency() -> None:
+    graph = TaskGraph("test")
+    with pytest.raises(ValueError):
+        graph.add("orphan", lambda: _sleep_then_return(1), depends_on=("missing",))
+
+
+@pytest.mark.asyncio
+async def test_stage_listener_told_of_each_stage() -> None:
+    finished: List[Tuple[str, int, int]] = []
+
+    async def _listen(stage: str, done: int, total: int) -> None:
+        finished.append((stage, done, total))
+
+    graph = TaskGraph("test")
+    graph.add("slow", lambda: _sleep_then_return(1, 0.05))
+    graph.add("fast", lambda: _sleep_then_return(2, 0.01))
+    listening = stage_listener.set(_listen)
+    try:
+        await graph.run()
+    finally:
+        stage_listener.reset(listening)
+
+    assert finished == [("fast", 1, 2), ("slow", 2, 2)]
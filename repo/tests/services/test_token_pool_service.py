@@ -0,0 +1,77 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.abc import Request, StreamResponse
+
+from repo.services.github_client import GithubClient
+from repo.services.rate_limit_service import record_budget
+from repo.services.token_pool_service import TokenPool
+
+
+pytestmark = pytest.mark.usefixtures("empty_budgets")
+
+
+def test_user_token_first(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    pool = TokenPool(["service-a", "service-b"])
+
+    assert pool.choose("user", "core") == "user"
+
+    record_budget("user", "core", rate_headers(remaining=0))
+    assert pool.choose("user", "core") in ("service-a", "service-b")
+
+
+def test_most_headroom_wins(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    pool = TokenPool(["service-a", "service-b", "service-c"])
+    record_budget("service-a", "core", rate_headers(remaining=100))
+    record_budget("service-b", "core", rate_headers(remaining=4000))
+    record_budget("service-c", "core", rate_headers(remaining=0))
+
+    assert {pool.choose(None, "core") for _ in range(6)} == {"service-b"}
+    assert pool.headroom(None, "core") == 4100
+
+
+def test_fresh_tokens_take_turns() -> None:
+    pool = TokenPool(["service-a", "service-b"])
+
+    assert {pool.choose(None, "core") for _ in range(4)} == {"service-a", "service-b"}
+
+
+def test_exhausted_pool_falls_back(rate_headers: Callable[..., Dict[str, str]]) -> None:
+    assert TokenPool([]).choose(None, "core") is None
+
+    record_budget("user", "core", rate_headers(remaining=0))
+    record_budget("service-a", "core", rate_headers(remaining=0))
+    assert TokenPool(["service-a"]).choose("user", "core") == "user"
+
+
+@pytest.fixture
+def rationed_server(github_stub: Callable[..., Any], rate_headers: Callable[..., Dict[str, str]]) -> Any:
+    """
+    The user's token runs dry on its second request
+    """
+    authorizations: List[Optional[str]] = []
+
+    async def get_commits(request: Request) -> StreamResponse:
+        authorization = request.headers.get("Authorization")
+        authorizations.append(authorization)
+        if authorization == "Bearer user" and len(authorizations) > 1:
+            return web.Response(status=403, text="API rate limit exceeded", headers=rate_headers(remaining=0))
+        return web.json_response([], headers=rate_headers(remaining=4000))
+
+    server = github_stub(web.get("/repos/test/test/commits", get_commits))
+    server.authorizations = authorizations
+    return server
+
+
+@pytest.mark.asyncio
+async def test_client_rotates_mid_pagination(rationed_server: Any) -> None:
+    async with aiohttp.ClientSession(base_url=str(rationed_server.make_url("/")), raise_for_status=True) as session:
+        client = GithubClient(session, "user", pool=TokenPool(["service"]))
+        for page in range(1, 4):
+            async with client.get("/repos/test/test/commits", params={"page": page}) as response:
+                assert await response.json() == []
+
+    assert rationed_server.authorizations == ["Bearer user", "Bearer user", "Bearer service", "Bearer service"]
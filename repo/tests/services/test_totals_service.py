@@ -0,0 +1,98 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict
+
+import aiohttp
+import pytest
+from aiohttp import web, ClientResponseError
+from aiohttp.abc import Request, StreamResponse
+
+from repo.services.github_client import GithubClient
+from repo.services.rate_limit_service import get_scheduler
+from repo.services.token_pool_service import TokenPool
+from repo.services.totals_service import ContributorTotals, get_commit_total, get_contributor_totals
+
+pytestmark = pytest.mark.usefixtures("empty_budgets")
+
+TOO_LARGE = "The history or contributor list is too large to list contributors for this repository via the API."
+
+
+def _paged_headers(path: str, last_page: int) -> Dict[str, str]:
+    next_url = f"https://api.github.com/repositories/1/{path}?per_page=1&page=2"
+    last_url = f"https://api.github.com/repositories/1/{path}?per_page=1&page={last_page}"
+    return {"link": f'<{next_url}>; rel="next", <{last_url}>; rel="last"'}
+
+
+async def get_commits(request: Request) -> StreamResponse:
+    assert request.query["per_page"] == "1"
+    if request.match_info["owner"] == "single":
+        return web.json_response([{"sha": "a"}])
+    return web.json_response([{"sha": "a"}], headers=_paged_headers("commits", 65432))
+
+
+async def get_contributors(request: Request) -> StreamResponse:
+    owner = request.match_info["owner"]
+    if owner == "empty":
+        return web.Response(status=204)
+    if owner == "huge":
+        return web.Response(status=403, body=json.dumps({"message": TOO_LARGE}), content_type="application/json")
+    if owner == "limited":
+        headers = {"X-RateLimit-Limit": "60", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(int(time.time() + 3600)), "X-RateLimit-Resource": "core"}
+        return web.Response(status=403, text="API rate limit exceeded", headers=headers)
+    return web.json_response([{"login": "busiest", "contributions": 1200}], headers=_paged_headers("contributors", 57))
+
+
+@pytest.fixture
+def stub(github_stub: Callable[..., Any]) -> Any:
+    return github_stub(web.get("/repos/{owner}/test/commits", get_commits), web.get("/repos/{owner}/test/contributors", get_contributors))
+
+
+@asynccontextmanager
+async def _client(stub: Any) -> AsyncIterator[GithubClient]:
+    async with aiohttp.ClientSession(base_url=str(stub.make_url("/")), raise_for_status=True) as session:
+        yield GithubClient(session, pool=TokenPool([]))
+
+
+@pytest.mark.asyncio
+async def test_commit_total_from_last_page(stub: Any) -> None:
+    async with _client(stub) as client:
+        assert await get_commit_total("paged/test", client) == 65432
+        assert await get_commit_total("single/test", client) == 1
+
+
+@pytest.mark.asyncio
+async def test_contributor_totals(stub: Any) -> None:
+    async with _client(stub) as client:
+        assert await get_contributor_totals("paged/test", client) == ContributorTotals(author_count=57, commit_count_primary_author=1200)
+        assert await get_contributor_totals("empty/test", client) == ContributorTotals(author_count=0, commit_count_primary_author=0)
+
+
+@pytest.mark.asyncio
+async def test_contributors_too_large_to_list(stub: Any) -> None:
+    async with _client(stub) as client:
+        assert await get_contributor_totals("huge/test", client) == ContributorTotals(author_count=None, commit_count_primary_author=None)
+
+
+@pytest.mark.asyncio
+async def test_contributors_too_large_doesnt_delay_other_fetches(stub: Any) -> None:
+    async with _client(stub) as client:
+        started = time.time()
+        totals, commit_total = await asyncio.gather(get_contributor_totals("huge/test", client), get_commit_total("paged/test", client))
+        assert await get_commit_total("paged/test", client) == commit_total == 65432
+        assert time.time() - started < 1
+
+    assert totals == ContributorTotals(author_count=None, commit_count_primary_author=None)
+    assert not get_scheduler().paused_until
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_contributors_still_raise(stub: Any, settings: Any) -> None:
+    settings.GITHUB_RATE_LIMIT_MAX_WAIT = 0
+    async with _client(stub) as client:
+        with pytest.raises(ClientResponseError) as error:
+            await get_contributor_totals("limited/test", client)
+
+    assert error.value.status == 403
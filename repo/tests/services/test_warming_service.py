@@ -0,0 +1,117 @@
+# pylint: disable=redefined-outer-name, unused-argument, missing-function-docstring,
+from datetime import date, datetime, timedelta, timezone
+from io import StringIO
+from typing import Any, Callable, Dict, List
+
+import pytest
+from django.core.management import call_command
+from freezegun import freeze_time
+
+from repo.data.general import RepoRequest
+from repo.data.git_data import GitData
+from repo.models import CacheData
+from repo.services import input_service
+from repo.services.access_service import DECAY_DAYS, save_hits
+from repo.services.db_cache_service import RECENT_DAYS, patch_cache
+from repo.services.rate_limit_service import record_budget
+from repo.services.single_flight_service import acquire_lease
+from repo.services.warming_service import plan_warming, warm, within_budget
+
+NOW = datetime(2022, 3, 1, 12, tzinfo=timezone.utc)
+TODAY = date(2022, 3, 1)
+
+pytestmark = pytest.mark.usefixtures("empty_budgets")
+
+
+def _cached(repo: str, row_updated_date: date, git_data: GitData) -> None:
+    with freeze_time(row_updated_date):
+        patch_cache("1.0.0", RepoRequest(source="github", owner="test", repo=repo), git_data)
+
+
+@pytest.fixture
+def accessed(git_data: GitData) -> None:
+    _cached("expiring", TODAY - timedelta(days=RECENT_DAYS), git_data)  # Expires at midnight, in 12 hours
+    _cached("expired", TODAY - timedelta(days=40), git_data)
+    _cached("fresh", TODAY, git_data)
+    _cached("unpopular", TODAY - timedelta(days=RECENT_DAYS), git_data)
+
+    hits_a_day = {"expiring": 10, "expired": 2, "fresh": 20, "unpopular": 0.1, "uncached": 50}
+    save_hits({("github", "test", repo): round(rate * DECAY_DAYS) for repo, rate in hits_a_day.items()}, now=NOW)
+
+
+@pytest.mark.django_db
+def test_plan_ranks_hits_missed(accessed: None) -> None:
+    planned = plan_warming(lookahead_hours=24, min_hit_rate=1, now=NOW)
+
+    assert [candidate.url_metadata.repo for candidate in planned] == ["expiring", "expired"]
+    expiring, expired = planned[0], planned[1]
+    assert expiring.expires_in == 12 * 3600
+    assert expiring.priority == pytest.approx(10 * 12 / 24)
+    assert expired.expires_in < 0
+    assert expired.priority == pytest.approx(2)
+
+    assert [candidate.url_metadata.repo for candidate in plan_warming(lookahead_hours=24, min_hit_rate=1, limit=1, now=NOW)] == ["expiring"]
+    assert [candidate.url_metadata.repo for candidate in plan_warming(lookahead_hours=1, min_hit_rate=1, now=NOW)] == ["expired"]
+
+
+def test_budget_share(settings: Any, rate_headers: Callable[..., Dict[str, str]]) -> None:
+    settings.GITHUB_SERVICE_TOKENS = ["service-a", "service-b"]
+    assert within_budget(0.25), "Nothing heard from Github yet"
+
+    record_budget("service-a", "core", rate_headers(remaining=3000))
+    assert within_budget(0.25), "Half the pool is untouched"
+
+    record_budget("service-b", "core", rate_headers(remaining=3500))
+    assert not within_budget(0.25)
+    assert within_budget(0.5)
+
+
+@pytest.mark.django_db
+def test_warm_within_budget(accessed: None, git_data: GitData, settings: Any, monkeypatch: Any, rate_headers: Callable[..., Dict[str, str]]) -> None:
+    settings.GITHUB_SERVICE_TOKENS = ["service-a"]
+    record_budget("service-a", "core", rate_headers(remaining=4000))
+    fetched: List[str] = []
+
+    def fetch(repo_request: RepoRequest) -> GitData:
+        fetched.append(repo_request.repo)
+        record_budget("service-a", "core", rate_headers(remaining=3700))
+        return git_data
+
+    monkeypatch.setattr(input_service, "_fetch_git_data", fetch)
+    with freeze_time(NOW):
+        planned = plan_warming(lookahead_hours=24, min_hit_rate=1)
+        assert not warm(planned, budget_share=0.25, dry_run=True).deferred
+        assert not fetched
+
+        report = warm(planned, budget_share=0.25)
+
+    assert fetched == ["expiring"]
+    assert [candidate.url_metadata.repo for candidate in report.refreshed] == ["expiring"]
+    assert [candidate.url_metadata.repo for candidate in report.deferred] == ["expired"]
+    assert CacheData.objects.get(repo="expiring").row_updated_date == TODAY
+
+    # Repos another worker is fetching are left to it
+    record_budget("service-a", "core", rate_headers(remaining=4000))
+    assert acquire_lease(RepoRequest(source="github", owner="test", repo="expired"), seconds=60)
+    with freeze_time(NOW):
+        report = warm(report.deferred, budget_share=0.25)
+    assert fetched == ["expiring"]
+    assert [candidate.url_metadata.repo for candidate in report.busy] == ["expired"]
+
+
+@pytest.mark.django_db
+def test_command_dry_run(accessed: None, monkeypatch: Any) -> None:
+    def fetch(repo_request: RepoRequest) -> GitData:
+        raise AssertionError("Dry runs don't fetch")
+
+    monkeypatch.setattr(input_service, "_fetch_git_data", fetch)
+    out = StringIO()
+    with freeze_time(NOW):
+        call_command("warm_cache", "--dry-run", "--lookahead-hours", "24", "--min-hits", "1", stdout=out)
+
+    lines = out.getvalue().splitlines()
+    assert lines == [
+        "Would refresh test/expiring: 10.00 hits a day, expires in 12.0h, priority 5.00",
+        "Would refresh test/expired: 2.00 hits a day, expired 228.0h ago, priority 2.00",
+        "Would refresh 2 repos, 0 failed, 0 busy, 0 deferred",
+    ]
@@ -1,13 +1,31 @@
+from typing import Callable, cast
+
+from django.conf import settings
+from django.http import HttpResponseBase
 from django.urls import path
 
 from . import views
 
+# django-stubs only types sync views, Django tells the async ones apart when it routes to them
+View = Callable[..., HttpResponseBase]
+
+# Under ASGI grades are served by async views, so slow fetches from Github don't each hold a thread
+repo_grade: View = views.repo_grade
+if settings.GITGRADE_ASYNC_VIEWS:
+    repo_grade = cast(View, views.repo_grade_async)
+
+repo_grade_bulk: View = views.repo_grade_bulk
+if settings.GITGRADE_ASYNC_VIEWS:
+    repo_grade_bulk = cast(View, views.repo_grade_bulk_async)
+
 urlpatterns = [
     path("", views.repo_input, name="landing"),
-    path("result/", views.repo_grade, name="result_post"),
+    path("result/", repo_grade, name="result_post"),
     path(
         "result/<str:source>/<str:owner>/<str:repo>",
-        views.repo_grade,
+        repo_grade,
         name="result_get",
     ),
+    path("job/<int:job_id>", views.grade_job, name="job"),
+    path("api/grades", repo_grade_bulk, name="bulk_grade"),
 ]
@@ -1,17 +1,24 @@
+import json
 import logging
-from typing import Optional
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
 
 from django.conf import settings
-from django.shortcuts import render
+from django.shortcuts import get_object_or_404, redirect, render
 from django.http import (
     HttpResponse,
     HttpRequest,
+    HttpResponseBadRequest,
+    HttpResponseBase,
     HttpResponseNotAllowed,
     HttpResponseServerError,
+    StreamingHttpResponse,
 )
+from django.views.decorators.csrf import csrf_exempt
 
 from .forms import RepoForm
-from .services.input_service import input_util
+from .models import GradeJob
+from .services.input_service import input_util, input_util_async, input_util_many, input_util_many_async
 
 logger = logging.getLogger(__name__)
 
@@ -24,6 +31,19 @@ def repo_input(request: HttpRequest) -> HttpResponse:
     return render(request, "repo/repo_input.html", {"form": RepoForm()})
 
 
+def _graded_response(request: HttpRequest, response_json: Optional[Dict[str, Any]]) -> HttpResponse:
+    if response_json:
+        if response_json["status"] == "success":
+            return render(request, "repo/repo_results.html", response_json)
+        if response_json["status"] == "queued":
+            return redirect("job", job_id=response_json["job_id"])
+
+        response_json["form"] = RepoForm()
+        return render(request, "repo/repo_input.html", response_json)
+
+    return HttpResponseServerError()
+
+
 def repo_grade(
     request: HttpRequest,
     source: Optional[str] = None,
@@ -42,11 +62,118 @@ def repo_grade(
     else:
         return HttpResponseNotAllowed(permitted_methods=["POST", "GET"])
 
-    if response_json:
-        if response_json["status"] == "success":
-            return render(request, "repo/repo_results.html", response_json)
+    return _graded_response(request, response_json)
 
-        response_json["form"] = RepoForm()
-        return render(request, "repo/repo_input.html", response_json)
 
-    return HttpResponseServerError()
+async def repo_grade_async(
+    request: HttpRequest,
+    source: Optional[str] = None,
+    owner: Optional[str] = None,
+    repo: Optional[str] = None,
+) -> HttpResponse:
+    """
+    repo_grade for ASGI, see settings.GITGRADE_ASYNC_VIEWS
+    """
+    github_token = request.COOKIES.get(settings.GITHUB_TOKEN_KEY)
+    response_json = None
+    if request.method == "POST":
+        form = RepoForm(request.POST)
+        if form.is_valid():
+            repo_url = form.cleaned_data["repo_url"]
+            response_json = await input_util_async(repo_url=repo_url, github_token=github_token)
+    elif request.method == "GET":
+        response_json = await input_util_async(source=source, owner=owner, repo=repo, github_token=github_token)
+    else:
+        return HttpResponseNotAllowed(permitted_methods=["POST", "GET"])
+
+    return _graded_response(request, response_json)
+
+
+def grade_job(request: HttpRequest, job_id: int) -> HttpResponse:
+    """
+    Shows the progress of a grade job, see settings.GITGRADE_GRADE_JOBS, and the grade once it's done
+    """
+    job = get_object_or_404(GradeJob, pk=job_id)
+    if job.status == GradeJob.DONE:
+        return redirect("result_get", source=job.source, owner=job.owner, repo=job.repo)
+    if job.status == GradeJob.FAILED:
+        return render(request, "repo/repo_input.html", {"status": "error", "error_message": job.error_message, "form": RepoForm()})
+    return render(request, "repo/repo_job.html", {"job": job, "refresh_seconds": settings.GITGRADE_JOB_PAGE_REFRESH_SECONDS})
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_line(line: Dict[str, Any]) -> str:
+    return json.dumps(line, default=_json_default) + "\n"
+
+
+def _ndjson(lines: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    for line in lines:
+        yield _ndjson_line(line)
+
+
+async def _andjson(lines: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    async for line in lines:
+        yield _ndjson_line(line)
+
+
+def _bearer_token(request: HttpRequest) -> Optional[str]:
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def _bulk_repo_urls(request: HttpRequest) -> Union[List[str], HttpResponseBase]:
+    """
+    The repo URLs in a bulk request's JSON body of {"repo_urls": [...]}, or the response refusing it
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(permitted_methods=["POST"])
+    try:
+        repo_urls = json.loads(request.body)["repo_urls"]
+    except (ValueError, KeyError, TypeError):
+        return HttpResponseBadRequest('Expected a JSON body of {"repo_urls": [...]}')
+    if not isinstance(repo_urls, list) or not all(isinstance(repo_url, str) for repo_url in repo_urls):
+        return HttpResponseBadRequest("repo_urls must be a list of URLs")
+    if len(repo_urls) > settings.GITGRADE_BULK_MAX_REPOS:
+        return HttpResponseBadRequest(f"At most {settings.GITGRADE_BULK_MAX_REPOS} repos can be graded a call")
+    return repo_urls
+
+
+# API clients don't carry a CSRF token, so the visitor's token cookie is never used
+# here, another site posting to it would spend the visitor's rate limit
+@csrf_exempt
+def repo_grade_bulk(request: HttpRequest) -> HttpResponseBase:
+    """
+    Grades the repos in a JSON body of {"repo_urls": [...]}, streaming a line of NDJSON
+    for each URL as its grades are ready, see input_service.input_util_many. Fetches
+    use the token in an "Authorization: Bearer" header, or the service tokens
+    """
+    repo_urls = _bulk_repo_urls(request)
+    if isinstance(repo_urls, HttpResponseBase):
+        return repo_urls
+
+    return StreamingHttpResponse(_ndjson(input_util_many(repo_urls, github_token=_bearer_token(request))), content_type="application/x-ndjson")
+
+
+async def repo_grade_bulk_async(request: HttpRequest) -> HttpResponseBase:
+    """
+    repo_grade_bulk for ASGI, see settings.GITGRADE_ASYNC_VIEWS. The lines come from an
+    async generator, which the ASGI handler awaits between them
+    """
+    repo_urls = _bulk_repo_urls(request)
+    if isinstance(repo_urls, HttpResponseBase):
+        return repo_urls
+
+    lines = _andjson(input_util_many_async(repo_urls, github_token=_bearer_token(request)))
+    # django-stubs predates async iterators as streaming content, Django takes them from 4.2
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")  # type: ignore[arg-type]
+
+
+# csrf_exempt only keeps async views async from Django 5.0
+repo_grade_bulk_async.csrf_exempt = True  # type: ignore[attr-defined]